@@ -4,9 +4,13 @@ import uuid
 import pandas as pd
 import warnings
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 warnings.filterwarnings('ignore')
 
-from bambooai import code_executor, models, template_formatting, qa_retrieval, log_manager, output_manager, web_output_manager, storage_manager, utils, executor_client
+from bambooai import code_executor, code_stream, dataset_lifecycle, models, template_formatting, qa_retrieval, log_manager, output_manager, web_output_manager, storage_manager, utils, executor_client
+from bambooai.column_projection import modifies_frame
+from bambooai.execution_cache import normalized_code_hash
+from bambooai.execution_kernel import snapshot_value
 from bambooai.messages import reg_ex, tools_definition
 from bambooai.messages.message_manager import MessageManager
 from bambooai.messages.prompts import PromptManager
@@ -47,6 +51,11 @@ class BambooAI:
             api_client=self.api_client,
             user_id=self.user_id,
         )
+        # Index, quotas and expiry of the datasets generated by the code, shared with the web app's janitor
+        self.generated_datasets = dataset_lifecycle.get_manager(
+            os.path.join('datasets', self.user_id or '', 'generated'),
+            favourites_dir=os.path.join('storage', self.user_id or '', 'favourites')
+        )
 
         # Web search mode
         self.search_mode = os.getenv('WEB_SEARCH_MODE', 'google_ai')
@@ -108,6 +117,11 @@ class BambooAI:
                 vector_db = False
 
         self.MAX_ERROR_CORRECTIONS = 5
+        # Number of code candidates requested concurrently, the first one that runs successfully is used. 1 disables it.
+        self.code_candidates = max(1, int(os.getenv('CODE_CANDIDATES', '1')))
+        # Start preparing (and optionally executing) the generated code as soon as its code block has streamed
+        self.stream_preparation = os.getenv('STREAM_PREPARATION', 'true').lower() != 'false'
+        self.stream_execution = os.getenv('STREAM_EXECUTION', 'false').lower() == 'true'
         
         # Dataframe
         # Check if the dataframe is provided and generate a unique ID if not provided
@@ -177,6 +191,7 @@ class BambooAI:
             multimodal_models=self.multimodal_models,
             max_conversations=max_conversations,
             user_id=self.user_id,
+            model_properties=self.model_dict,
         )
 
         # QA Retrieval
@@ -374,8 +389,8 @@ class BambooAI:
                                                                                })
             
             # Select Analyst messages maintenance
-            self.message_manager.messages_maintenace(self.message_manager.select_analyst_messages)
             self.message_manager.messages_content_maintenance("Analyst Selector", self.message_manager.select_analyst_messages, self.model_dict[models.get_model_name('Code Generator')[0]]['templ_formating'])
+            self.message_manager.messages_maintenace(self.message_manager.select_analyst_messages, agent="Analyst Selector")
             
             if self.retrieved_plan is not None:
                 example_plan = self.prompts.semantic_memory_plan_example.format(self.retrieved_similarity_score, self.retrieved_rank, self.retrieved_plan)
@@ -396,8 +411,8 @@ class BambooAI:
                     self.data_model = reg_ex._extract_data_model(data_model)
                     dataframe_head = utils.inspect_dataframe(df=self.df, execution_mode=self.execution_mode, df_id=self.df_id, executor_client=self.api_client)
                     data_model_vis = utils.generate_model_graph(self.data_model)
-                    self.message_manager.messages_maintenace(self.message_manager.df_inspector_messages)
                     self.message_manager.messages_content_maintenance("Dataframe Inspector", self.message_manager.df_inspector_messages, self.model_dict[models.get_model_name('Code Generator')[0]]['templ_formating'])
+                    self.message_manager.messages_maintenace(self.message_manager.df_inspector_messages, agent="Dataframe Inspector")
                     # Create a dictionary containing both the visualization and the YAML data
                     data_model_web = {
                         'visualization': data_model_vis,
@@ -481,8 +496,8 @@ class BambooAI:
             self.message_manager.last_plan = None
 
         # Remove the oldest conversation and all tool calls, and dataset, plan, and code from the messages list
-        self.message_manager.messages_maintenace(self.message_manager.eval_messages)
         self.message_manager.messages_content_maintenance(agent, self.message_manager.eval_messages, self.model_dict[models.get_model_name('Code Generator')[0]]['templ_formating'])
+        self.message_manager.messages_maintenace(self.message_manager.eval_messages, agent=agent)
 
         plan = task_eval
 
@@ -548,6 +563,9 @@ class BambooAI:
                 self._process_question(question, image, user_code)
 
     def _process_question(self, question, image, user_code):
+        # A stop requested during an earlier question doesn't carry over
+        self.executor.reset_cancel()
+
         if self.webui:
             self.output_manager.send_chain_id(self.thread_id, self.chain_id, self.df_id) # Send the thread_id and chain_id for the new chain to the web interface
 
@@ -594,16 +612,28 @@ class BambooAI:
                 if self.retrieved_code is not None:
                     example_code = self.prompts.semantic_memory_code_example.format(self.retrieved_similarity_score, self.retrieved_rank, self.retrieved_code)
 
-            # Call the generate_code() method to generate the code
-            code, llm_response = self.generate_code(
-                analyst, 
-                intent_breakdown, 
-                plan, 
-                self.message_manager.code_messages, 
-                example_code, 
-                image=image, 
-                generated_datasets_path=generated_datasets_path
-            )
+            first_result = None
+            if self.code_candidates > 1 and image is None:
+                # Request several candidates concurrently, the selected one has already been executed
+                code, llm_response, first_result = self.generate_code_candidates(
+                    analyst,
+                    intent_breakdown,
+                    plan,
+                    self.message_manager.code_messages,
+                    example_code,
+                    generated_datasets_path=generated_datasets_path
+                )
+            else:
+                # Call the generate_code() method to generate the code
+                code, llm_response, first_result = self.generate_code(
+                    analyst, 
+                    intent_breakdown, 
+                    plan, 
+                    self.message_manager.code_messages, 
+                    example_code, 
+                    image=image, 
+                    generated_datasets_path=generated_datasets_path
+                )
             code_type = 'llm'
             
             # We are returning the response from the LLM model to the user, as the code is not present, or can not be extracted
@@ -621,9 +651,10 @@ class BambooAI:
             tool_response = None
             intent_breakdown = question
             code_type = 'user'
+            first_result = None
 
         # Call the execute_code() method to execute the code and summarise the results
-        answer, results, code, plot_jsons, error_corrections = self.execute_code(analyst, code, plan, intent_breakdown, self.message_manager.code_messages, self.execution_mode, code_type, generated_datasets_path)
+        answer, results, code, plot_jsons, error_corrections = self.execute_code(analyst, code, plan, intent_breakdown, self.message_manager.code_messages, self.execution_mode, code_type, generated_datasets_path, first_result=first_result)
 
         # Review and correct the plan for storage if there were code corrections or use the original plan
         reviewed_plan = None
@@ -687,11 +718,7 @@ class BambooAI:
     ### Code Functions ###
     ######################
             
-    def generate_code(self, analyst, intent_breakdown, plan, code_messages, example_code, image=None, generated_datasets_path=None):
-        agent = 'Code Generator'
-
-        reasoning_effort = "high" if self.planning else "low"
-        
+    def _code_generation_prompt(self, agent, analyst, intent_breakdown, plan, example_code, generated_datasets_path=None):
         # Get dataframe info and data model
         if analyst == 'Data Analyst DF':
             dataframe_head = utils.inspect_dataframe(df=self.df, execution_mode=self.execution_mode, df_id=self.df_id, executor_client=self.api_client)
@@ -718,6 +745,14 @@ class BambooAI:
             previous_results=self.message_manager.format_qa_pairs(),
             example_code=example_code
         )
+        return formatted_prompt
+
+    def generate_code(self, analyst, intent_breakdown, plan, code_messages, example_code, image=None, generated_datasets_path=None):
+        agent = 'Code Generator'
+
+        reasoning_effort = "high" if self.planning else "low"
+
+        formatted_prompt = self._code_generation_prompt(agent, analyst, intent_breakdown, plan, example_code, generated_datasets_path)
 
         # Add formatted prompt to messages
         code_messages.append({"role": "user", "content": formatted_prompt})
@@ -744,20 +779,167 @@ class BambooAI:
         else:
             tools = None
 
+        streamed_code = self._streamed_code(analyst, provider, generated_datasets_path)
+        self.output_manager.stream_listener = streamed_code.feed if streamed_code is not None else None
+
         # Call the LLM API or local model to generate the code
-        if tools:
-            llm_response, tool_response = self.llm_stream(self.prompts, self.log_and_call_manager, self.output_manager, code_messages, agent=agent, chain_id=self.chain_id, tools=tools, reasoning_models=self.reasoning_models, reasoning_effort=reasoning_effort)
-        else:
-            llm_response = self.llm_stream(self.prompts, self.log_and_call_manager, self.output_manager, code_messages, agent=agent, chain_id=self.chain_id, reasoning_models=self.reasoning_models, reasoning_effort=reasoning_effort)
+        try:
+            if tools:
+                llm_response, tool_response = self.llm_stream(self.prompts, self.log_and_call_manager, self.output_manager, code_messages, agent=agent, chain_id=self.chain_id, tools=tools, reasoning_models=self.reasoning_models, reasoning_effort=reasoning_effort)
+            else:
+                llm_response = self.llm_stream(self.prompts, self.log_and_call_manager, self.output_manager, code_messages, agent=agent, chain_id=self.chain_id, reasoning_models=self.reasoning_models, reasoning_effort=reasoning_effort)
+        finally:
+            self.output_manager.stream_listener = None
 
         code_messages.append({"role": "assistant", "content": llm_response})
 
         # Extract the code from the API response
         code = reg_ex._extract_code(llm_response,analyst,provider)
 
-        return code, llm_response
+        # The execution started while the response was streaming, if its code is the final one
+        first_result = streamed_code.result(code) if streamed_code is not None else None
+        if first_result is not None:
+            self.output_manager.display_tool_info('Code Execution', f"exec(code,'df': pd.DataFrame) in {self.execution_mode} mode, started while the response was streaming", chain_id=self.chain_id)
+
+        return code, llm_response, first_result
+
+    def _streamed_code(self, analyst, provider, generated_datasets_path=None):
+        """The work started on the generated code as soon as its code block has streamed, or None if it is disabled"""
+        if not self.stream_preparation:
+            return None
+        executor = self.executor
+
+        def prepare(code):
+            executor.prepare(code, self.df if self.execution_mode == 'local' else None, self.auxiliary_datasets)
+
+        execute = discard = None
+        # Outside the web UI the streamed response is printed to stdout, which the execution captures
+        if self.stream_execution and self.webui and self.execution_mode == 'local':
+            written = []
+
+            def execute(code):
+                # Code modifying df in place can't run before it is known to be the final code
+                if modifies_frame(code):
+                    return None
+                before = self._folder_snapshot(generated_datasets_path)
+                result = executor.execute(code, self.df, self.df_id, generated_datasets_path, self.auxiliary_datasets)
+                if not executor.last_execution_cached:
+                    written.extend(self._written_files(generated_datasets_path, before))
+                return result
+
+            def discard(result):
+                # The final code is different, it runs in a clean folder
+                self._remove_files(written)
+
+        return code_stream.StreamedCode(analyst, provider, prepare=prepare, execute=execute, discard=discard)
+
+    def generate_code_candidates(self, analyst, intent_breakdown, plan, code_messages, example_code, generated_datasets_path=None):
+        """
+        Request self.code_candidates scripts concurrently, from the 'Code Generator' model and the 'Code Generator 2', 'Code Generator 3', ...
+        agents if they are configured in LLM_CONFIG.json, and execute them in the order they arrive. The first candidate that runs
+        without errors and produces output is selected, and the remaining requests are abandoned (they still run to completion
+        at the provider). Each candidate gets its own (copy on write) copy of the dataframe, so a failed candidate can't modify it.
+        The candidates share the generated datasets folder, so each candidate is credited only with the files it wrote, and the
+        files of the candidates that weren't selected are removed.
+        Returns the code, the LLM response and the execution result of the selected candidate. When no candidate succeeds,
+        the first executed candidate in the order of the agents (the 'Code Generator' one, if it returned code) is returned
+        with its error, to be corrected.
+        """
+        configured = {item.get('agent') for item in models.load_llm_config().get('agent_configs', [])}
+        agents = ['Code Generator'] + [
+            f'Code Generator {i}' if f'Code Generator {i}' in configured else 'Code Generator' for i in range(2, self.code_candidates + 1)
+        ]
+        prompts = {agent: self._code_generation_prompt(agent, analyst, intent_breakdown, plan, example_code, generated_datasets_path) for agent in set(agents)}
+
+        using_model, provider = models.get_model_name('Code Generator')
+        self.output_manager.display_tool_start('Code Generator', using_model, chain_id=self.chain_id)
+        self.output_manager.display_system_messages(f"Requesting {len(agents)} code candidates concurrently.", chain_id=self.chain_id)
+
+        def request_candidate(agent):
+            messages = code_messages + [{"role": "user", "content": prompts[agent]}]
+            llm_response = self.llm_call(self.log_and_call_manager, messages, agent=agent, chain_id=self.chain_id)
+            return llm_response, reg_ex._extract_code(llm_response, analyst, models.get_model_name(agent)[1])
+
+        pool = ThreadPoolExecutor(max_workers=len(agents))
+        futures = {pool.submit(request_candidate, agent): i for i, agent in enumerate(agents)}
+        responses, executions, executed_hashes, written = {}, {}, set(), {}
+        selected = fallback = None
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    responses[i] = llm_response, code = future.result()
+                except Exception as e:
+                    self.output_manager.display_system_messages(f"Code candidate {i + 1} failed: {str(e)}", chain_id=self.chain_id)
+                    continue
+                code_hash = normalized_code_hash(code) if code else None
+                if not code or (code_hash or code) in executed_hashes:
+                    continue
+                executed_hashes.add(code_hash or code)
+
+                self.output_manager.display_tool_info('Code Execution', f"exec(candidate {i + 1},'df': pd.DataFrame) in {self.execution_mode} mode", chain_id=self.chain_id)
+                df = snapshot_value(self.df) if self.df is not None and self.execution_mode == 'local' else self.df
+                before = self._folder_snapshot(generated_datasets_path)
+                result = self.executor.execute(code, df, self.df_id, generated_datasets_path, self.auxiliary_datasets)
+                # Failed executions don't report their files. A cached result wrote nothing now, and outside the local mode the folder is on the executor.
+                if self.execution_mode == 'local' and not self.executor.last_execution_cached:
+                    written[i] = self._written_files(generated_datasets_path, before)
+                else:
+                    written[i] = list(result[4] or [])
+                executions[i] = result = result[:4] + (written[i],)
+                if self.executor.last_execution_cancelled:
+                    selected = i
+                    break
+                if result[2] is None:
+                    # A candidate that printed, plotted or saved nothing is only used if no other one does
+                    if result[1] or result[3] or result[4]:
+                        selected = i
+                        break
+                    if fallback is None:
+                        fallback = i
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        if selected is None:
+            selected = fallback if fallback is not None else min(executions, default=None)
+        if selected is None:
+            # No candidate returned code, the first response is shown to the user
+            llm_response = responses[min(responses)][0] if responses else None
+            return None, llm_response, None
+
+        # Remove the datasets only the candidates that weren't selected generated
+        self._remove_files(set().union(*(files for i, files in written.items() if i != selected)) - set(written.get(selected, [])))
+
+        llm_response, code = responses[selected]
+        code_messages.append({"role": "user", "content": prompts[agents[selected]]})
+        code_messages.append({"role": "assistant", "content": llm_response})
+        if executions[selected][2] is None:
+            self.output_manager.display_system_messages(
+                f"Selected code candidate {selected + 1} of {len(agents)} ({models.get_model_name(agents[selected])[0]}).", chain_id=self.chain_id
+            )
+        return code, llm_response, executions[selected]
+
+    @staticmethod
+    def _folder_snapshot(path):
+        """Modification times of the files in a (local) generated datasets folder, by path"""
+        if not path or not os.path.isdir(path):
+            return {}
+        return {entry.path: entry.stat().st_mtime_ns for entry in os.scandir(path) if entry.is_file()}
+
+    @classmethod
+    def _written_files(cls, path, snapshot):
+        """The files of a generated datasets folder that are new, or were modified since the snapshot of the folder"""
+        return sorted(file for file, modified in cls._folder_snapshot(path).items() if snapshot.get(file) != modified)
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
-    def execute_code(self, analyst, code, plan, intent_breakdown, code_messages, execution_mode, code_type, generated_datasets_path):
+    def execute_code(self, analyst, code, plan, intent_breakdown, code_messages, execution_mode, code_type, generated_datasets_path, first_result=None):
         agent = 'Code Executor'
         error_corrections = 0
         executor = self.executor
@@ -766,13 +948,27 @@ class BambooAI:
 
         while error_corrections < self.MAX_ERROR_CORRECTIONS:
             # Remove the oldest conversation from the messages list
-            self.message_manager.messages_maintenace(code_messages)
+            self.message_manager.messages_maintenace(code_messages, agent="Code Generator")
 
             # Execute the code
             if code is not None:
-                self.output_manager.display_tool_info('Code Execution', f"exec(code,'df': pd.DataFrame) in {execution_mode} mode", chain_id=self.chain_id)
-                
-                new_df, new_results, error, new_plot_images, generated_datasets = executor.execute(code, self.df, self.df_id, generated_datasets_path)
+                if first_result is not None:
+                    # The code has already been executed, eg. as the selected code candidate
+                    new_df, new_results, error, new_plot_images, generated_datasets = first_result
+                    first_result = None
+                else:
+                    self.output_manager.display_tool_info('Code Execution', f"exec(code,'df': pd.DataFrame) in {execution_mode} mode", chain_id=self.chain_id)
+
+                    new_df, new_results, error, new_plot_images, generated_datasets = executor.execute(code, self.df, self.df_id, generated_datasets_path, self.auxiliary_datasets)
+                if executor.last_execution_cached:
+                    self.output_manager.display_system_messages("Reused the results of an identical earlier execution of this code on the same data.", chain_id=self.chain_id)
+
+                if executor.last_execution_cancelled:
+                    # Stopped by the user, so the code isn't corrected and run again
+                    self.output_manager.display_system_messages("Code execution was stopped by the user.", chain_id=self.chain_id)
+                    results = "Code execution was stopped by the user."
+                    plot_images = []
+                    break
                 
                 if error:
                     error_corrections += 1
@@ -780,6 +976,10 @@ class BambooAI:
                     # Ensure plot_images is cleared after each unsuccessful attempt
                     plot_images = []
                 else:
+                    if executor.last_profile is not None and code_type == 'llm':
+                        code, new_df, new_results, new_plot_images, generated_datasets = self.correct_code_performance(
+                            code, new_df, new_results, new_plot_images, generated_datasets, code_messages, analyst, generated_datasets_path
+                        )
                     self.df = new_df
                     results = new_results
                     plot_images = new_plot_images  # Only keep plots from successful execution
@@ -801,14 +1001,34 @@ class BambooAI:
         self.message_manager.last_code = code
 
         plot_jsons = []
+        # Plot files live with the thread's storage rather than its generated datasets, so they last as long as the stored thread
+        plots_path = os.path.join('storage', self.user_id or '', 'plots', str(self.thread_id))
         for i, plot_data in enumerate(plot_images):
-            plot_jsons.append(json.dumps({
+            plot_json = {
                 'type': 'plot',
                 'data': plot_data['data'],
                 'format': plot_data['format'],
                 'id': f'plot_{i+1}',
                 'chain_id': self.chain_id
-            }))
+            }
+            if plot_data.get('full_data'):
+                # Keep the full resolution of downsampled plots, so it can be loaded on demand
+                os.makedirs(plots_path, exist_ok=True)
+                with open(os.path.join(plots_path, f"{plot_data['full_resolution_key']}.{plot_data['format']}"), 'w', encoding='utf-8') as f:
+                    f.write(plot_data['full_data'])
+            if isinstance(plot_data['data'], bytes):
+                # Images are stored too, and the stream carries a link rather than base64
+                image_key = uuid.uuid4().hex
+                os.makedirs(plots_path, exist_ok=True)
+                with open(os.path.join(plots_path, f"{image_key}.{plot_data['format']}"), 'wb') as f:
+                    f.write(plot_data['data'])
+                plot_json.update(data=None, url=f'/plot_image/{self.thread_id}/{image_key}')
+            plot_jsons.append(json.dumps(plot_json))
+
+        # Record the chain's generated datasets, removing the oldest chains if a quota is exceeded
+        removed_chains = self.generated_datasets.register(generated_datasets_path)
+        if removed_chains:
+            self.output_manager.display_system_messages(f"The generated datasets of {removed_chains} earlier answer(s) were removed to stay within the storage quota.")
 
         self.output_manager.display_results(chain_id=self.chain_id,code=code, plot_jsons=plot_jsons if self.webui else None, generated_datasets=generated_datasets if generated_datasets else None)
         summary = self.summarise_solution(intent_breakdown, plan, results, code if code_type == 'user' else None)
@@ -847,6 +1067,79 @@ class BambooAI:
 
         return code, code_messages
 
+    def correct_code_performance(self, code, df, results, plot_images, generated_datasets, code_messages, analyst, generated_datasets_path):
+        """
+        Ask the Error Corrector for a faster version of code that ran longer than the performance budget, using the profile of the run.
+        The faster version is run, and kept only if it is faster and its outputs match: the printed results, the resulting dataframe,
+        the number of plots and the generated datasets. Returns the code and the outputs that were kept.
+        """
+        agent = 'Error Corrector'
+        executor = self.executor
+        original = (code, df, results, plot_images, generated_datasets)
+        original_time = executor.last_resource_usage.get('wall_time')
+
+        # Running code that modifies the dataframe in place, or writes datasets, again would modify or overwrite them
+        if original_time is None or modifies_frame(code) or generated_datasets or self.execution_mode != 'local':
+            return original
+
+        model, provider = models.get_model_name(agent)
+        if self.model_dict[model]['templ_formating'] == 'xml':
+            template = self.prompts.performance_corrector_system
+        else: # templ_formating is 'text'
+            template = self.prompts.performance_corrector_system_reasoning
+        code_messages.append({"role": "user", "content": template.format(f"{original_time:.1f}", f"{code_executor.PERFORMANCE_TIME_BUDGET:g}", executor.last_profile, self.python_version, self.pandas_version, self.plotly_version)})
+
+        self.output_manager.display_system_messages(f"The code took {original_time:.1f} seconds, asking for a faster version.", chain_id=self.chain_id)
+        llm_response = self.llm_stream(self.prompts, self.log_and_call_manager, self.output_manager, code_messages, agent=agent, chain_id=self.chain_id, reasoning_models=self.reasoning_models)
+        code_messages.append({"role": "assistant", "content": llm_response})
+        faster_code = reg_ex._extract_code(llm_response, analyst, provider)
+
+        rejection = None
+        if faster_code is None or modifies_frame(faster_code):
+            rejection = "no usable faster version was returned"
+        else:
+            self.output_manager.display_tool_info('Code Execution', f"exec(code,'df': pd.DataFrame) in {self.execution_mode} mode", chain_id=self.chain_id)
+            new_df, new_results, error, new_plot_images, new_generated_datasets = executor.execute(faster_code, self.df, self.df_id, generated_datasets_path, self.auxiliary_datasets)
+            new_time = executor.last_resource_usage.get('wall_time')
+            if executor.last_execution_cancelled:
+                rejection = "the faster version was stopped"
+            elif error:
+                rejection = "the faster version failed"
+            elif executor.last_execution_cached or new_time is None or new_time >= original_time:
+                rejection = "the new version was not faster"
+            elif not self._outputs_match((df, results, plot_images, generated_datasets), (new_df, new_results, new_plot_images, new_generated_datasets)):
+                rejection = "the outputs of the faster version did not match"
+            # Remove the datasets only the rejected version generated
+            if rejection is not None:
+                for path in set(new_generated_datasets or []) - set(generated_datasets or []):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+        if rejection is not None:
+            # Keep the conversation on the code that was kept
+            del code_messages[-2:]
+            self.output_manager.display_system_messages(f"Kept the original code, {rejection}.", chain_id=self.chain_id)
+            return original
+
+        self.output_manager.display_system_messages(f"Kept the faster version of the code: {new_time:.1f} seconds instead of {original_time:.1f}.", chain_id=self.chain_id)
+        return faster_code, new_df, new_results, new_plot_images, new_generated_datasets
+
+    def _outputs_match(self, outputs, new_outputs):
+        df, results, plot_images, generated_datasets = outputs
+        new_df, new_results, new_plot_images, new_generated_datasets = new_outputs
+        if (results or '') != (new_results or '') or len(plot_images or []) != len(new_plot_images or []):
+            return False
+        if sorted(generated_datasets or []) != sorted(new_generated_datasets or []):
+            return False
+        if df is new_df:
+            return True
+        try:
+            return df is not None and new_df is not None and df.equals(new_df)
+        except Exception:
+            return False
+
     def review_plan(self,code, plan):
         agent = 'Reviewer'
 
@@ -1,32 +1,90 @@
 import io
 import os
+import ast
+import importlib
+import importlib.util
+import inspect
+import hashlib
 import sys
-import json
+import threading
 import traceback
-import matplotlib
-import matplotlib.pyplot as plt
+import uuid
 import base64
+import contextlib
 from contextlib import redirect_stdout
-import pyarrow as pa
-import pyarrow.parquet as pq
 import zlib
 from datetime import datetime
 
+from bambooai.column_projection import referenced_columns, project_file_reads, modifies_frame
+from bambooai import plot_compaction
+from bambooai.execution_kernel import ExecutionKernel, snapshot_value
+from bambooai.execution_cache import ExecutionCache, CachedExecution, DatasetVersions, normalized_code_hash, is_deterministic, file_fingerprints, read_files
+from bambooai.execution_limits import ExecutionGuard, ExecutionInterrupted, format_usage
+from bambooai.execution_profiler import StackSampler
+from bambooai.plot_capture import capture_figures, MIME_TYPES
+from bambooai.messages.reg_ex import CODE_BLACKLIST
+
+# Give the generated code only the columns it references, set to 'false' to always pass the full dataframe
+COLUMN_PROJECTION = os.getenv('COLUMN_PROJECTION', 'true').lower() != 'false'
+# Opt-in: Plotly scatter traces with more points than this are downsampled before they are sent to the browser (flagged
+# in the plot header, with a button loading the full resolution). 0 (default) disables it.
+PLOT_MAX_POINTS = int(os.getenv('PLOT_MAX_POINTS', '0'))
+# Keep the execution namespace between executions, and re-run only the statements from the first one that changed
+EXECUTION_KERNEL = os.getenv('EXECUTION_KERNEL', 'false').lower() == 'true'
+# Opt-in: results of successful deterministic executions are reused when the same code runs on the same dataset version.
+# Whether the dataset changed is inferred from the code (see modifies_frame), so it's off by default.
+EXECUTION_CACHE = os.getenv('EXECUTION_CACHE', 'false').lower() == 'true'
+EXECUTION_CACHE_MAX_BYTES = int(os.getenv('EXECUTION_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Limits of a single code execution: wall-clock and CPU seconds, and MB of memory added to the process. 0 disables a limit.
+EXECUTION_WALL_TIME_LIMIT = float(os.getenv('EXECUTION_WALL_TIME_LIMIT', '600'))
+EXECUTION_CPU_TIME_LIMIT = float(os.getenv('EXECUTION_CPU_TIME_LIMIT', '300'))
+EXECUTION_MEMORY_LIMIT_MB = int(os.getenv('EXECUTION_MEMORY_LIMIT_MB', '4096'))
+# Profile local executions, and ask the Error Corrector for a faster version of code running longer than the budget (seconds)
+PERFORMANCE_CORRECTION = os.getenv('PERFORMANCE_CORRECTION', 'false').lower() == 'true'
+PERFORMANCE_TIME_BUDGET = float(os.getenv('PERFORMANCE_TIME_BUDGET', '30'))
+# Images of matplotlib figures: png, webp, svg or auto (SVG for simple figures), the DPI, and the pixel cap that lowers it
+PLOT_IMAGE_FORMAT = os.getenv('PLOT_IMAGE_FORMAT', 'png').lower()
+PLOT_IMAGE_DPI = float(os.getenv('PLOT_IMAGE_DPI', '100'))
+PLOT_IMAGE_MAX_PIXELS = int(os.getenv('PLOT_IMAGE_MAX_PIXELS', '4000000'))
+# Modules not imported ahead of the execution by prepare(), as they may set up GUI state that belongs to the main thread
+PREPARE_SKIPPED_MODULES = {'matplotlib', 'seaborn', 'tkinter', 'turtle', 'IPython'}
+
 class CodeExecutor:
     def __init__(self, webui=False, mode='local', api_client=None, user_id=None):
         self.webui = webui
         self.mode = mode
-        self.plots_dir = os.path.join("iframe_figures", user_id) if user_id else "iframe_figures"
         self.log_dir = os.path.join('logs', user_id) if user_id else 'logs'
         os.makedirs(self.log_dir, exist_ok=True)
         self.original_df = None
 
         self.api_client = api_client
+        self.kernel = ExecutionKernel() if EXECUTION_KERNEL and mode == 'local' else None
+        self.cache = ExecutionCache(EXECUTION_CACHE_MAX_BYTES) if EXECUTION_CACHE else None
+        # Versions of the local dataframes by identity, and of the remote ones by df_id
+        self.dataset_versions = DatasetVersions()
+        self.remote_dataset_versions = {}
+        self.last_execution_cached = False
+        # Set from another thread (eg. the web UI's stop action) to interrupt the running execution
+        self.cancel_event = threading.Event()
+        self.last_execution_cancelled = False
+        self.last_resource_usage = {}
+        # Profile of the last execution, when it ran longer than the performance budget
+        self.last_profile = None
+        self._api_execution_id = None
+        # Column projections computed ahead of the execution by prepare()
+        self._projections = {}
+        self._projections_lock = threading.Lock()
 
         BAMBOO_PLOT_FORMAT = os.environ.get('BAMBOO_PLOT_FORMAT')
         if BAMBOO_PLOT_FORMAT is None:
             BAMBOO_PLOT_FORMAT = 'json'
 
+        # The downsampling helpers are given to the executed code rather than inlined in the patch: locally as functions,
+        # and registered once with the executor API, which keeps them by the hash of their source
+        self.plot_settings_code = f"_PLOT_MAX_POINTS = {PLOT_MAX_POINTS}\n"
+        self.helpers = {'_compact_figure': plot_compaction._compact_figure} if PLOT_MAX_POINTS else {}
+        self.api_helpers = [(inspect.getsource(plot_compaction), list(self.helpers))] if PLOT_MAX_POINTS else []
+
         self.html_patch_code = """
 import plotly.io as pio
 original_show = pio.show
@@ -41,10 +99,13 @@ def show(fig, *args, **kwargs):
         fig.layout.legend.bgcolor = 'rgba(0,0,0,0.3)'
     for ann in fig.layout.annotations or []:
         ann.bgcolor = 'rgba(0,0,0,0.3)'
-        
-    filename = f'{_plots_dir}/figure_{id(fig)}.html'
-    fig.write_html(filename)
-    _generated_files.append(filename)
+
+    # Capture the figure in memory rather than writing it to disk and reading it back
+    figure, full_resolution_key = _compact_figure(fig, _PLOT_MAX_POINTS) if _PLOT_MAX_POINTS else (fig, None)
+    captured = {'data': pio.to_html(figure, validate=False)}
+    if full_resolution_key:
+        captured.update(full_data=pio.to_html(fig, validate=False), full_resolution_key=full_resolution_key)
+    _plot_figures.append(captured)
 pio.show = show
 """
         self.json_patch_code = """
@@ -62,30 +123,27 @@ def show(fig, *args, **kwargs):
         fig.layout.legend.bgcolor = 'rgba(0,0,0,0.3)'
     for ann in fig.layout.annotations or []:
         ann.bgcolor = 'rgba(0,0,0,0.3)'
-    
-    filename = f'{_plots_dir}/figure_{id(fig)}.json'
-    fig.write_json(filename)
-    _generated_files.append(filename)
+
+    # Capture the figure in memory, serialized once (plotly uses orjson when it's installed)
+    figure, full_resolution_key = _compact_figure(fig, _PLOT_MAX_POINTS) if _PLOT_MAX_POINTS else (fig, None)
+    captured = {'data': pio.to_json(figure, validate=False)}
+    if full_resolution_key:
+        captured.update(full_data=pio.to_json(fig, validate=False), full_resolution_key=full_resolution_key)
+    _plot_figures.append(captured)
 pio.show = show
 """
         if BAMBOO_PLOT_FORMAT == 'html':
-            self.patch_code = self.html_patch_code
+            self.patch_code = self.plot_settings_code + self.html_patch_code
         elif BAMBOO_PLOT_FORMAT == 'json':
-            self.patch_code = self.json_patch_code
+            self.patch_code = self.plot_settings_code + self.json_patch_code
 
         self.plot_format = BAMBOO_PLOT_FORMAT
 
-        # Cross-platform directory handling
-        if not os.path.isdir(self.plots_dir):
-            try:
-                os.makedirs(self.plots_dir)
-            except Exception:
-                # If directory creation fails for any reason but directory exists
-                if not os.path.isdir(self.plots_dir):
-                    raise  # Re-raise if directory doesn't exist
-
         if self.webui:
+            # matplotlib (like pyarrow) is imported on first use rather than at module level, to keep the package import fast
+            import matplotlib
             matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
             plt.ioff()
 
     def log_to_file(self, message):
@@ -98,21 +156,218 @@ pio.show = show
         with open(LOG_FILE, 'a') as f:
             f.write(f"[INFO] {timestamp} - {message}\n")
 
-    def execute(self, code, df=None, df_id=None, generated_datasets_path=None):
+    def cancel(self):
+        """Stop the running execution, and any execution started before reset_cancel() is called"""
+        self.cancel_event.set()
+        if self.mode == 'api' and self._api_execution_id is not None:
+            self.api_client.cancel_execution(self._api_execution_id)
+
+    def reset_cancel(self):
+        self.cancel_event.clear()
+
+    def _limits(self):
+        return {
+            'wall_time': EXECUTION_WALL_TIME_LIMIT,
+            'cpu_time': EXECUTION_CPU_TIME_LIMIT,
+            'max_memory': EXECUTION_MEMORY_LIMIT_MB * 1024 * 1024
+        }
+
+    def _image_policy(self):
+        return {
+            'format': PLOT_IMAGE_FORMAT,
+            'dpi': PLOT_IMAGE_DPI,
+            'max_pixels': PLOT_IMAGE_MAX_PIXELS
+        }
+
+    def execute(self, code, df=None, df_id=None, generated_datasets_path=None, aux_file_paths=None):
+        self.last_execution_cached = False
+        self.last_execution_cancelled = False
+        self.last_resource_usage = {}
+        self.last_profile = None
+        if self.cancel_event.is_set():
+            self.last_execution_cancelled = True
+            return df, None, "ExecutionCancelled: The code execution was stopped by the user.", [], []
+
+        cache_key = self._cache_key(code, df, df_id, aux_file_paths)
+        if cache_key is not None:
+            cached = self._cached_result(cache_key, df)
+            if cached is not None:
+                return cached
+
         # Store the original DataFrame for resetting if needed
         self._original_df = df.copy() if df is not None else None
 
         if self.mode == 'local':
-            return self._execute_local(code, df, generated_datasets_path)
+            result = self._execute_local(code, df, generated_datasets_path, aux_file_paths)
         elif self.mode == 'api':
-            return self._execute_via_api_client(code, df, df_id, generated_datasets_path)
+            result = self._execute_via_api_client(code, df, df_id, generated_datasets_path)
         else:
             raise ValueError("Invalid mode. Choose 'local' or 'api'.")
-        
-    def _execute_local(self, code, df=None, generated_datasets_path=None):
+
+        if result[2] is None:
+            modified = self._update_dataset_version(code, df, df_id)
+            # The results of code modifying the dataset in place are never looked up again, as the dataset version changed
+            if cache_key is not None and not modified:
+                self._cache_result(cache_key, df, result)
+        return result
+
+    def _dataset_version(self, df, df_id):
+        if self.mode == 'api':
+            return self.remote_dataset_versions.get(df_id, 0)
+        return self.dataset_versions.version(df)
+
+    def _update_dataset_version(self, code, df, df_id):
+        """Give the dataset a new version if the code may have modified it, and return whether it did"""
+        if self.mode == 'api':
+            # The executor API keeps the dataframe the code leaves in df, so replacing it changes the dataset too
+            if not modifies_frame(code, rebinding=True):
+                return False
+            if df_id is not None:
+                self.remote_dataset_versions[df_id] = self.remote_dataset_versions.get(df_id, 0) + 1
+            return True
+        if not modifies_frame(code):
+            return False
+        if df is not None:
+            self.dataset_versions.bump(df)
+        return True
+
+    def _cache_key(self, code, df, df_id, aux_file_paths):
+        """The key of an execution in the result cache, or None if it can't be cached"""
+        if self.cache is None:
+            return None
+        code_hash = normalized_code_hash(code)
+        if code_hash is None or not is_deterministic(code):
+            self.log_to_file("Execution cache bypassed: the code is not deterministic")
+            return None
+        # The plotting patch (plot format, downsampling) shapes the cached plot payloads
+        # The auxiliary datasets and the local files the code reads by name are fingerprinted, other inputs aren't tracked
+        file_paths = list(aux_file_paths or []) + [path for path in read_files(code) if path not in (aux_file_paths or [])]
+        key = (code_hash, self.mode, df_id, self._dataset_version(df, df_id), file_fingerprints(file_paths), self.patch_code if self.webui else None)
+        return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+
+    def _cached_result(self, cache_key, df):
+        entry = self.cache.get(cache_key)
+        if entry is None:
+            return None
+        if self.mode == 'local' and not all(os.path.exists(path) for path in entry.generated_datasets):
+            # The generated files have been cleaned up since, so the code has to run again
+            self.cache.invalidate(cache_key)
+            return None
+        self.last_execution_cached = True
+        self.log_to_file(f"Execution cache hit: {cache_key[:12]}")
+        result_df = df
+        if entry.result_df is not None:
+            result_df = snapshot_value(entry.result_df)
+            self.dataset_versions.bump(result_df, entry.result_version)
+        return result_df, entry.results, None, [dict(plot) for plot in entry.plot_images], list(entry.generated_datasets)
+
+    def _cache_result(self, cache_key, df, result):
+        result_df, results, _, plot_images, generated_datasets = result
+        replaced = self.mode == 'local' and result_df is not df and result_df is not None
+        try:
+            entry = CachedExecution(
+                results,
+                [dict(plot) for plot in plot_images or []],
+                list(generated_datasets or []),
+                # A copy, so later in place changes of the returned dataframe don't reach the cache
+                result_df=snapshot_value(result_df) if replaced else None,
+                result_version=self.dataset_versions.version(result_df) if replaced else None
+            )
+        except Exception as e:
+            self.log_to_file(f"Execution not cached: {str(e)}")
+            return
+        self.cache.put(cache_key, entry)
+
+    def prepare(self, code, df=None, aux_file_paths=None):
+        """
+        Pre-flight work for code that is about to be executed, eg. while the rest of the LLM response is still streaming:
+        check the syntax, import the modules the code imports, compute the column projection, and ask the OS
+        to read the local auxiliary datasets the code references into its file cache.
+        """
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return
+        if self.mode == 'local':
+            for node in ast.walk(tree):
+                if isinstance(node, ast.Import):
+                    names = [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                    names = [node.module]
+                else:
+                    continue
+                for name in names:
+                    parts = name.split('.')
+                    top_level = parts[0]
+                    # Blacklisted modules (and their submodules) are never imported ahead, even if the code wasn't sanitised
+                    if any('.'.join(parts[:i]) in CODE_BLACKLIST for i in range(1, len(parts) + 1)):
+                        continue
+                    if name in sys.modules or top_level in PREPARE_SKIPPED_MODULES:
+                        continue
+                    try:
+                        if importlib.util.find_spec(top_level) is not None:
+                            importlib.import_module(name)
+                    except Exception:
+                        # The execution reports the import error
+                        pass
+            for path in aux_file_paths or []:
+                if path in code or os.path.basename(path) in code:
+                    self._read_ahead(path)
+            if COLUMN_PROJECTION:
+                self._projection(code, list(df.columns) if df is not None else None, aux_file_paths)
+
+    def _read_ahead(self, path):
+        try:
+            if hasattr(os, 'posix_fadvise'):
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+                finally:
+                    os.close(fd)
+            else:
+                with open(path, 'rb') as f:
+                    while f.read(1024 * 1024):
+                        pass
+        except OSError:
+            pass
+
+    def _projection(self, code, columns=None, aux_file_paths=None):
+        """The code with its auxiliary dataset reads projected, and the dataframe columns it references (None for all of them)"""
+        key = (code, tuple(columns) if columns is not None else None, tuple(aux_file_paths or []))
+        with self._projections_lock:
+            if key in self._projections:
+                return self._projections[key]
+        projection = referenced_columns(code, columns) if columns is not None else None
+        if projection is not None and len(projection) == len(columns):
+            projection = None
+        result = (project_file_reads(code, aux_file_paths), projection)
+        with self._projections_lock:
+            # Only the projection of the code that is about to run is kept
+            self._projections = {key: result}
+        return result
+
+    def _project(self, code, df=None, aux_file_paths=None):
+        """
+        Narrow the inputs of the code to the columns it references: the dataframe passed as 'df',
+        and the auxiliary dataset reads (a 'columns'/'usecols' argument is added to the pd.read_parquet/pd.read_csv calls).
+        Falls back to the full inputs whenever the code accesses columns dynamically or modifies df.
+        """
+        if not COLUMN_PROJECTION:
+            return code, df
+        try:
+            code, projection = self._projection(code, list(df.columns) if df is not None else None, aux_file_paths)
+            if projection is not None:
+                df = df[projection]
+        except Exception as e:
+            self.log_to_file(f"Column projection skipped: {str(e)}")
+        return code, df
+
+    def _execute_local(self, code, df=None, generated_datasets_path=None, aux_file_paths=None):
+        import matplotlib.pyplot as plt
+
         output_buffer = io.StringIO()
         plot_images = []
-        generated_files = []
+        plot_figures = []
 
         if generated_datasets_path is not None:
             if not os.path.isdir(generated_datasets_path):
@@ -121,68 +376,66 @@ pio.show = show
                 except Exception as e:
                     self.log_to_file(f"Error creating directory {generated_datasets_path}: {str(e)}")
 
+        exec_code, exec_df = self._project(code, df, aux_file_paths)
+        # Figures shown by skipped statements can't be replayed from the kernel: matplotlib keeps them in global state,
+        # and outside the web UI figures are displayed rather than captured
+        replayable = 'matplotlib' not in exec_code and 'seaborn' not in exec_code and (self.webui or ('.show(' not in exec_code and 'display(' not in exec_code))
+
+        guard = ExecutionGuard(cancel_event=self.cancel_event, **self._limits())
+        sampler = StackSampler() if PERFORMANCE_CORRECTION else contextlib.nullcontext()
+
         try:
             plt.close('all')
-            with redirect_stdout(output_buffer):
-
-                local_vars = {
-                    'df': df,
-                    '_plots_dir': self.plots_dir,
-                    '_generated_files': generated_files
-                }
-                
-                # Only apply patch if in webui mode
-                if self.webui:
-                    exec(self.patch_code + code, local_vars)
+            with guard, sampler, redirect_stdout(output_buffer):
+
+                if self.kernel is not None and replayable:
+                    local_vars = self.kernel.execute(
+                        exec_code,
+                        {'df': exec_df, **(self.helpers if self.webui else {})},
+                        output_buffer,
+                        state={'_plot_figures': plot_figures},
+                        prelude=self.patch_code if self.webui else '',
+                        key=(df, tuple(exec_df.columns) if exec_df is not None else None)
+                    )
+                    plot_figures = local_vars['_plot_figures']
                 else:
-                    exec(code, local_vars)
+                    local_vars = {
+                        'df': exec_df,
+                        '_plot_figures': plot_figures
+                    }
+
+                    # Only apply patch if in webui mode
+                    if self.webui:
+                        local_vars.update(self.helpers)
+                        exec(self.patch_code + exec_code, local_vars)
+                    else:
+                        exec(exec_code, local_vars)
                     
                 result_df = local_vars['df']
+                if result_df is exec_df:
+                    # The code didn't replace df, keep the full dataframe rather than the projection
+                    result_df = df
 
                 if self.webui:
-                    # Handle matplotlib figures
+                    # Handle matplotlib figures, the images are raw bytes
                     figs = [plt.figure(i) for i in plt.get_fignums()]
+                    plot_images.extend(capture_figures(figs, PLOT_IMAGE_FORMAT, PLOT_IMAGE_DPI, PLOT_IMAGE_MAX_PIXELS))
                     for fig in figs:
-                        if len(fig.axes) > 0:
-                            buf = io.BytesIO()
-                            fig.savefig(buf, format='png')
-                            buf.seek(0)
-                            plot_images.append({
-                                    'data': base64.b64encode(buf.getvalue()).decode('utf-8'),
-                                    'format': 'png'
-                                })
-                            buf.close()
                         plt.close(fig)
                     
-                    # Handle plotly figures
-                    if os.path.isdir(self.plots_dir):
-                        # Only process files we generated
-                        for file_path in sorted(generated_files):
-                            try:
-                                # First try UTF-8
-                                try:
-                                    with open(file_path, 'r', encoding='utf-8') as f:
-                                        file_content = f.read()
-                                except UnicodeDecodeError:
-                                    # If UTF-8 fails, read as latin-1 and encode back to UTF-8
-                                    with open(file_path, 'r', encoding='latin-1') as f:
-                                        raw_content = f.read()
-                                        # Convert to UTF-8
-                                        file_content = raw_content.encode('utf-8', errors='replace').decode('utf-8')
-                                
-                                # Validate JSON can be parsed before adding to plot_images
-                                if self.plot_format == 'json':
-                                    json.loads(file_content)  # This will raise an exception if JSON is invalid
-                                    
-                                plot_images.append({
-                                    'data': file_content,
-                                    'format': self.plot_format
-                                })
-                            except Exception as e:
-                                print(f"Error reading file {file_path}: {str(e)}")
-                                continue  # Skip this file and continue with others
+                    # Handle plotly figures, captured in the order they were shown
+                    for figure in plot_figures:
+                        plot_images.append({
+                            **figure,
+                            'format': self.plot_format
+                        })
 
             results = output_buffer.getvalue()
+            self.last_resource_usage = guard.usage
+            self.log_to_file(f"Execution resource usage: {format_usage(guard.usage)}")
+            if PERFORMANCE_CORRECTION and guard.usage['wall_time'] > PERFORMANCE_TIME_BUDGET:
+                self.last_profile = sampler.report(code, len(self.patch_code.split('\n')) - 1 if self.webui else 0)
+                self.log_to_file(f"Execution over the performance budget:\n{self.last_profile}")
 
             # Iterate over generated_datasets_path directory for any generated datasets.
             if generated_datasets_path is not None:
@@ -202,9 +455,20 @@ pio.show = show
 
             return result_df, results, None, plot_images, generated_datasets
 
-        except Exception as error:
+        except (Exception, ExecutionInterrupted) as error:
             exc_type, exc_value, tb = sys.exc_info()
             full_traceback = traceback.format_exc()
+            self.last_resource_usage = guard.usage
+            self.log_to_file(f"Execution resource usage: {format_usage(guard.usage)}")
+            if isinstance(error, ExecutionInterrupted):
+                self.last_execution_cancelled = guard.reason == 'cancelled'
+                self.log_to_file(f"Execution interrupted: {guard.reason}")
+                exec_traceback = f"{guard.describe()}\nResource usage: {format_usage(guard.usage)}\n"
+                if '<string>' in full_traceback:
+                    # Show where the code was when it was interrupted
+                    exec_traceback += "\n" + self.filter_exec_traceback(code, full_traceback, exc_type.__name__, "interrupted")
+                return self._original_df, None, exec_traceback, [], []
+
             exec_traceback = self.filter_exec_traceback(code, full_traceback, exc_type.__name__, str(exc_value))
 
             return self._original_df, None, exec_traceback, [], []
@@ -216,35 +480,55 @@ pio.show = show
 
     def _execute_via_api_client(self, code, df=None, df_id=None, generated_datasets_path=None):
         """Execute code via executor API client"""
+        self._api_execution_id = uuid.uuid4().hex
         try:
             response = self.api_client.execute_code(
                 code=code,
                 df_id=df_id,
                 patch_code=self.patch_code,
-                plots_dir=self.plots_dir,
                 plot_format=self.plot_format,
-                generated_datasets_path=generated_datasets_path
+                generated_datasets_path=generated_datasets_path,
+                execution_id=self._api_execution_id,
+                limits=self._limits(),
+                image_policy=self._image_policy(),
+                helpers=self.api_helpers
             )
+            self.last_resource_usage = response.get('resource_usage') or {}
+            self.last_execution_cancelled = response.get('interrupted') == 'cancelled'
+            self.log_to_file(f"Execution resource usage: {format_usage(self.last_resource_usage)}")
             
+            # Images come base64 encoded over the API, decode them to the raw bytes of a local execution
+            plot_images = response.get('plot_images', [])
+            for plot in plot_images:
+                if plot.get('format') in MIME_TYPES and isinstance(plot.get('data'), str):
+                    plot['data'] = base64.b64decode(plot['data'])
+
             return (
                 df,  # Return original df reference
                 response.get('results'),
                 response.get('error'),
-                response.get('plot_images', []),
+                plot_images,
                 response.get('generated_datasets', [])
             )
             
         except Exception as e:
             self.log_to_file(f"Error executing via API client: {str(e)}")
             return df, None, str(e), []
+        finally:
+            self._api_execution_id = None
 
     def _serialize_df(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
         buffer = io.BytesIO()
         pq.write_table(pa.Table.from_pandas(df), buffer)
         compressed = zlib.compress(buffer.getvalue())
         return base64.b64encode(compressed).decode('utf-8')
 
     def _deserialize_df(self, df_str):
+        import pyarrow.parquet as pq
+
         decompressed = zlib.decompress(base64.b64decode(df_str))
         buffer = io.BytesIO(decompressed)
         return pq.read_table(buffer).to_pandas()
@@ -0,0 +1,61 @@
+import threading
+
+from bambooai.messages import reg_ex
+
+
+class StreamedCode:
+    """
+    Watches a streaming LLM response (fed delta by delta), and as soon as its first python code block is complete,
+    starts working on the code in a background thread while the model is still writing its explanation. The code is
+    extracted and sanitised (blacklisted lines commented out) the same way as the final code, before any work starts:
+    - prepare(code): pre-flight work, eg. the executor's syntax check, module imports and column projection
+    - execute(code): optionally, the execution itself. Its result is only used if the code extracted from the
+      complete response is the same, see result(). Otherwise discard(result) undoes its side effects (eg. written files).
+    """
+
+    def __init__(self, analyst, provider, prepare=None, execute=None, discard=None):
+        self.analyst = analyst
+        self.provider = provider
+        self.prepare = prepare
+        self.execute = execute
+        self.discard = discard
+        self.code = None
+        self._chunks = []
+        self._thread = None
+        self._result = None
+
+    def feed(self, delta):
+        if self.code is not None or not delta:
+            return
+        self._chunks.append(delta)
+        # Only a delta with (a part of) a fence can complete a code block
+        if '`' not in delta and '|' not in delta:
+            return
+        response = ''.join(self._chunks)
+        self._chunks = [response]
+        code = reg_ex._extract_code(response, self.analyst, self.provider)
+        if code:
+            self.code = code
+            self._thread = threading.Thread(target=self._run, args=(code,), daemon=True)
+            self._thread.start()
+
+    def _run(self, code):
+        try:
+            if self.prepare is not None:
+                self.prepare(code)
+            if self.execute is not None:
+                self._result = self.execute(code)
+        except Exception:
+            # The work is redone when the code is executed
+            self._result = None
+
+    def result(self, code):
+        """Wait for the background work, and return the execution result if it was for this code, otherwise None"""
+        if self._thread is None:
+            return None
+        self._thread.join()
+        if code == self.code:
+            return self._result
+        if self._result is not None and self.discard is not None:
+            self.discard(self._result)
+        return None
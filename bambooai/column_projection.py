@@ -0,0 +1,384 @@
+import ast
+import csv
+import os
+import re
+
+import pandas as pd
+
+# Methods returning a frame with (a subset of) the same columns, that can be chained without needing the other columns
+FRAME_METHODS = {
+    'copy', 'sort_values', 'sort_index', 'reset_index', 'set_index', 'fillna', 'query', 'head', 'tail', 'sample',
+    'nlargest', 'nsmallest', 'dropna', 'drop_duplicates', 'astype', 'round', 'between_time', 'at_time'
+}
+# Frame methods which look at every column unless given a subset
+SUBSET_METHODS = {'dropna', 'drop_duplicates'}
+GROUPING_METHODS = {'groupby', 'resample', 'rolling', 'expanding'}
+INDEXERS = {'loc', 'iloc', 'at', 'iat'}
+# Attributes and calls that don't depend on the columns
+NEUTRAL_ATTRIBUTES = {'index', 'empty'}
+NEUTRAL_FUNCTIONS = {'len', 'isinstance', 'id', 'type'}
+GROUPBY_NEUTRAL = {'size', 'ngroups', 'groups', 'indices', 'ngroup', 'cumcount'}
+DYNAMIC_FUNCTIONS = {'eval', 'exec', 'globals', 'locals', 'vars', 'getattr'}
+# Methods that modify a dataframe in place without an inplace argument
+INPLACE_METHODS = {'insert', 'pop', 'update', '__setitem__', '__delitem__'}
+READERS = {'read_parquet': 'columns', 'read_csv': 'usecols'}
+
+IDENTIFIER_RE = re.compile(r'`([^`]+)`|([A-Za-z_]\w*)')
+
+
+class _FrameScan:
+    """
+    Follows every use of a dataframe (and of the names it's assigned to) through the code, collecting the columns it reads.
+    Any use that may need columns not named in the code (eg. print(df), df.columns, df[variable], df.describe()) marks the scan as dynamic.
+    """
+
+    def __init__(self, tree, parents, columns, names=(), nodes=()):
+        self.tree = tree
+        self.parents = parents
+        self.columns = set(columns)
+        self.roots = {name: ('frame', True) for name in names}
+        self.aliases = dict(self.roots)
+        self.root_nodes = list(nodes)
+        self.referenced = set()
+        self.dynamic = False
+        self.mutated = False
+
+    def run(self):
+        # Aliases (eg. data = df.copy()) are discovered while scanning, so scan until they stop changing
+        for _ in range(10):
+            known = dict(self.aliases)
+            self.referenced, self.dynamic, self.mutated = set(), False, False
+            for node in self.root_nodes:
+                self._follow(node, 'frame', False)
+            for node in ast.walk(self.tree):
+                if isinstance(node, ast.Name) and node.id in self.aliases:
+                    if isinstance(node.ctx, ast.Load):
+                        kind, same = self.aliases[node.id]
+                        self._follow(node, kind, same)
+                    elif node.id in self.roots:
+                        # The frame itself is reassigned
+                        self.mutated = True
+                elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in DYNAMIC_FUNCTIONS:
+                    self.dynamic = True
+            if self.aliases == known:
+                break
+        else:
+            self.dynamic = True
+        return self
+
+    def _record(self, node):
+        for child in ast.walk(node):
+            if isinstance(child, ast.Constant) and isinstance(child.value, str) and child.value in self.columns:
+                self.referenced.add(child.value)
+
+    def _record_query(self, node):
+        for child in ast.walk(node):
+            if isinstance(child, ast.Constant) and isinstance(child.value, str):
+                for quoted, name in IDENTIFIER_RE.findall(child.value):
+                    if (quoted or name) in self.columns:
+                        self.referenced.add(quoted or name)
+
+    @staticmethod
+    def _is_str(node):
+        return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+    def _is_str_list(self, node):
+        return isinstance(node, (ast.List, ast.Tuple)) and all(self._is_str(element) for element in node.elts)
+
+    @staticmethod
+    def _is_literal(node):
+        try:
+            ast.literal_eval(node)
+            return True
+        except (ValueError, TypeError, SyntaxError, MemoryError, RecursionError):
+            return False
+
+    def _alias(self, parent, kind, same):
+        if not all(isinstance(target, ast.Name) for target in parent.targets):
+            self.dynamic = True
+            return
+        for target in parent.targets:
+            if self.aliases.get(target.id, (kind, same)) != (kind, same):
+                self.dynamic = True
+            self.aliases[target.id] = (kind, same)
+
+    def _follow(self, node, kind, same):
+        while not self.dynamic:
+            parent = self.parents.get(node)
+            if kind == 'frame':
+                if isinstance(parent, ast.Subscript) and parent.value is node:
+                    key = parent.slice
+                    if not isinstance(parent.ctx, ast.Load):
+                        # df['new'] = ... or del df['col']
+                        self.mutated = self.mutated or same
+                        self._record(key)
+                        return
+                    if self._is_str(key):
+                        self._record(key)
+                        return
+                    if self._is_str_list(key):
+                        self._record(key)
+                    elif isinstance(key, (ast.Name, ast.Constant, ast.Attribute, ast.Lambda)):
+                        # A column held in a variable, or a positional key
+                        self.dynamic = True
+                        return
+                    # Otherwise a row filter or slice, the inner references are followed on their own
+                    node, same = parent, False
+                    continue
+                if isinstance(parent, ast.Attribute) and parent.value is node:
+                    if not isinstance(parent.ctx, ast.Load):
+                        self.dynamic = True
+                        return
+                    attr = parent.attr
+                    # A dataframe attribute wins over a column of the same name (df.count() with a 'count' column)
+                    if attr in self.columns and not hasattr(pd.DataFrame, attr):
+                        self.referenced.add(attr)
+                        return
+                    if attr in NEUTRAL_ATTRIBUTES:
+                        return
+                    if attr in INDEXERS:
+                        node, kind = parent, f'indexer:{attr}'
+                        continue
+                    if attr in FRAME_METHODS or attr in GROUPING_METHODS:
+                        call = self.parents.get(parent)
+                        if not (isinstance(call, ast.Call) and call.func is parent):
+                            self.dynamic = True
+                            return
+                        # Only literal arguments name their columns, eg. a column in a variable (df.groupby(col)) may be any column
+                        if not all(self._is_literal(arg) for arg in call.args + [keyword.value for keyword in call.keywords]):
+                            self.dynamic = True
+                            return
+                        if attr in SUBSET_METHODS and not call.args and not any(keyword.arg == 'subset' for keyword in call.keywords):
+                            self.dynamic = True
+                            return
+                        if attr == 'query':
+                            self._record_query(call)
+                        else:
+                            self._record(call)
+                        if any(keyword.arg == 'inplace' and not (isinstance(keyword.value, ast.Constant) and keyword.value.value is False) for keyword in call.keywords):
+                            self.mutated = self.mutated or same
+                            return
+                        node, kind, same = call, 'groupby' if attr in GROUPING_METHODS else 'frame', False
+                        continue
+                    self.dynamic = True
+                    return
+                if isinstance(parent, ast.Assign) and parent.value is node:
+                    self._alias(parent, kind, same)
+                    return
+                if isinstance(parent, ast.Expr):
+                    return
+                if isinstance(parent, ast.Call) and node in parent.args and isinstance(parent.func, ast.Name) and parent.func.id in NEUTRAL_FUNCTIONS:
+                    return
+                self.dynamic = True
+                return
+
+            if kind.startswith('indexer:'):
+                indexer = kind.split(':')[1]
+                if not (isinstance(parent, ast.Subscript) and parent.value is node):
+                    self.dynamic = True
+                    return
+                key = parent.slice
+                rows, cols = (key.elts[0], key.elts[1]) if isinstance(key, ast.Tuple) and len(key.elts) == 2 else (key, None)
+                store = not isinstance(parent.ctx, ast.Load)
+                self.mutated = self.mutated or (store and same)
+                if isinstance(rows, ast.Lambda):
+                    self.dynamic = True
+                    return
+                if cols is None:
+                    if store:
+                        # Assigning whole rows touches every column
+                        self.dynamic = True
+                        return
+                    if isinstance(rows, (ast.Constant, ast.UnaryOp)):
+                        # A single row, eg. df.iloc[0]
+                        node, kind = parent, 'row'
+                        continue
+                    node, kind, same = parent, 'frame', False
+                    continue
+                if indexer in ('iloc', 'iat') or not (self._is_str(cols) or self._is_str_list(cols)):
+                    self.dynamic = True
+                    return
+                self._record(cols)
+                if store or self._is_str(cols):
+                    return
+                node, kind, same = parent, 'frame', False
+                continue
+
+            if kind == 'row':
+                if isinstance(parent, ast.Subscript) and parent.value is node and self._is_str(parent.slice):
+                    self._record(parent.slice)
+                    return
+                self.dynamic = True
+                return
+
+            if kind == 'groupby':
+                if isinstance(parent, ast.Subscript) and parent.value is node:
+                    if self._is_str(parent.slice) or self._is_str_list(parent.slice):
+                        self._record(parent.slice)
+                        return
+                    self.dynamic = True
+                    return
+                if isinstance(parent, ast.Attribute) and parent.value is node:
+                    if parent.attr in GROUPBY_NEUTRAL:
+                        return
+                    call = self.parents.get(parent)
+                    if parent.attr in ('agg', 'aggregate') and isinstance(call, ast.Call) and call.func is parent:
+                        # Only a dict, or named aggregation, lists the aggregated columns
+                        if (call.args and isinstance(call.args[0], ast.Dict)) or (not call.args and call.keywords):
+                            self._record(call)
+                            return
+                    self.dynamic = True
+                    return
+                if isinstance(parent, ast.Assign) and parent.value is node:
+                    self._alias(parent, kind, False)
+                    return
+                self.dynamic = True
+                return
+
+            self.dynamic = True
+            return
+
+
+def _parse(code):
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None, None
+    parents = {}
+    for node in ast.walk(tree):
+        for child in ast.iter_child_nodes(node):
+            parents[child] = node
+    return tree, parents
+
+
+def referenced_columns(code, columns, name='df'):
+    """
+    The columns of the dataframe `name` that the code reads, in the dataframe's column order.
+    Returns None when the code needs the full frame: a dynamic access, or the frame itself being modified or reassigned
+    (the executor keeps the modified frame, so it must not be a projection).
+    """
+    tree, parents = _parse(code)
+    if tree is None:
+        return None
+    scan = _FrameScan(tree, parents, columns, names=[name]).run()
+    if scan.dynamic or scan.mutated or not scan.referenced:
+        return None
+    return [column for column in columns if column in scan.referenced]
+
+
+def _root_name(node):
+    while isinstance(node, (ast.Subscript, ast.Attribute)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def modifies_frame(code, name='df', rebinding=False):
+    """
+    Whether the code may modify the dataframe `name` in place: an assignment or deletion through it or one of its aliases
+    (df['col'] = ..., df.loc[...] = ..., del df['col']), an inplace=True call, one of the in place methods, setattr, or
+    passing it to a function or class defined in the code (which may do any of these to its parameter).
+    With rebinding, assigning a new dataframe to the name counts too. Returns True if the code can't be parsed.
+    """
+    tree, _ = _parse(code)
+    if tree is None:
+        return True
+    # Plain aliases (data = df) refer to the same object
+    aliases = {name}
+    changed = True
+    while changed:
+        changed = False
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Name) and node.value.id in aliases:
+                for target in node.targets:
+                    if isinstance(target, ast.Name) and target.id not in aliases:
+                        aliases.add(target.id)
+                        changed = True
+    user_defined = {node.name for node in ast.walk(tree) if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+    user_defined |= {
+        target.id for node in ast.walk(tree) if isinstance(node, ast.Assign) and isinstance(node.value, ast.Lambda)
+        for target in node.targets if isinstance(target, ast.Name)
+    }
+
+    def passes_frame(call):
+        arguments = [arg.value if isinstance(arg, ast.Starred) else arg for arg in call.args] + [keyword.value for keyword in call.keywords]
+        return any(isinstance(arg, ast.Name) and arg.id in aliases for arg in arguments)
+
+    for node in ast.walk(tree):
+        if rebinding and isinstance(node, ast.Name) and node.id == name and isinstance(node.ctx, (ast.Store, ast.Del)):
+            return True
+        if isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            if _root_name(node.value) in aliases:
+                return True
+        elif isinstance(node, ast.AugAssign) and isinstance(node.target, ast.Name) and node.target.id in aliases:
+            return True
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in user_defined | {'setattr', 'delattr'} and passes_frame(node):
+            return True
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and _root_name(node.func.value) in aliases:
+            if node.func.attr in INPLACE_METHODS:
+                return True
+            if any(keyword.arg == 'inplace' and not (isinstance(keyword.value, ast.Constant) and keyword.value.value is False) for keyword in node.keywords):
+                return True
+    return False
+
+
+def _file_columns(path):
+    """Column names of a local .parquet or .csv file, reading only the schema or the header row"""
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_schema(path).names
+    with open(path, newline='', encoding='utf-8', errors='replace') as f:
+        return next(csv.reader(f), [])
+
+
+def project_file_reads(code, file_paths):
+    """
+    Add a column selection to the pd.read_parquet / pd.read_csv calls that load one of the (local) file_paths,
+    when the loaded frame is only used through columns named in the code. The call is edited in place in the source,
+    so line numbers (and error tracebacks) are unchanged. Returns the code, unchanged if nothing could be projected.
+    """
+    local_paths = {os.path.normpath(path): path for path in file_paths or [] if os.path.isfile(path)}
+    if not local_paths:
+        return code
+    tree, parents = _parse(code)
+    if tree is None:
+        return code
+
+    insertions = []
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in READERS):
+            continue
+        if not (node.args and isinstance(node.args[0], ast.Constant) and isinstance(node.args[0].value, str)):
+            continue
+        path = local_paths.get(os.path.normpath(node.args[0].value))
+        keyword = READERS[node.func.attr]
+        if path is None or len(node.args) > 1 or any(kw.arg in (keyword, None) for kw in node.keywords):
+            continue
+        try:
+            columns = _file_columns(path)
+        except Exception:
+            continue
+        scan = _FrameScan(tree, parents, columns, nodes=[node]).run()
+        if scan.dynamic or not scan.referenced or len(scan.referenced) == len(set(columns)):
+            continue
+        projection = [column for column in columns if column in scan.referenced]
+        insertions.append((node.end_lineno, node.end_col_offset - 1, f"{keyword}={projection!r}"))
+
+    if not insertions:
+        return code
+    lines = code.splitlines(keepends=True)
+    line_starts = [0]
+    for line in lines:
+        line_starts.append(line_starts[-1] + len(line))
+    projected = code
+    # Insert from the end, so earlier offsets stay valid
+    for lineno, col, argument in sorted(insertions, reverse=True):
+        # The AST column offsets are in utf-8 bytes
+        offset = line_starts[lineno - 1] + len(lines[lineno - 1].encode('utf-8')[:col].decode('utf-8'))
+        before, after = projected[:offset], projected[offset:]
+        separator = '' if before.rstrip().endswith(('(', ',')) else ', '
+        projected = f"{before}{separator}{argument}{after}"
+    try:
+        ast.parse(projected)
+    except SyntaxError:
+        return code
+    return projected
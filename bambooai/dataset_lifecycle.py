@@ -0,0 +1,258 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+# Byte quotas of the generated datasets of a thread and of a user, in MB.
+# When a quota is exceeded, the oldest chains are removed. 0 disables a quota.
+GENERATED_DATASETS_THREAD_QUOTA_MB = int(os.getenv('GENERATED_DATASETS_THREAD_QUOTA_MB', '512'))
+GENERATED_DATASETS_USER_QUOTA_MB = int(os.getenv('GENERATED_DATASETS_USER_QUOTA_MB', '2048'))
+# Generated datasets not updated for this many hours are removed by the janitor, 0 disables the expiry
+GENERATED_DATASETS_TTL_HOURS = float(os.getenv('GENERATED_DATASETS_TTL_HOURS', '72'))
+# Seconds between the janitor's runs
+GENERATED_DATASETS_JANITOR_INTERVAL = float(os.getenv('GENERATED_DATASETS_JANITOR_INTERVAL', '600'))
+# File format the generated code is asked to save its datasets in: csv or parquet
+GENERATED_DATASETS_FORMAT = os.getenv('GENERATED_DATASETS_FORMAT', 'csv').lower()
+
+INDEX_FILE = 'index.json'
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(root, favourites_dir=None):
+    """
+    The GeneratedDatasets of a root folder, shared by the BambooAI instances and the web app.
+    Its janitor is started with it, so every root gets the expiry.
+    """
+    key = os.path.abspath(root)
+    with _managers_lock:
+        if key not in _managers:
+            _managers[key] = GeneratedDatasets(root, favourites_dir)
+            _managers[key].start_janitor()
+        return _managers[key]
+
+
+class GeneratedDatasets:
+    """
+    Lifecycle of the datasets generated by the code, stored as <root>/<thread_id>/<chain_id>/<file>.
+    The chains are recorded in an index with the sizes of their files when they are registered after an execution,
+    so the quotas, the expiry and the listing of the files don't walk the directories. The index is kept in
+    <root>/index.json, rebuilt from the directories when it's missing, and reconciled with the chain folders on disk
+    by the janitor, so folders that were never registered are expired too.
+    Threads with a folder in favourites_dir are never removed.
+    """
+
+    def __init__(self, root, favourites_dir=None, thread_quota=None, user_quota=None, ttl=None):
+        self.root = root
+        self.favourites_dir = favourites_dir
+        self.thread_quota = (GENERATED_DATASETS_THREAD_QUOTA_MB if thread_quota is None else thread_quota) * 1024 * 1024
+        self.user_quota = (GENERATED_DATASETS_USER_QUOTA_MB if user_quota is None else user_quota) * 1024 * 1024
+        self.ttl = (GENERATED_DATASETS_TTL_HOURS * 3600) if ttl is None else ttl
+        # (thread_id, chain_id) -> {'files': {relative path: bytes}, 'updated': timestamp}
+        self._chains = {}
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._cleanup_before = None
+        self._janitor = None
+        self._load()
+
+    def _index_path(self):
+        return os.path.join(self.root, INDEX_FILE)
+
+    def _load(self):
+        try:
+            with open(self._index_path(), encoding='utf-8') as f:
+                chains = json.load(f)
+            self._chains = {tuple(key.split('/', 1)): chain for key, chain in chains.items()}
+        except (OSError, ValueError):
+            self._rebuild()
+
+    def _rebuild(self):
+        """Index the chain folders already on disk"""
+        self._chains = {}
+        self.reconcile()
+        self._save()
+
+    def _chain_folders(self):
+        """Keys of the chain folders on disk, from the directory listings only"""
+        if not os.path.isdir(self.root):
+            return set()
+        folders = set()
+        for thread_id in os.listdir(self.root):
+            thread_dir = os.path.join(self.root, thread_id)
+            if not os.path.isdir(thread_dir):
+                continue
+            for chain_id in os.listdir(thread_dir):
+                if os.path.isdir(os.path.join(thread_dir, chain_id)):
+                    folders.add((thread_id, chain_id))
+        return folders
+
+    def reconcile(self):
+        """
+        Bring the index in line with the chain folders on disk: index the folders that were never registered (eg. written
+        by an execution that failed, or by another process) with their modification time, and drop the chains whose folder
+        is gone. Only the files of the unregistered folders are walked.
+        Returns the number of chains added and dropped.
+        """
+        with self._lock:
+            folders = self._chain_folders()
+            added = folders - set(self._chains)
+            dropped = set(self._chains) - folders
+            for key in added:
+                chain_dir = self._chain_dir(key)
+                try:
+                    self._chains[key] = {'files': _chain_files(chain_dir), 'updated': os.path.getmtime(chain_dir)}
+                except OSError:
+                    pass
+            for key in dropped:
+                del self._chains[key]
+            if added or dropped:
+                self._save()
+        return len(added) + len(dropped)
+
+    def _save(self):
+        if not os.path.isdir(self.root):
+            return
+        chains = {f'{thread_id}/{chain_id}': chain for (thread_id, chain_id), chain in self._chains.items()}
+        tmp_path = f'{self._index_path()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(chains, f)
+            os.replace(tmp_path, self._index_path())
+        except OSError:
+            pass
+
+    def _favourites(self):
+        if not self.favourites_dir or not os.path.isdir(self.favourites_dir):
+            return set()
+        return {d for d in os.listdir(self.favourites_dir) if os.path.isdir(os.path.join(self.favourites_dir, d))}
+
+    def _chain_dir(self, key):
+        return os.path.join(self.root, *key)
+
+    def register(self, chain_dir):
+        """
+        Record the files of a chain folder after an execution, and remove the oldest chains of the thread and of the user
+        while a quota is exceeded. The chain itself and the favourite threads are kept.
+        Returns the number of chains removed.
+        """
+        thread_dir, chain_id = os.path.split(os.path.normpath(chain_dir))
+        key = (os.path.basename(thread_dir), chain_id)
+        files = _chain_files(chain_dir) if os.path.isdir(chain_dir) else {}
+        with self._lock:
+            if files:
+                self._chains[key] = {'files': files, 'updated': time.time()}
+            else:
+                self._chains.pop(key, None)
+            removed = self._enforce_quotas(key)
+            self._save()
+        return removed
+
+    def _enforce_quotas(self, keep):
+        favourites = self._favourites()
+        removed = 0
+        for quota, in_scope in ((self.thread_quota, lambda key: key[0] == keep[0]), (self.user_quota, lambda key: True)):
+            if not quota:
+                continue
+            candidates = sorted(
+                (key for key in self._chains if in_scope(key) and key != keep and key[0] not in favourites),
+                key=lambda key: self._chains[key]['updated']
+            )
+            usage = sum(self._size(key) for key in self._chains if in_scope(key))
+            for key in candidates:
+                if usage <= quota:
+                    break
+                usage -= self._size(key)
+                self._remove(key)
+                removed += 1
+        return removed
+
+    def _size(self, key):
+        return sum(self._chains[key]['files'].values())
+
+    def _remove(self, key):
+        shutil.rmtree(self._chain_dir(key), ignore_errors=True)
+        self._chains.pop(key, None)
+        thread_dir = os.path.join(self.root, key[0])
+        try:
+            os.rmdir(thread_dir)
+        except OSError:
+            pass
+
+    def usage(self, thread_id=None):
+        """Bytes of the generated datasets of a thread, or of all threads"""
+        with self._lock:
+            return sum(self._size(key) for key in self._chains if thread_id is None or key[0] == thread_id)
+
+    def files(self, thread_id=None, chain_id=None):
+        """Paths of the generated files, from the index"""
+        with self._lock:
+            return [
+                os.path.join(self._chain_dir(key), name)
+                for key, chain in self._chains.items()
+                if (thread_id is None or key[0] == thread_id) and (chain_id is None or key[1] == chain_id)
+                for name in chain['files']
+            ]
+
+    def expire(self, before):
+        """Remove the chains last updated before the timestamp, except those of the favourite threads"""
+        favourites = self._favourites()
+        with self._lock:
+            expired = [key for key, chain in self._chains.items() if chain['updated'] < before and key[0] not in favourites]
+            for key in expired:
+                self._remove(key)
+            if expired:
+                self._save()
+        return len(expired)
+
+    def request_cleanup(self):
+        """Have the janitor remove all the chains registered so far (except the favourites), without waiting for it"""
+        self._cleanup_before = time.time()
+        if self._janitor is not None:
+            self._wake.set()
+        else:
+            self.expire(self._cleanup_before)
+            self._cleanup_before = None
+
+    def start_janitor(self, interval=None):
+        """Start the background thread that expires the chains older than the TTL and runs the requested cleanups"""
+        if self._janitor is None:
+            interval = GENERATED_DATASETS_JANITOR_INTERVAL if interval is None else interval
+            self._janitor = threading.Thread(target=self._janitor_loop, args=(interval,), daemon=True)
+            self._janitor.start()
+        return self._janitor
+
+    def _janitor_loop(self, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            self.reconcile()
+            cleanup_before, self._cleanup_before = self._cleanup_before, None
+            if cleanup_before is not None:
+                self.expire(cleanup_before)
+            if self.ttl:
+                self.expire(time.time() - self.ttl)
+
+
+def _chain_files(chain_dir):
+    """Sizes of the files of a chain folder (including any sub-folders) by relative path"""
+    files = {}
+    for directory, _, filenames in os.walk(chain_dir):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            try:
+                files[os.path.relpath(path, chain_dir)] = os.path.getsize(path)
+            except OSError:
+                pass
+    return files
+
+
+def path_instruction(generated_datasets_path):
+    """Where, and in which format, the generated code should save its datasets"""
+    if not generated_datasets_path:
+        return ""
+    if GENERATED_DATASETS_FORMAT == 'parquet':
+        return f"{generated_datasets_path}/<descriptive_name>.parquet (save it with DataFrame.to_parquet rather than as CSV)"
+    return f"{generated_datasets_path}/<descriptive_name>.csv"
@@ -0,0 +1,196 @@
+import ast
+import hashlib
+import os
+import sys
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+
+# Code using these modules, or calling these functions, gives different results on each run, so it is never cached
+NONDETERMINISTIC_MODULES = {
+    'random', 'secrets', 'uuid', 'time', 'requests', 'urllib', 'urllib3', 'http', 'httpx', 'aiohttp', 'socket',
+    'yfinance', 'subprocess'
+}
+NONDETERMINISTIC_CALLS = {
+    'now', 'today', 'utcnow', 'random', 'rand', 'randn', 'randint', 'random_sample', 'choice', 'shuffle', 'permutation',
+    'default_rng', 'input', 'urlopen'
+}
+NONDETERMINISTIC_STRINGS = {'now', 'today'}
+
+
+def normalized_code_hash(code):
+    """Hash of the code's syntax tree, so formatting and comments don't change it. None if the code can't be parsed."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return None
+    return hashlib.sha256(ast.dump(tree).encode('utf-8')).hexdigest()
+
+
+def is_deterministic(code):
+    """Whether running the code again on the same inputs gives the same results (no randomness, clock or network access)"""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return False
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split('.')[0] in NONDETERMINISTIC_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if (node.module or '').split('.')[0] in NONDETERMINISTIC_MODULES:
+                return False
+        elif isinstance(node, ast.Call):
+            func = node.func
+            name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+            if name in NONDETERMINISTIC_CALLS:
+                return False
+            if name == 'sample' and not any(keyword.arg == 'random_state' for keyword in node.keywords):
+                return False
+            # pd.Timestamp('now'), pd.to_datetime('today')
+            if any(isinstance(arg, ast.Constant) and arg.value in NONDETERMINISTIC_STRINGS for arg in node.args):
+                return False
+        elif isinstance(node, ast.Attribute) and node.attr == 'random':
+            # np.random.* and random.* through an alias
+            return False
+    return True
+
+
+def read_files(code):
+    """
+    Local files the code reads by a literal path (pd.read_*(path), open(path) for reading), so their changes invalidate the
+    cached executions too. Paths built at run time aren't found.
+    """
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    paths = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not node.args:
+            continue
+        path = node.args[0]
+        if not (isinstance(path, ast.Constant) and isinstance(path.value, str)):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else func.id if isinstance(func, ast.Name) else None
+        if name == 'open':
+            mode = node.args[1] if len(node.args) > 1 else next((keyword.value for keyword in node.keywords if keyword.arg == 'mode'), None)
+            if mode is not None and not (isinstance(mode, ast.Constant) and mode.value in ('r', 'rb', 'rt')):
+                continue
+        elif not (name or '').startswith('read_'):
+            continue
+        if os.path.isfile(path.value):
+            paths.add(path.value)
+    return sorted(paths)
+
+
+def file_fingerprints(file_paths):
+    """(path, size, mtime) of the local files, so a changed auxiliary dataset invalidates the cached executions that read it"""
+    fingerprints = []
+    for path in file_paths or []:
+        try:
+            stat = os.stat(path)
+            fingerprints.append((path, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            fingerprints.append((path, None, None))
+    return tuple(fingerprints)
+
+
+class DatasetVersions:
+    """
+    Version tokens of dataset objects (DataFrames, LazyFrames), by identity: a new object gets a new version,
+    and bump() gives an object modified in place a new one. Objects aren't kept alive by their version.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def version(self, obj):
+        if obj is None:
+            return None
+        with self._lock:
+            entry = self._versions.get(id(obj))
+            if entry is not None and entry[0]() is obj:
+                return entry[1]
+        return self.bump(obj)
+
+    def bump(self, obj, version=None):
+        """Give the object a new version, or the given one"""
+        version = version or uuid.uuid4().hex
+        key = id(obj)
+
+        def forget(ref, key=key):
+            with self._lock:
+                if self._versions.get(key, (None,))[0] is ref:
+                    del self._versions[key]
+
+        try:
+            ref = weakref.ref(obj, forget)
+        except TypeError:
+            # Not weak referenceable, so its identity can't be tracked: every call gets a new version
+            return version
+        with self._lock:
+            self._versions[key] = (ref, version)
+        return version
+
+
+class CachedExecution:
+    def __init__(self, results, plot_images, generated_datasets, result_df=None, result_version=None):
+        self.results = results
+        self.plot_images = plot_images
+        self.generated_datasets = generated_datasets
+        # The dataframe left by the code, when it replaced the input one
+        self.result_df = result_df
+        self.result_version = result_version
+        self.size = self._size()
+
+    def _size(self):
+        size = sys.getsizeof(self.results or '')
+        for plot in self.plot_images:
+            size += sum(sys.getsizeof(value) for value in plot.values())
+        size += sum(sys.getsizeof(path) for path in self.generated_datasets)
+        if self.result_df is not None:
+            try:
+                size += int(self.result_df.memory_usage(deep=True).sum())
+            except Exception:
+                pass
+        return size
+
+
+class ExecutionCache:
+    """In-memory LRU cache of successful code executions, bounded by the approximate size of the cached results in bytes"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = entry
+            self.size += entry.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def invalidate(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.size -= entry.size
@@ -0,0 +1,154 @@
+import ast
+import copy
+import hashlib
+import sys
+import types
+
+# Executed statements report the filename exec uses for code strings, which the executor's traceback filter looks for
+FILENAME = '<string>'
+
+# Values that can be shared between snapshots as they are
+_IMMUTABLE_TYPES = (
+    type(None), bool, int, float, complex, str, bytes, range, frozenset,
+    types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type
+)
+
+
+def _copy_on_write(pd):
+    try:
+        return int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+    except Exception:
+        return False
+
+
+def snapshot_value(value):
+    """
+    A copy of a namespace value that later statements can't modify. Pandas objects are copied shallowly under copy-on-write,
+    so a snapshot doesn't duplicate the data. Raises if the value can't be copied.
+    """
+    if isinstance(value, _IMMUTABLE_TYPES):
+        return value
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        if isinstance(value, pd.Index):
+            return value
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return value.copy(deep=not _copy_on_write(pd))
+    lazy_frame = sys.modules.get('bambooai.lazy_frame')
+    if lazy_frame is not None and isinstance(value, lazy_frame.LazyFrame):
+        return value.copy(deep=not (pd is not None and _copy_on_write(pd)))
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(value, np.ndarray):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def _key_repr(key):
+    """Plain values are keyed by value, objects (eg. the input dataframe) by identity"""
+    return repr(tuple(item if isinstance(item, (type(None), bool, int, float, str, tuple)) else f'id:{id(item)}' for item in key))
+
+
+class _Entry:
+    def __init__(self, key, snapshot, output):
+        self.key = key
+        self.snapshot = snapshot
+        self.output = output
+
+
+class ExecutionKernel:
+    """
+    A namespace kept alive between executions, that runs code one top-level statement at a time.
+    After each statement the namespace is snapshotted, keyed by the hash of the statements so far and the identity of the inputs.
+    When the next code starts with the same statements (eg. an error correction changing only the last lines),
+    the namespace is restored from the last matching snapshot, and only the statements from the first changed one are executed.
+    The output printed by the skipped statements is replayed.
+    """
+
+    def __init__(self):
+        self.namespace = {}
+        self._entries = []
+        self._key = ()
+
+    def reset(self):
+        self.namespace.clear()
+        self._entries = []
+        self._key = ()
+
+    def _snapshot(self, inputs):
+        """Snapshot the namespace. Objects passed in as inputs are recorded by name, so a resumed run gets its own inputs."""
+        snapshot = {}
+        for name, value in self.namespace.items():
+            if name == '__builtins__':
+                continue
+            input_name = next((key for key, input_value in inputs.items() if value is input_value), None)
+            try:
+                snapshot[name] = ('input', input_name) if input_name is not None else ('value', snapshot_value(value))
+            except Exception:
+                # The value can't be copied, the namespace after this statement can't be restored
+                return None
+        return snapshot
+
+    def _restore(self, snapshot, inputs):
+        self.namespace.clear()
+        for name, (kind, value) in snapshot.items():
+            self.namespace[name] = inputs[value] if kind == 'input' else snapshot_value(value)
+
+    def execute(self, code, inputs, output, state=None, prelude='', key=()):
+        """
+        Execute code in the kernel namespace and return the namespace.
+        - inputs: objects given to the code, eg. {'df': df}. Restored snapshots refer to the inputs of the current call.
+        - state: initial values that are part of the execution state, eg. a list collecting the shown figures.
+        - prelude: code run before the statements, eg. the plotting patch. The line numbers of the code follow it, as if both were one script.
+        - key: identifies the inputs, snapshots are only reused for the same key. Objects in it are compared by identity
+          (and kept alive, so their id isn't reused).
+        Output printed to sys.stdout is written to output (the stdout redirection is the caller's).
+        """
+        try:
+            statements = ast.parse(code).body
+        except SyntaxError:
+            self.reset()
+            self.namespace.update(inputs, **(state or {}))
+            exec(prelude + code, self.namespace)
+            return self.namespace
+
+        line_offset = len(prelude.split('\n')) - 1 if prelude else 0
+        digest = hashlib.sha256(repr((prelude, _key_repr(key), sorted(inputs), sorted(state or {}))).encode('utf-8'))
+        keys = [digest.hexdigest()]
+        for statement in statements:
+            # Hash the statement structure, so blank lines or comments don't invalidate the following statements
+            digest.update(ast.dump(statement).encode('utf-8'))
+            keys.append(digest.hexdigest())
+
+        # The number of leading entries (the prelude included) that match and can be resumed from
+        reusable = 0
+        for i, entry in enumerate(self._entries[:len(keys)]):
+            if entry.key != keys[i]:
+                break
+            if entry.snapshot is not None:
+                reusable = i + 1
+
+        if reusable:
+            self._restore(self._entries[reusable - 1].snapshot, inputs)
+            # The prelude may patch global state (eg. plotly's show), which another kernel could have patched since
+            exec(prelude, self.namespace)
+            for entry in self._entries[1:reusable]:
+                output.write(entry.output)
+            self._entries = self._entries[:reusable]
+        else:
+            self.reset()
+            self.namespace.update(inputs, **(state or {}))
+            exec(prelude, self.namespace)
+            self._entries = [_Entry(keys[0], self._snapshot(inputs), '')]
+        self._key = key
+
+        for i in range(reusable - 1 if reusable else 0, len(statements)):
+            module = ast.Module(body=[statements[i]], type_ignores=[])
+            ast.increment_lineno(module, line_offset)
+            sys.stdout.flush()
+            start = output.tell()
+            exec(compile(module, FILENAME, 'exec'), self.namespace)
+            sys.stdout.flush()
+            output.seek(start)
+            printed = output.read()
+            self._entries.append(_Entry(keys[i + 1], self._snapshot(inputs), printed))
+        return self.namespace
@@ -0,0 +1,157 @@
+import ctypes
+import os
+import threading
+import time
+
+# How often the watchdog checks the limits, in seconds
+CHECK_INTERVAL = 0.1
+
+
+class ExecutionInterrupted(BaseException):
+    """
+    Raised in the executing thread when a limit is exceeded or the execution is cancelled.
+    A BaseException, so the generated code's own 'except Exception' handlers don't swallow it.
+    """
+
+
+def current_rss():
+    """Resident set size of the process in bytes, or None if it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _thread_cpu_clock(thread_id):
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def format_usage(usage):
+    """A one line summary of the resource usage of an execution"""
+    parts = []
+    if usage.get('wall_time') is not None:
+        parts.append(f"wall time {usage['wall_time']:.2f} s")
+    if usage.get('cpu_time') is not None:
+        parts.append(f"CPU time {usage['cpu_time']:.2f} s")
+    if usage.get('peak_rss') is not None:
+        parts.append(f"peak RSS {usage['peak_rss'] / (1024 * 1024):.0f} MB")
+    return ', '.join(parts) or 'not available'
+
+
+class ExecutionGuard:
+    """
+    Enforces a wall-clock limit, a CPU time limit and a memory ceiling on the code executed in the current thread, and
+    lets another thread cancel it. A watchdog thread raises ExecutionInterrupted asynchronously in the executing thread.
+    These are best-effort limits, not hard ones:
+    - the exception takes effect at the next Python bytecode, so a long running native call (eg. a huge merge, or a
+      blocking read) runs to completion first, however far past the limit
+    - the memory ceiling is the growth of the RSS of the whole process since the block started, so memory allocated
+      (or freed) meanwhile by other threads, eg. a concurrent execution, counts towards it, and peak_rss is the process's
+    Run the executor in a container with OS limits (cgroups, ulimit) where hard limits are needed.
+    The reason and the resource usage are available after the block:
+
+        with ExecutionGuard(wall_time=60, cancel_event=event) as guard:
+            exec(code, namespace)
+        guard.usage  # {'wall_time': ..., 'cpu_time': ..., 'peak_rss': ...}
+
+    A limit of 0 or None is not enforced.
+    """
+
+    def __init__(self, wall_time=None, cpu_time=None, max_memory=None, cancel_event=None):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_memory = max_memory
+        self.cancel_event = cancel_event
+        self.reason = None
+        self.usage = {}
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._cpu_clock = _thread_cpu_clock(self._thread_id)
+        self._start = time.monotonic()
+        self._start_cpu = self._cpu_seconds()
+        self._start_rss = current_rss()
+        self._peak_rss = self._start_rss
+        self._done.clear()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._done.set()
+        self._watchdog.join()
+        if self.reason is not None and exc_type is None:
+            # The limit was hit just as the block finished, clear the exception that hasn't been raised yet
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id), None)
+        self._sample_rss()
+        self.usage = {
+            'wall_time': round(time.monotonic() - self._start, 3),
+            'cpu_time': round(self._cpu_seconds() - self._start_cpu, 3) if self._start_cpu is not None else None,
+            'peak_rss': self._peak_rss
+        }
+        return False
+
+    def _cpu_seconds(self):
+        if self._cpu_clock is None:
+            return None
+        try:
+            return time.clock_gettime(self._cpu_clock)
+        except OSError:
+            return None
+
+    def _sample_rss(self):
+        rss = current_rss()
+        if rss is not None and (self._peak_rss is None or rss > self._peak_rss):
+            self._peak_rss = rss
+        return rss
+
+    def _exceeded(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return 'cancelled'
+        if self.wall_time and time.monotonic() - self._start > self.wall_time:
+            return 'wall_time'
+        if self.cpu_time and self._start_cpu is not None:
+            cpu = self._cpu_seconds()
+            if cpu is not None and cpu - self._start_cpu > self.cpu_time:
+                return 'cpu_time'
+        rss = self._sample_rss()
+        if self.max_memory and rss is not None and self._start_rss is not None and rss - self._start_rss > self.max_memory:
+            return 'memory'
+        return None
+
+    def _watch(self):
+        while not self._done.wait(CHECK_INTERVAL):
+            reason = self._exceeded()
+            if reason is None:
+                continue
+            self.reason = self.reason or reason
+            # Raised again every second in case the code catches it with a bare except
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id), ctypes.py_object(ExecutionInterrupted))
+            if self._done.wait(1):
+                return
+
+    def describe(self):
+        """An error message for the interruption, worded for the Error Corrector"""
+        usage = self.usage
+        if self.reason == 'cancelled':
+            return "ExecutionCancelled: The code execution was stopped by the user."
+        if self.reason == 'wall_time':
+            return (f"ExecutionTimeout: Your code timed out after {self.wall_time:g} seconds (wall-clock limit). "
+                    f"Please produce a faster version, eg. vectorise loops over rows and avoid cartesian merges.")
+        if self.reason == 'cpu_time':
+            return (f"ExecutionTimeout: Your code exceeded the CPU time limit of {self.cpu_time:g} seconds "
+                    f"(after {usage.get('wall_time')} seconds). Please produce a faster version, eg. vectorise loops over rows and avoid cartesian merges.")
+        if self.reason == 'memory':
+            return (f"ExecutionMemoryExceeded: Your code used more than {self.max_memory // (1024 * 1024)} MB of additional memory. "
+                    f"Please produce a version that uses less memory, eg. select only the needed columns and avoid cartesian merges.")
+        return "ExecutionInterrupted: The code execution was interrupted."
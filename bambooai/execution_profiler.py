@@ -0,0 +1,86 @@
+import os
+import sys
+import threading
+from collections import Counter
+
+# The filename exec gives the generated code, whose frames are attributed to its lines
+FILENAME = '<string>'
+
+
+class StackSampler:
+    """
+    A sampling profiler of the code executed in the current thread. A background thread records the call stack every
+    interval seconds, from the outermost frame of the generated code down. Each sample counts once for every line of the
+    generated code and every function on the stack, so the counts are cumulative (a loop line includes the calls it makes):
+
+        with StackSampler() as sampler:
+            exec(code, namespace)
+        sampler.line_samples.most_common(5)  # [(line number, samples), ...]
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = 0
+        self.line_samples = Counter()
+        self.function_samples = Counter()
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._done.clear()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._done.set()
+        self._sampler.join()
+        return False
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame)
+                frame = frame.f_back
+            # The frames above the generated code are the executor's own
+            outermost = max((i for i, frame in enumerate(stack) if frame.f_code.co_filename == FILENAME), default=None)
+            if outermost is None:
+                continue
+            self.samples += 1
+            lines, functions = set(), set()
+            for frame in stack[:outermost + 1]:
+                code = frame.f_code
+                if code.co_filename == FILENAME:
+                    lines.add(frame.f_lineno)
+                functions.add((code.co_filename, code.co_name))
+            self.line_samples.update(lines)
+            self.function_samples.update(functions)
+
+    def report(self, code, line_offset=0, top=5):
+        """
+        The lines of the code and the functions with the largest shares of the samples, as text for the Error Corrector.
+        line_offset is the number of lines executed before the code (eg. the plotting patch).
+        """
+        if not self.samples:
+            return None
+        code_lines = code.split('\n')
+        lines = []
+        for line_number, count in self.line_samples.most_common():
+            line_number -= line_offset
+            # Lines of the patch code aren't part of the generated code
+            if 1 <= line_number <= len(code_lines):
+                lines.append(f"  line {line_number} ({count / self.samples:.0%}): {code_lines[line_number - 1].strip()}")
+            if len(lines) == top:
+                break
+        functions = []
+        for (filename, name), count in self.function_samples.most_common(top + 1):
+            if name == '<module>' and filename == FILENAME:
+                continue
+            location = 'generated code' if filename == FILENAME else os.path.basename(filename)
+            functions.append(f"  {name} in {location} ({count / self.samples:.0%})")
+        report = f"Lines of the code by share of the run time ({self.samples} samples every {self.interval * 1000:.0f} ms):\n" + '\n'.join(lines)
+        if functions:
+            report += "\nFunctions by share of the run time:\n" + '\n'.join(functions[:top])
+        return report
@@ -1,13 +1,16 @@
 # executor_client.py
 
+import hashlib
 import requests
 import pandas as pd
-from typing import Optional, Dict, Any, Union, List
+from typing import Optional, Dict, Any, Union, List, Tuple
 from datetime import datetime
 
 class ExecutorAPIClient:
     def __init__(self, base_url: str = None):
         self.base_url = base_url
+        # Ids (source hashes) of the helper modules registered with the executor API
+        self._registered_helpers = set()
         
     def log_to_file(self, message):
         """Write log message to file with timestamp"""
@@ -18,25 +21,42 @@ class ExecutorAPIClient:
     def execute_code(self, code: str, 
                     df_id: Optional[str] = None, 
                     patch_code: Optional[str] = None,
-                    plots_dir: Optional[str] = None,
                     plot_format: Optional[str] = None,
-                    generated_datasets_path: Optional[list] = None) -> Dict[str, Any]:
+                    generated_datasets_path: Optional[list] = None,
+                    execution_id: Optional[str] = None,
+                    limits: Optional[Dict[str, float]] = None,
+                    image_policy: Optional[Dict[str, Any]] = None,
+                    helpers: Optional[List[Tuple[str, List[str]]]] = None) -> Dict[str, Any]:
     
-        """Execute code via the executor API"""
+        """
+        Execute code via the executor API.
+        helpers: (module source, names) of functions the code is given, eg. the plot downsampling. The source is sent
+        once, executions only name it by its hash.
+        """
         self.log_to_file(f"Starting API execution with DataFrame ID={df_id}")
+        helpers = helpers or []
         
         data = {
             'code': code,
             'df_id': df_id,
             'patch_code': patch_code,
-            'plots_dir': plots_dir,
             'plot_format': plot_format,
-            'generated_datasets_path': generated_datasets_path
+            'generated_datasets_path': generated_datasets_path,
+            'execution_id': execution_id,
+            'limits': limits,
+            'image_policy': image_policy,
+            'helpers': [self._helpers_id(source) for source, _ in helpers]
         }
 
         try:
+            self._register_helpers(helpers)
             self.log_to_file(f"Sending request to {self.base_url}/execute")
             response = requests.post(f"{self.base_url}/execute", json=data)
+            if response.status_code == 409 and response.json().get('missing_helpers'):
+                # The executor API was restarted since the helpers were registered
+                self._registered_helpers.clear()
+                self._register_helpers(helpers)
+                response = requests.post(f"{self.base_url}/execute", json=data)
             response.raise_for_status()
             
             api_result = response.json()
@@ -64,6 +84,32 @@ class ExecutorAPIClient:
                 'generated_datasets': []
             }
         
+    @staticmethod
+    def _helpers_id(source: str) -> str:
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+    def _register_helpers(self, helpers: List[Tuple[str, List[str]]]) -> None:
+        """Send the executor API the helper modules it hasn't been sent yet"""
+        for source, names in helpers:
+            helpers_id = self._helpers_id(source)
+            if helpers_id in self._registered_helpers:
+                continue
+            self.log_to_file(f"Registering helpers {helpers_id[:12]} ({', '.join(names)})")
+            response = requests.post(f"{self.base_url}/helpers", json={'source': source, 'names': names})
+            response.raise_for_status()
+            self._registered_helpers.add(helpers_id)
+
+    def cancel_execution(self, execution_id: str) -> bool:
+        """Ask the executor API to stop a running execution"""
+        self.log_to_file(f"Cancelling execution {execution_id}")
+        try:
+            response = requests.post(f"{self.base_url}/cancel_execution", json={'execution_id': execution_id})
+            response.raise_for_status()
+            return True
+        except requests.RequestException as e:
+            self.log_to_file(f"Failed to cancel execution via API: {str(e)}")
+            return False
+
     def compute_dataframe_sample(self, df_id: str, order_by: str = 'Datetime', ascending: bool = False) -> Optional[pd.DataFrame]:
         """Call the executor API to compute DataFrame index"""
         self.log_to_file(f"Attempting to compute index for df_id={df_id}")
@@ -3,16 +3,22 @@ import json
 import numpy as np
 import requests
 import os
-from newspaper import Article, Config
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-import openai
-from google import genai
-from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
-
-openai_client = openai.OpenAI()
+import time
+import hashlib
+import atexit
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+
+# The search backends (newspaper, selenium, openai, google-genai) are imported on first use, as they are slow to import
+_openai_client = None
+
+def _get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        import openai
+        _openai_client = openai.OpenAI()
+    return _openai_client
 
 SEARCH_MODE = os.environ.get('WEB_SEARCH_MODE', 'google_ai')
 MAX_ITERATIONS = 5
@@ -20,6 +26,75 @@ CHUNK_SIZE = 512
 TOP_K_RESULTS = 6
 SEARCH_RESULTS = 5
 NUM_DOCUMENTS = 30
+FETCH_WORKERS = int(os.environ.get('SEARCH_FETCH_WORKERS', 4))
+FETCH_TIMEOUT = float(os.environ.get('SEARCH_FETCH_TIMEOUT', 10))
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', 7 * 24 * 3600))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', 1000))
+
+# Persistent search cache, with one JSON file per entry: <cache_dir>/<namespace>/<sha256 of key>.json
+class SearchCache:
+    def __init__(self, cache_dir, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def _path(self, namespace, key):
+        key_hash = hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, namespace, f"{key_hash}.json")
+
+    def get(self, namespace, key):
+        """Return the cached value, or None if it is missing or older than the TTL"""
+        path = self._path(namespace, key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if time.time() - entry.get('timestamp', 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry.get('value')
+
+    def put(self, namespace, key, value):
+        path = self._path(namespace, key)
+        with self.lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump({'timestamp': time.time(), 'key': key, 'value': value}, f)
+                os.replace(temp_path, path)
+                self._evict(os.path.dirname(path))
+            except OSError:
+                pass
+
+    def _evict(self, namespace_dir):
+        # Size bound per namespace, the least recently written entries are removed first
+        entries = [entry for entry in os.scandir(namespace_dir) if entry.name.endswith('.json')]
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            for entry in sorted(entries, key=lambda e: e.stat().st_mtime)[:excess]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+_search_caches = {}
+_search_caches_lock = threading.Lock()
+
+def get_search_cache():
+    """Get the process-wide search cache, or None if caching is disabled"""
+    cache_dir = os.environ.get('SEARCH_CACHE_DIR', os.path.join('storage', 'search_cache'))
+    if not cache_dir or os.environ.get('SEARCH_CACHE', 'true').lower() == 'false':
+        return None
+    with _search_caches_lock:
+        if cache_dir not in _search_caches:
+            _search_caches[cache_dir] = SearchCache(cache_dir)
+        return _search_caches[cache_dir]
 
 class ChatBot:
     def __init__(self):
@@ -99,6 +174,90 @@ class SmartSearchOrchestrator:
     
 ### SEARCH ACTIONS ###
 
+# Pool of reusable Chrome instances shared by all searches. Browsers are started lazily, up to max_size, and kept alive between searches.
+# Each browser has its own chromedriver service, as quitting a driver stops its service.
+class BrowserPool:
+    def __init__(self, webdriver_path, options, max_size=FETCH_WORKERS, page_load_timeout=FETCH_TIMEOUT, acquire_timeout=FETCH_TIMEOUT):
+        self.webdriver_path = webdriver_path
+        self.options = options
+        self.max_size = max(1, max_size)
+        self.page_load_timeout = page_load_timeout
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    # Returns None if no browser became free within acquire_timeout
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if not create:
+            try:
+                return self._idle.get(timeout=self.acquire_timeout)
+            except queue.Empty:
+                return None
+        try:
+            from selenium import webdriver
+            from selenium.webdriver.chrome.service import Service as ChromeService
+            driver = webdriver.Chrome(service=ChromeService(executable_path=self.webdriver_path), options=self.options)
+            driver.set_page_load_timeout(self.page_load_timeout)
+            return driver
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, driver, broken=False):
+        if broken:
+            # A browser that timed out or crashed is discarded rather than handed to the next fetch
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(driver)
+
+    def close(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            with self._lock:
+                self._created -= 1
+
+_browser_pools = {}
+_browser_pools_lock = threading.Lock()
+
+def get_browser_pool(webdriver_path, options):
+    with _browser_pools_lock:
+        pool = _browser_pools.get(webdriver_path)
+        if pool is None:
+            pool = BrowserPool(webdriver_path, options)
+            _browser_pools[webdriver_path] = pool
+        return pool
+
+@atexit.register
+def _close_browser_pools():
+    with _browser_pools_lock:
+        for pool in _browser_pools.values():
+            pool.close()
+        _browser_pools.clear()
+
 # Define a class to perform a Google search and retrieve the content of the resulting pages    
 class SearchEngine:
     def __init__(self):
@@ -107,12 +266,13 @@ class SearchEngine:
             self.webdriver_path = os.path.normpath(webdriver_path)
         else:
             self.webdriver_path = None
-        self.driver = None
+        self.browser_pool = None
         self.headless = True
         
         if self.webdriver_path:
-            # Initialize Selenium WebDriver if path is provided
-            self.service = ChromeService(executable_path=self.webdriver_path)
+            from selenium.webdriver.chrome.options import Options
+
+            # Initialize the Selenium WebDriver options if path is provided, the pool starts a chromedriver service per browser
             self.options = Options()
             if self.headless:
                 self.options.add_argument("--headless")
@@ -135,17 +295,23 @@ class SearchEngine:
                 })
 
     def __enter__(self):
+        # Browsers are borrowed from a shared pool per fetch, instead of launching Chrome for every search
         if self.webdriver_path:
-            self.driver = webdriver.Chrome(service=self.service, options=self.options)
+            self.browser_pool = get_browser_pool(self.webdriver_path, self.options)
         return self
     
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        if self.driver:
-            self.driver.quit()
-
+        self.browser_pool = None
 
     # Perform a Google search using the SERPer API
     def search_google(self, query, gl='us', hl='en'):
+        cache = get_search_cache()
+        cache_key = [query, gl, hl, SEARCH_RESULTS]
+        if cache:
+            cached = cache.get('serper', cache_key)
+            if cached is not None:
+                return cached
+
         url = "https://google.serper.dev/search"
         payload = json.dumps({"q": query, "gl": gl, "hl": hl, "num": SEARCH_RESULTS, "autocorrect": True})
         headers = {'X-API-KEY': os.environ['SERPER_API_KEY'], 'Content-Type': 'application/json'}
@@ -153,26 +319,50 @@ class SearchEngine:
         response = requests.request("POST", url, headers=headers, data=payload)
         response = json.loads(response.text)
 
+        if cache and ('organic' in response or 'answerBox' in response or 'knowledgeGraph' in response):
+            cache.put('serper', cache_key, response)
+
         return response
     
+    # Fetch the page HTML with a pooled Selenium browser. Returns None if the page could not be loaded in time
+    def _fetch_html(self, url):
+        driver = self.browser_pool.acquire()
+        if driver is None:
+            return None
+        try:
+            driver.get(url)
+            full_html = driver.page_source
+        except Exception:
+            self.browser_pool.release(driver, broken=True)
+            return None
+        self.browser_pool.release(driver)
+        return full_html
+
     # Download and parse an article from a URL using the Newspaper library
     def search_url(self, url, document_size=CHUNK_SIZE):
+        cache = get_search_cache()
+        if cache:
+            cached = cache.get('pages', [url, document_size])
+            if cached is not None:
+                return cached
+
         try:
-            if self.driver:
+            if self.browser_pool:
                 # Use Selenium to get the dynamic content
-                self.driver.get(url)
-                full_html = self.driver.page_source
+                full_html = self._fetch_html(url)
             else:
                 # Use Newspaper3 to get the static HTML content
                 full_html = None
 
             # Use Newspaper3 to parse the HTML content
+            from newspaper import Article, Config
             config = Config()
             config.browser_user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/110.0.0.0 Safari/537.36'
             config.memoize_articles = False  # Disable caching
+            config.request_timeout = FETCH_TIMEOUT
             article = Article(url, config=config)
             
-            if self.driver and full_html:
+            if full_html:
                 article.set_html(full_html)
             else:
                 article.download()
@@ -187,6 +377,46 @@ class SearchEngine:
         documents = [' '.join(full_words[i:i+document_size]) for i in range(0, len(full_words), document_size)]
         # Remove documents that are too short
         documents = [doc for doc in documents if len(doc) > 100]
+
+        # Failed or empty pages are not cached, so they are retried next time
+        if cache and documents:
+            cache.put('pages', [url, document_size], documents)
+        return documents
+
+    # Fetch and parse the URLs concurrently. Stops waiting once num_documents chunks have been collected, or the time budget runs out.
+    # The documents are returned in the original (search rank) order of the URLs that completed.
+    def fetch_documents(self, urls, num_documents=NUM_DOCUMENTS):
+        if not urls:
+            return []
+
+        workers = max(1, min(FETCH_WORKERS, len(urls)))
+        # Each fetch is bounded by FETCH_TIMEOUT, plus the parsing time
+        time_budget = FETCH_TIMEOUT * (-(-len(urls) // workers) + 1)
+
+        results = {}
+        collected = 0
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='search_fetch')
+        try:
+            futures = {executor.submit(self.search_url, url): i for i, url in enumerate(urls)}
+            try:
+                for future in as_completed(futures, timeout=time_budget):
+                    try:
+                        documents = future.result()
+                    except Exception:
+                        documents = []
+                    results[futures[future]] = documents
+                    collected += len(documents)
+                    if collected >= num_documents:
+                        break
+            except FuturesTimeoutError:
+                pass
+        finally:
+            # Don't wait for the slow pages, and drop the ones that haven't started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        documents = []
+        for i in sorted(results):
+            documents += results[i]
         return documents
     
     # Perform a Google search and retrieve the content of the top results. Maximum word count is num_documents * context_size (default 7680)
@@ -203,7 +433,7 @@ class SearchEngine:
             url_found = False
             for key, value in google_resp['answerBox'].items():
                 if isinstance(value, str) and "https://" in value:
-                    documents += self.search_url(value)
+                    documents += self.fetch_documents([value], num_documents)
                     top_links.append({
                         'title': google_resp['answerBox'].get('title', 'No title available'),
                         'link': value
@@ -217,16 +447,11 @@ class SearchEngine:
             direct_answer = f"\n{json.dumps(google_resp['knowledgeGraph'], indent=2)}\n"
         else:
             # Handling the case where there is no direct answer
-            for i, resp in enumerate(google_resp.get('organic', [])):
-                # Additional call to search_url to parse the content of the link
-                documents += self.search_url(resp['link'])
-                if i < 5:  # Only store top 5 links
-                    top_links.append({
-                        'title': resp['title'],
-                        'link': resp['link']
-                    })
-                if len(documents) > num_documents:
-                    break
+            organic = google_resp.get('organic', [])
+            # Parse the content of the links concurrently
+            documents = self.fetch_documents([resp['link'] for resp in organic], num_documents)
+            # Only store top 5 links
+            top_links = [{'title': resp['title'], 'link': resp['link']} for resp in organic[:5]]
 
         # Ensuring we only return the requested number of documents
         documents = documents[:num_documents]
@@ -237,7 +462,7 @@ class SearchEngine:
 class DocumentRetriever:
     # Create a vector embedding of a text using OpenAI's 'text-embedding-3-large' model
     def encode(self, input):
-        resp = openai_client.embeddings.create(
+        resp = _get_openai_client().embeddings.create(
             model = 'text-embedding-3-large',
             input = input
         )
@@ -260,8 +485,10 @@ class DocumentRetriever:
 
 # Define a class to generate an answer to a question based on a set of documents
 class Reader:
+    agent = 'Google Search Summarizer'
+
     def __call__(self, prompt_manager, log_and_call_manager,output_manager,chain_id,query, contexts):
-        agent = 'Google Search Summarizer'
+        agent = self.agent
         text = ""
         
         from bambooai import models
@@ -290,18 +517,34 @@ class Search:
 
     def __call__(self, prompt_manager, log_and_call_manager, output_manager, chain_id, question):
         question = self._extract_search_query(question)
+
+        # A cached answer skips the search, page fetching, document embedding and the summarizer call.
+        # It depends on the search mode, the number of results searched and used, and the summarizer model too.
+        cache = get_search_cache()
+        if cache:
+            from bambooai import models
+            cache_key = [SEARCH_MODE, models.get_model_name(self.reader.agent)[0], SEARCH_RESULTS, TOP_K_RESULTS, question]
+            cached = cache.get('answers', cache_key)
+            if cached is not None:
+                return cached[0], cached[1]
+
         with self.search_engine as engine:
             documents, top_links, direct_answer = engine(question)
             if direct_answer:
-                return direct_answer, None
-            contexts = self.document_retriever(question, documents)
-            answer = self.reader(prompt_manager, log_and_call_manager, output_manager, chain_id, question, contexts)
+                answer, top_links = direct_answer, None
+            else:
+                contexts = self.document_retriever(question, documents)
+                answer = self.reader(prompt_manager, log_and_call_manager, output_manager, chain_id, question, contexts)
+
+        if cache and answer:
+            cache.put('answers', cache_key, [answer, top_links])
         return answer, top_links
     
 class GeminiSearch:
     def __init__(self):
 
         from bambooai import models
+        from google import genai
         
         self.API_KEY = os.environ.get('GEMINI_API_KEY')
         self.gemini_client = genai.Client(api_key=self.API_KEY)
@@ -315,6 +558,7 @@ class GeminiSearch:
         return search_query
     
     def _call_gemini(self,search_query: str) -> str:
+        from google.genai.types import Tool, GenerateContentConfig, GoogleSearch
 
         model_id = self.models.get_model_name(self.agent)[0]
 
@@ -352,17 +596,27 @@ class GeminiSearch:
             if hasattr(metadata, 'search_entry_point') and metadata.search_entry_point is not None and hasattr(metadata.search_entry_point, 'rendered_content'):
                 search_html = metadata.search_entry_point.rendered_content
         
-        # Output the search_entry_point HTML as a JSON structure
-        if search_html:
-            output_manager.send_html_content(search_html, chain_id=chain_id)
-
-        return answer, top_links     
+        return answer, top_links, search_html
     
     def __call__(self, prompt_manager, log_and_call_manager, output_manager, chain_id, messages):
         search_query = self._extract_search_query(messages)
         output_manager.display_tool_info('google_ai_search', search_query, chain_id)
-        response = self._call_gemini(search_query)
-        answer, top_links = self._parse_response(response, output_manager, chain_id)
+
+        cache = get_search_cache()
+        model_id = self.models.get_model_name(self.agent)[0]
+        cached = cache.get('gemini', [model_id, search_query]) if cache else None
+        if cached is not None:
+            answer, top_links, search_html = cached
+        else:
+            response = self._call_gemini(search_query)
+            answer, top_links, search_html = self._parse_response(response, output_manager, chain_id)
+            if cache and answer:
+                cache.put('gemini', [model_id, search_query], [answer, top_links, search_html])
+
+        # Output the search_entry_point HTML as a JSON structure
+        if search_html:
+            output_manager.send_html_content(search_html, chain_id=chain_id)
+
         return answer, top_links
     
 ### END SEARCH ACTIONS ###
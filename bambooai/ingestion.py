@@ -0,0 +1,345 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+# Datetime columns are detected on a sample before the whole column is converted
+DATETIME_SAMPLE_SIZE = 1000
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S%z'
+# Integer columns are kept as int64 unless this is set: a downcast column (eg. int16) silently overflows in arithmetic
+# such as df['power'] ** 2, so the smaller integer types are opt-in
+DOWNCAST_INTEGERS = os.getenv('INGESTION_DOWNCAST_INTEGERS', 'false').lower() == 'true'
+# String columns with few distinct values are stored as categoricals
+CATEGORY_MAX_UNIQUE = 1000
+CATEGORY_MAX_RATIO = 0.5
+# Uploads are copied, and CSV files converted, in blocks so memory stays bounded regardless of the file size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+CSV_BLOCK_SIZE = 16 * 1024 * 1024
+# Number of dataset artifacts kept for deduplication of repeated uploads
+ARTIFACT_MAX_ENTRIES = 10
+
+
+class HashingFile:
+    """
+    A temporary file that computes the sha256 of everything written to it.
+    Used as the upload stream, so an upload is received, stored and hashed in a single pass.
+    """
+
+    def __init__(self, dir=None, suffix=None):
+        self._file = tempfile.NamedTemporaryFile('w+b', dir=dir, suffix=suffix)
+        self._hash = hashlib.sha256()
+        self.name = self._file.name
+
+    def write(self, data):
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+def copy_stream(stream, file_path):
+    """Copy a stream to a file in chunks and return the sha256 of its content"""
+    content_hash = hashlib.sha256()
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            content_hash.update(chunk)
+            f.write(chunk)
+    return content_hash.hexdigest()
+
+
+def persist_upload(stream, file_path):
+    """Store an uploaded stream at file_path, hard linking the already written upload file instead of copying it where possible"""
+    if isinstance(stream, HashingFile):
+        stream.flush()
+        try:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            os.link(stream.name, file_path)
+            return stream.hexdigest()
+        except OSError:
+            pass
+    stream.seek(0)
+    return copy_stream(stream, file_path)
+
+
+def read_csv(file_path):
+    """
+    Read a CSV file with the multithreaded pyarrow reader.
+    Falls back to the pandas reader for files pyarrow can't parse (eg. a column whose type changes after the first block).
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    try:
+        table = pa_csv.read_csv(file_path, read_options=pa_csv.ReadOptions(use_threads=True))
+    except pa.ArrowInvalid:
+        return pd.read_csv(file_path)
+    return table.to_pandas(date_as_object=False)
+
+
+def _is_text(series):
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def _parse_datetime(series):
+    """Convert a text column to naive UTC datetimes if a sample of it parses, otherwise return None"""
+    sample = series.dropna().head(DATETIME_SAMPLE_SIZE)
+    if sample.empty:
+        return None
+    try:
+        pd.to_datetime(sample, format=DATETIME_FORMAT, utc=True)
+        return pd.to_datetime(series, format=DATETIME_FORMAT, utc=True).dt.tz_localize(None)
+    except (ValueError, TypeError):
+        return None
+
+
+def _downcast(series, downcast_integers):
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer') if downcast_integers else series
+    if pd.api.types.is_float_dtype(series):
+        # Only downcast floats to float32 when no precision is lost
+        downcast = pd.to_numeric(series, downcast='float')
+        if downcast.dtype != series.dtype and downcast.astype(series.dtype).equals(series):
+            return downcast
+    return series
+
+
+def optimize_dtypes(df, downcast_integers=None):
+    """
+    Give the columns of a dataframe compact, analysis friendly types:
+    - timezone aware and '%Y-%m-%d %H:%M:%S%z' text columns become naive UTC datetimes
+    - low-cardinality text columns become categoricals
+    - floats that fit without loss are downcast, and integer columns too with downcast_integers
+      (DOWNCAST_INTEGERS by default)
+    """
+    if downcast_integers is None:
+        downcast_integers = DOWNCAST_INTEGERS
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.DatetimeTZDtype):
+            df[col] = series.dt.tz_convert(None)
+        elif _is_text(series):
+            parsed = _parse_datetime(series)
+            if parsed is not None:
+                df[col] = parsed
+                continue
+            unique = series.nunique()
+            if len(series) and unique <= CATEGORY_MAX_UNIQUE and unique / len(series) <= CATEGORY_MAX_RATIO:
+                df[col] = series.astype('category')
+        elif pd.api.types.is_numeric_dtype(series):
+            df[col] = _downcast(series, downcast_integers)
+    return df
+
+
+def load_dataset(file_path):
+    """
+    Load a .csv or .parquet file into a dataframe with optimized dtypes, in memory.
+    Uploads go through get_artifact instead, which streams the file into the Parquet artifact.
+    """
+    if file_path.endswith('.parquet'):
+        df = pd.read_parquet(file_path)
+    elif file_path.endswith('.csv'):
+        df = read_csv(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {os.path.basename(file_path)}")
+    return optimize_dtypes(df)
+
+
+def write_parquet(df, file_path):
+    """Write the canonical Parquet artifact of a dataframe, preserving its dtypes (including categoricals)"""
+    df.to_parquet(file_path)
+    return file_path
+
+
+def _csv_to_parquet(csv_path, parquet_path):
+    """Stream a CSV file into a Parquet file block by block. Datetime columns are inferred by pyarrow from the first block."""
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+        convert_options=pa_csv.ConvertOptions(timestamp_parsers=[pa_csv.ISO8601, DATETIME_FORMAT])
+    )
+    with pq.ParquetWriter(parquet_path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+def _column_converter(parquet_file, field):
+    """
+    Work out the compact type of a Parquet column, reading only that column.
+    Returns a function converting a chunk of the column, or None if the column is kept as is.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if pa.types.is_timestamp(field.type):
+        if field.type.tz is None:
+            return None
+        target = pa.timestamp(field.type.unit)
+        return lambda column: column.cast(target)
+    if pa.types.is_date(field.type):
+        return lambda column: column.cast(pa.timestamp('ms'))
+    if pa.types.is_integer(field.type) and not DOWNCAST_INTEGERS:
+        return None
+
+    column = parquet_file.read(columns=[field.name]).column(0)
+    if len(column) == 0:
+        return None
+
+    if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+        sample = column.slice(0, DATETIME_SAMPLE_SIZE).drop_null()
+        if len(sample):
+            try:
+                pc.strptime(sample, format=DATETIME_FORMAT, unit='s')
+                pc.strptime(column, format=DATETIME_FORMAT, unit='s')
+                return lambda column: pc.strptime(column, format=DATETIME_FORMAT, unit='s').cast(pa.timestamp('s'))
+            except pa.ArrowInvalid:
+                pass
+        unique = pc.count_distinct(column).as_py()
+        if unique <= CATEGORY_MAX_UNIQUE and unique / len(column) <= CATEGORY_MAX_RATIO:
+            return lambda column: column.dictionary_encode()
+        return None
+
+    if pa.types.is_integer(field.type):
+        bounds = pc.min_max(column).as_py()
+        if bounds['min'] is None:
+            return None
+        for target in (pa.int8(), pa.int16(), pa.int32()):
+            if _fits(target, bounds['min'], bounds['max']):
+                return lambda column: column.cast(target)
+        return None
+
+    if pa.types.is_float64(field.type):
+        # Only downcast floats to float32 when no precision is lost
+        roundtrip = column.cast(pa.float32(), safe=False).cast(pa.float64())
+        lossless = pc.all(pc.or_kleene(pc.equal(roundtrip, column), pc.is_nan(column))).as_py()
+        if lossless is not False:
+            return lambda column: column.cast(pa.float32(), safe=False)
+    return None
+
+
+def _fits(int_type, minimum, maximum):
+    limit = 2 ** (int_type.bit_width - 1)
+    return -limit <= minimum and maximum < limit
+
+
+def _optimize_parquet(source_path, dest_path):
+    """Rewrite a Parquet file with the compact column types, one row group at a time"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(source_path)
+    schema = parquet_file.schema_arrow
+    metadata = schema.metadata
+    pandas_metadata = json.loads(metadata[b'pandas']) if metadata and b'pandas' in metadata else None
+    index_columns = set(pandas_metadata['index_columns']) if pandas_metadata else set()
+    converters = {
+        field.name: None if field.name in index_columns else _column_converter(parquet_file, field)
+        for field in schema
+    }
+
+    if pandas_metadata:
+        # Drop the pandas type details of the converted columns (eg. the timezone), so pandas reads them with their new types
+        for column in pandas_metadata['columns']:
+            if converters.get(column.get('field_name')):
+                column['metadata'] = None
+        metadata = {**metadata, b'pandas': json.dumps(pandas_metadata).encode()}
+
+    writer = None
+    try:
+        for i in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i)
+            columns = [
+                converters[name](table.column(name)) if converters[name] else table.column(name)
+                for name in table.column_names
+            ]
+            table = pa.Table.from_arrays(columns, names=table.column_names).replace_schema_metadata(metadata)
+            if writer is None:
+                writer = pq.ParquetWriter(dest_path, table.schema)
+            writer.write_table(table)
+        if writer is None:
+            pq.write_table(parquet_file.read(), dest_path)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def build_artifact(source_path, dest_path):
+    """
+    Convert an uploaded .csv or .parquet file to the canonical Parquet artifact with compact column types.
+    The conversion streams through the file, so the whole dataset is never held in memory.
+    """
+    import pyarrow as pa
+
+    if not source_path.endswith(('.csv', '.parquet')):
+        raise ValueError(f"Unsupported file type: {os.path.basename(source_path)}")
+
+    part_path = f"{dest_path}.part"
+    staged_path = f"{dest_path}.staged.part"
+    try:
+        if source_path.endswith('.csv'):
+            try:
+                _csv_to_parquet(source_path, staged_path)
+                source_path = staged_path
+            except pa.ArrowInvalid:
+                # pyarrow infers the column types from the first block, fall back to pandas if a later block doesn't fit them
+                write_parquet(optimize_dtypes(pd.read_csv(source_path)), part_path)
+                os.replace(part_path, dest_path)
+                return dest_path
+        _optimize_parquet(source_path, part_path)
+        os.replace(part_path, dest_path)
+        return dest_path
+    finally:
+        for path in (part_path, staged_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def get_artifact(source_path, content_hash, artifact_dir):
+    """
+    Return the Parquet artifact of an upload, building it only if the same content hasn't been uploaded before.
+    Only the most recent ARTIFACT_MAX_ENTRIES artifacts are kept, use pin_artifact to keep reading one after that.
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+    artifact_path = os.path.join(artifact_dir, f"{content_hash}.parquet")
+    if os.path.exists(artifact_path):
+        os.utime(artifact_path)
+        return artifact_path
+
+    build_artifact(source_path, artifact_path)
+
+    artifacts = sorted(glob.glob(os.path.join(artifact_dir, '*.parquet')), key=os.path.getmtime, reverse=True)
+    for stale in artifacts[ARTIFACT_MAX_ENTRIES:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+    return artifact_path
+
+
+def pin_artifact(artifact_path, pin_path):
+    """
+    Give a session its own link to an artifact, so the file it reads (eg. through a LazyFrame) outlives the eviction of
+    the artifact by get_artifact. The link shares the artifact's data, it's copied only where hard links aren't supported.
+    """
+    os.makedirs(os.path.dirname(pin_path), exist_ok=True)
+    try:
+        os.link(artifact_path, pin_path)
+    except OSError:
+        shutil.copyfile(artifact_path, pin_path)
+    return pin_path
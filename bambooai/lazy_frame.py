@@ -0,0 +1,493 @@
+import json
+import operator
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pa_fs
+
+
+def _index_columns(schema):
+    """Columns holding a pandas index, these are read alongside the data so pandas restores the index"""
+    metadata = schema.metadata or {}
+    if b'pandas' not in metadata:
+        return []
+    return [column for column in json.loads(metadata[b'pandas'])['index_columns'] if isinstance(column, str)]
+
+
+def _range_index(schema):
+    """
+    (start, step, name) of the RangeIndex stored in the pandas metadata, or of the default index when the file has none.
+    None when the index is stored as columns.
+    """
+    metadata = schema.metadata or {}
+    if b'pandas' not in metadata:
+        return 0, 1, None
+    index_columns = json.loads(metadata[b'pandas'])['index_columns']
+    if not index_columns:
+        return 0, 1, None
+    if len(index_columns) == 1 and isinstance(index_columns[0], dict) and index_columns[0].get('kind') == 'range':
+        return index_columns[0]['start'], index_columns[0]['step'], index_columns[0]['name']
+    return None
+
+
+def _is_scalar(value):
+    return pd.api.types.is_scalar(value) and not isinstance(value, (LazyColumn, LazyMask))
+
+
+def _scalar(value, field_type):
+    """Convert a python value compared with a column to a scalar of the column's type, so eg. date strings compare with timestamps"""
+    if pa.types.is_timestamp(field_type) and (isinstance(value, (str, np.datetime64)) or hasattr(value, 'isoformat')):
+        timestamp = pd.Timestamp(value)
+        if field_type.tz is None and timestamp.tz is not None:
+            timestamp = timestamp.tz_convert(None)
+        return pa.scalar(timestamp, type=pa.timestamp('ns', tz=field_type.tz)).cast(field_type, safe=False)
+    return value
+
+
+def _materialize(value):
+    return value.to_pandas() if isinstance(value, (LazyFrame, LazyColumn, LazyMask)) else value
+
+
+class LazyFrame:
+    """
+    A pandas-like proxy of a Parquet dataset on disk, used as `df` in the out-of-core dataframe mode.
+
+    Column selections, row filters (eg. df[df['power'] > 200]), head/tail/iloc slices and the columns used by a
+    groupby are pushed down to the (memory mapped) pyarrow dataset scan, so only the data an operation needs is read.
+    Anything else materialises the selected rows and columns as a pandas DataFrame, and delegates to it.
+    Top level pandas functions (pd.concat, pd.merge, ...) only accept pandas objects, so a lazy frame is passed to them
+    as df.to_pandas().
+
+    Rows keep their labels whichever way they are read: an index stored as columns is restored by pyarrow, and with a
+    RangeIndex (or no pandas index) a row is labelled by its position in the file, as a pandas filter or slice would.
+    """
+
+    def __init__(self, source, columns=None, filter=None):
+        if isinstance(source, ds.Dataset):
+            self._dataset = source
+        else:
+            self._dataset = ds.dataset(os.path.abspath(source), format='parquet', filesystem=pa_fs.LocalFileSystem(use_mmap=True))
+        self._index_columns = _index_columns(self._dataset.schema)
+        self._range_index = _range_index(self._dataset.schema)
+        if columns is None:
+            columns = [name for name in self._dataset.schema.names if name not in self._index_columns]
+        self._columns = list(columns)
+        self._filter = filter
+        self._materialized = None
+
+    def _labels(self, positions=None):
+        """
+        Labels of the rows at the positions (all the rows by default) of a RangeIndex dataset. pyarrow only restores a
+        RangeIndex when every row is read, the rows of a slice or a filter get their labels from their position in the file.
+        """
+        start, step, name = self._range_index
+        if self._filter is None:
+            rows = np.arange(self._dataset.count_rows()) if positions is None else np.asarray(positions, dtype=np.int64)
+        else:
+            mask = self._dataset.to_table(columns={'mask': self._filter}).column('mask')
+            rows = np.flatnonzero(pc.fill_null(mask, False).to_numpy(zero_copy_only=False))
+            if positions is not None:
+                rows = rows[np.asarray(positions, dtype=np.int64)]
+        return pd.Index(start + rows * step, name=name)
+
+    def _read(self, columns=None):
+        columns = self._columns if columns is None else list(columns)
+        columns += [name for name in self._index_columns if name not in columns]
+        frame = self._dataset.to_table(columns=columns, filter=self._filter).to_pandas()
+        if self._filter is not None and self._range_index is not None:
+            frame.index = self._labels()
+        return frame
+
+    def _derive(self, columns=None, filter=None):
+        if filter is not None and self._filter is not None:
+            filter = self._filter & filter
+        return LazyFrame(self._dataset, self._columns if columns is None else columns, filter if filter is not None else self._filter)
+
+    def to_pandas(self):
+        """Load the selected rows and columns into memory. From then on the frame behaves as that pandas DataFrame."""
+        if self._materialized is None:
+            self._materialized = self._read()
+        return self._materialized
+
+    @property
+    def is_materialized(self):
+        return self._materialized is not None
+
+    @property
+    def columns(self):
+        if self._materialized is not None:
+            return self._materialized.columns
+        return pd.Index(self._columns)
+
+    @property
+    def dtypes(self):
+        if self._materialized is not None:
+            return self._materialized.dtypes
+        schema = pa.schema([self._dataset.schema.field(name) for name in self._columns], metadata=self._dataset.schema.metadata)
+        return schema.empty_table().to_pandas().dtypes
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    @property
+    def empty(self):
+        return len(self) == 0 or len(self.columns) == 0
+
+    def __len__(self):
+        if self._materialized is not None:
+            return len(self._materialized)
+        return self._dataset.count_rows(filter=self._filter)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def head(self, n=5):
+        if self._materialized is not None:
+            return self._materialized.head(n)
+        columns = self._columns + [name for name in self._index_columns if name not in self._columns]
+        frame = self._dataset.head(max(n, 0), columns=columns, filter=self._filter).to_pandas()
+        if self._range_index is not None:
+            frame.index = self._labels(range(len(frame)))
+        return frame
+
+    def tail(self, n=5):
+        if self._materialized is not None:
+            return self._materialized.tail(n)
+        total = len(self)
+        return self._take(range(max(total - n, 0), total))
+
+    def _take(self, indices):
+        columns = self._columns + [name for name in self._index_columns if name not in self._columns]
+        frame = self._dataset.take(pa.array(indices, type=pa.int64()), columns=columns, filter=self._filter).to_pandas()
+        if self._range_index is not None:
+            frame.index = self._labels(indices)
+        return frame
+
+    @property
+    def iloc(self):
+        if self._materialized is not None:
+            return self._materialized.iloc
+        return _ILocIndexer(self)
+
+    @property
+    def loc(self):
+        if self._materialized is not None:
+            return self._materialized.loc
+        return _LocIndexer(self)
+
+    def __getitem__(self, key):
+        if self._materialized is not None:
+            return self._materialized[_materialize(key)]
+        if isinstance(key, str):
+            if key not in self._columns:
+                raise KeyError(key)
+            return LazyColumn(self, key)
+        if isinstance(key, list) and all(isinstance(name, str) for name in key):
+            missing = [name for name in key if name not in self._columns]
+            if missing:
+                raise KeyError(f"{missing} not in index")
+            return self._derive(columns=key)
+        if isinstance(key, LazyMask) and key._frame._dataset is self._dataset:
+            return self._derive(filter=key._expression)
+        return self.to_pandas()[_materialize(key)]
+
+    def __setitem__(self, key, value):
+        self.to_pandas()[key] = _materialize(value)
+
+    def __delitem__(self, key):
+        del self.to_pandas()[key]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if self._materialized is None and name in self._columns:
+            return self[name]
+        return getattr(self.to_pandas(), name)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.to_pandas(), dtype=dtype)
+
+    def copy(self, deep=True):
+        if self._materialized is not None:
+            return self._materialized.copy(deep=deep)
+        return self._derive()
+
+    def groupby(self, by=None, *args, **kwargs):
+        if self._materialized is not None:
+            return self._materialized.groupby(_materialize(by), *args, **kwargs)
+        return LazyGroupBy(self, by, args, kwargs)
+
+    def __repr__(self):
+        if self._materialized is not None:
+            return repr(self._materialized)
+        return f"{self.head(10)!r}\n\n[{len(self)} rows x {len(self._columns)} columns, on disk]"
+
+    def column_stats(self, name, max_categories=10, top=3, samples=2):
+        """
+        Summary statistics of a column for the LLM context, computed from that column only.
+        Returns a dict with count, missing, numeric, and either min/max/mean or unique/top/samples.
+        """
+        if self._materialized is not None:
+            column = pa.chunked_array([pa.Array.from_pandas(self._materialized[name])])
+        else:
+            column = self._dataset.to_table(columns=[name], filter=self._filter).column(0)
+        if pa.types.is_floating(column.type):
+            column = pc.if_else(pc.is_nan(column), None, column)
+
+        missing = column.null_count
+        stats = {'count': len(column) - missing, 'missing': missing}
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type) or pa.types.is_boolean(column.type):
+            if pa.types.is_boolean(column.type):
+                column = column.cast(pa.int8())
+            bounds = pc.min_max(column).as_py()
+            stats.update(numeric=True, min=bounds['min'], max=bounds['max'], mean=pc.mean(column).as_py())
+            return stats
+
+        counts = pc.value_counts(column.drop_null())
+        stats.update(numeric=False, unique=len(counts))
+        if len(counts) <= max_categories:
+            order = pc.array_sort_indices(counts.field('counts'), order='descending')
+            stats['top'] = counts.field('values').take(order[:top]).to_pylist()
+        else:
+            stats['samples'] = column.drop_null()[:samples].to_pylist()
+        return stats
+
+
+class LazyColumn:
+    """A column of a LazyFrame. Comparisons build pushed down filters, anything else reads just this column into a pandas Series."""
+
+    def __init__(self, frame, name):
+        self._frame = frame
+        self._name = name
+        self._field = ds.field(name)
+        self._type = frame._dataset.schema.field(name).type
+        self._series = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def dtype(self):
+        if self._series is not None:
+            return self._series.dtype
+        return self._frame.dtypes[self._name]
+
+    def to_pandas(self):
+        if self._series is None:
+            self._series = self._frame._read([self._name])[self._name]
+        return self._series
+
+    def _compare(self, other, op):
+        if isinstance(other, LazyColumn) and other._frame._dataset is self._frame._dataset:
+            return LazyMask(self._frame, op(self._field, other._field))
+        if _is_scalar(other) or hasattr(other, 'isoformat'):
+            expression = op(self._field, _scalar(other, self._type))
+            if op is operator.ne:
+                # pandas treats missing values as not equal to anything
+                expression = expression | self._field.is_null(nan_is_null=True)
+            return LazyMask(self._frame, expression)
+        return op(self.to_pandas(), _materialize(other))
+
+    def __eq__(self, other):
+        return self._compare(other, operator.eq)
+
+    def __ne__(self, other):
+        return self._compare(other, operator.ne)
+
+    def __lt__(self, other):
+        return self._compare(other, operator.lt)
+
+    def __le__(self, other):
+        return self._compare(other, operator.le)
+
+    def __gt__(self, other):
+        return self._compare(other, operator.gt)
+
+    def __ge__(self, other):
+        return self._compare(other, operator.ge)
+
+    __hash__ = None
+
+    def isin(self, values):
+        values = list(_materialize(values))
+        return LazyMask(self._frame, self._field.isin([_scalar(value, self._type) for value in values]))
+
+    def between(self, left, right, inclusive='both'):
+        lower = operator.ge if inclusive in ('both', 'left') else operator.gt
+        upper = operator.le if inclusive in ('both', 'right') else operator.lt
+        return self._compare(left, lower) & self._compare(right, upper)
+
+    def isna(self):
+        return LazyMask(self._frame, self._field.is_null(nan_is_null=True))
+
+    def notna(self):
+        return ~self.isna()
+
+    isnull = isna
+    notnull = notna
+
+    def __len__(self):
+        return len(self._frame)
+
+    def __iter__(self):
+        return iter(self.to_pandas())
+
+    def __getitem__(self, key):
+        return self.to_pandas()[_materialize(key)]
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.to_pandas(), name)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.to_pandas(), dtype=dtype)
+
+    def __repr__(self):
+        return repr(self.to_pandas())
+
+
+class LazyMask:
+    """A boolean condition on a LazyFrame. Used to index the frame it's pushed down as a filter, otherwise it's evaluated to a boolean Series."""
+
+    def __init__(self, frame, expression):
+        self._frame = frame
+        self._expression = expression
+        self._series = None
+
+    def to_pandas(self):
+        if self._series is None:
+            table = self._frame._dataset.to_table(columns={'mask': self._expression}, filter=self._frame._filter)
+            self._series = pd.Series(pc.fill_null(table.column('mask'), False).to_numpy(zero_copy_only=False), dtype=bool,
+                                     index=self._frame._read([]).index)
+        return self._series
+
+    def _combine(self, other, op):
+        if isinstance(other, LazyMask) and other._frame._dataset is self._frame._dataset:
+            return LazyMask(self._frame, op(self._expression, other._expression))
+        return op(self.to_pandas(), _materialize(other))
+
+    def __and__(self, other):
+        return self._combine(other, operator.and_)
+
+    def __or__(self, other):
+        return self._combine(other, operator.or_)
+
+    def __invert__(self):
+        return LazyMask(self._frame, ~self._expression)
+
+    def __len__(self):
+        return len(self._frame)
+
+    def __iter__(self):
+        return iter(self.to_pandas())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.to_pandas(), name)
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self.to_pandas(), dtype=dtype)
+
+    def __repr__(self):
+        return repr(self.to_pandas())
+
+
+def _delegate_operator(name):
+    def method(self, *args):
+        return getattr(self.to_pandas(), name)(*(_materialize(arg) for arg in args))
+    method.__name__ = name
+    return method
+
+
+# Arithmetic on a lazy column (or frame) works on its pandas Series (or DataFrame)
+for _name in ('__add__', '__radd__', '__sub__', '__rsub__', '__mul__', '__rmul__', '__truediv__', '__rtruediv__',
+              '__floordiv__', '__rfloordiv__', '__mod__', '__rmod__', '__pow__', '__rpow__', '__neg__', '__abs__'):
+    setattr(LazyColumn, _name, _delegate_operator(_name))
+    setattr(LazyFrame, _name, _delegate_operator(_name))
+
+
+class _ILocIndexer:
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and (key.step is None or key.step > 0):
+            start, stop, step = key.indices(len(self._frame))
+            return self._frame._take(range(start, stop, step))
+        if isinstance(key, int):
+            index = key if key >= 0 else len(self._frame) + key
+            return self._frame._take([index]).iloc[0]
+        return self._frame.to_pandas().iloc[key]
+
+
+class _LocIndexer:
+    def __init__(self, frame):
+        self._frame = frame
+
+    def __getitem__(self, key):
+        rows, columns = key if isinstance(key, tuple) and len(key) == 2 else (key, None)
+        if isinstance(rows, LazyMask) and rows._frame._dataset is self._frame._dataset and (columns is None or isinstance(columns, (str, list))):
+            selected = self._frame[rows]
+            return selected if columns is None else selected[columns]
+        if isinstance(rows, slice) and rows == slice(None) and isinstance(columns, (str, list)):
+            return self._frame[columns]
+        return self._frame.to_pandas().loc[_materialize(rows) if columns is None else (_materialize(rows), columns)]
+
+    def __setitem__(self, key, value):
+        self._frame.to_pandas().loc[key] = _materialize(value)
+
+
+class LazyGroupBy:
+    """A groupby on a LazyFrame, which reads only the grouping and aggregated columns (of the filtered rows) before grouping in pandas"""
+
+    def __init__(self, frame, by, args, kwargs, selection=None):
+        self._frame = frame
+        self._by = by
+        self._args = args
+        self._kwargs = kwargs
+        self._selection = selection
+
+    def __getitem__(self, key):
+        return LazyGroupBy(self._frame, self._by, self._args, self._kwargs, selection=key)
+
+    def _grouped(self, columns=None):
+        keys = self._by if isinstance(self._by, list) else [self._by]
+        if not all(isinstance(key, str) and key in self._frame._columns for key in keys):
+            data, by = self._frame.to_pandas(), [_materialize(key) for key in keys] if isinstance(self._by, list) else _materialize(self._by)
+        else:
+            if columns is None and self._selection is not None:
+                columns = [self._selection] if isinstance(self._selection, str) else list(self._selection)
+            needed = None if columns is None else keys + [name for name in columns if name not in keys]
+            data, by = self._frame._read(needed), self._by
+        grouped = data.groupby(by, *self._args, **self._kwargs)
+        return grouped if self._selection is None else grouped[self._selection]
+
+    def agg(self, func=None, *args, **kwargs):
+        columns = None
+        if self._selection is None and isinstance(func, dict):
+            columns = list(func)
+        elif self._selection is None and func is None and kwargs:
+            # Named aggregation, eg. agg(avg_power=('power', 'mean'))
+            columns = [spec[0] for spec in kwargs.values()]
+        return self._grouped(columns).agg(func, *args, **kwargs)
+
+    aggregate = agg
+
+    def __iter__(self):
+        return iter(self._grouped())
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._grouped(), name)
@@ -3,6 +3,7 @@ from json import JSONEncoder
 import logging
 from logging.handlers import RotatingFileHandler
 import os
+import threading
 
 # The purpose of this class is to provide a custom JSON encoder that can serialize custom objects that come as a part of Anthropic API tool use responses.
 class FlexibleJSONEncoder(JSONEncoder):
@@ -41,6 +42,9 @@ class LogAndCallManager:
 
         handler = RotatingFileHandler(self.consolidated_log_file_path, maxBytes=5*1024*1024, backupCount=3)
         self.logger.addHandler(handler)
+
+        # LLM calls made concurrently (eg. candidate code generation) log from several threads
+        self._log_lock = threading.Lock()
         
     def update_token_summary(self, chain_id, prompt_tokens, completion_tokens, total_tokens, elapsed_time, cost):
         if chain_id not in self.token_summary:
@@ -79,7 +83,11 @@ class LogAndCallManager:
 
         output_manager.display_call_summary(summary_text)
 
-    def write_to_log(self, agent, chain_id, timestamp, model, messages, content, prompt_tokens, completion_tokens, total_tokens, elapsed_time, tokens_per_second):
+    def write_to_log(self, *args, **kwargs):
+        with self._log_lock:
+            self._write_to_log(*args, **kwargs)
+
+    def _write_to_log(self, agent, chain_id, timestamp, model, messages, content, prompt_tokens, completion_tokens, total_tokens, elapsed_time, tokens_per_second):
         # Calculate the costs
         token_costs = self.token_cost_dict.get(model, {})
         prompt_token_cost = token_costs.get('prompt_tokens', 0)
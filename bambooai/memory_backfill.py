@@ -0,0 +1,230 @@
+"""
+Bulk backfill and re-index of the episodic memory (vector database).
+
+Walks the stored favourites (storage/<user>/favourites/<thread_id>/<chain_id>.json) and the
+matching thread store (storage/<user>/threads/<thread_id>.json), extracts the intent, plan,
+data description, data model and code of each ranked chain, embeds them in batches and
+upserts them in chunks using parallel workers.
+
+Progress is checkpointed per collection/index, so an interrupted run can be resumed, and
+switching EMBEDDING_PLATFORM (which changes the vector dimension and the target collection)
+starts a fresh checkpoint.
+
+Usage:
+    python -m bambooai.memory_backfill --storage-dir storage/demo_user
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from threading import Lock
+
+from dotenv import load_dotenv
+
+from bambooai import qa_retrieval
+from bambooai.messages import reg_ex
+from bambooai.storage_manager import SimpleInteractionStore, StorageError
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_WORKERS = 4
+
+
+def _last_assistant_message(messages):
+    for message in reversed(messages or []):
+        if message.get('role') == 'assistant' and isinstance(message.get('content'), str):
+            return message['content']
+    return None
+
+
+def extract_record(favourite, chain):
+    """Extract the vector db record fields from a favourite entry and its stored chain. Returns None if there is no code."""
+    code_exec = chain.get('tools', {}).get('code_exec', {}) if chain else {}
+    messages = chain.get('messages', {}) if chain else {}
+
+    code = code_exec.get('executed_code') or ''
+    if not code:
+        return None
+
+    # The intent breakdown of the chain is the last task appended to the task list
+    tasks = code_exec.get('tasks') or []
+    intent = tasks[-1] if tasks else favourite.get('task', '')
+    if not intent:
+        return None
+
+    data_descr = ''
+    analyst_response = _last_assistant_message(messages.get('select_analyst_messages'))
+    if analyst_response:
+        analyst = reg_ex._extract_analyst(analyst_response)
+        if len(analyst) == 5 and analyst[3]:
+            data_descr = str(analyst[3])
+
+    plan = ''
+    plan_response = _last_assistant_message(messages.get('plan_review_messages')) or _last_assistant_message(messages.get('eval_messages'))
+    if plan_response:
+        plan = reg_ex._extract_plan(plan_response)
+
+    data_model = ''
+    inspector_response = _last_assistant_message(messages.get('df_inspector_messages'))
+    if inspector_response:
+        data_model = reg_ex._extract_data_model(inspector_response)
+
+    return {
+        'record_id': str(favourite.get('chain_id')),
+        'intent': intent,
+        'plan': plan,
+        'data_descr': data_descr,
+        'data_model': data_model,
+        'code': code,
+        'rank': int(favourite.get('rank') or 0),
+    }
+
+
+def collect_records(storage_dir, min_rank):
+    """Walk the favourites and the thread store and yield the records eligible for the vector db"""
+    favourites_dir = os.path.join(storage_dir, 'favourites')
+    if not os.path.isdir(favourites_dir):
+        return
+
+    interaction_store = SimpleInteractionStore(storage_dir=storage_dir)
+
+    for thread_id in sorted(os.listdir(favourites_dir)):
+        thread_dir = os.path.join(favourites_dir, thread_id)
+        if not os.path.isdir(thread_dir):
+            continue
+
+        thread_data = interaction_store._load_thread_data(interaction_store._get_thread_file(thread_id))
+
+        for filename in sorted(os.listdir(thread_dir)):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(thread_dir, filename), 'r', encoding='utf-8') as f:
+                    favourite = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Skipping unreadable favourite {thread_id}/{filename}: {str(e)}")
+                continue
+
+            favourite.setdefault('chain_id', os.path.splitext(filename)[0])
+            try:
+                if int(favourite.get('rank') or 0) < min_rank:
+                    continue
+            except (TypeError, ValueError):
+                continue
+
+            chain = thread_data.get('chains', {}).get(str(favourite['chain_id']))
+            record = extract_record(favourite, chain)
+            if record is None:
+                print(f"Skipping {thread_id}/{favourite['chain_id']}: no stored code or intent found")
+                continue
+            yield record
+
+
+class Checkpoint:
+    """Set of record IDs already upserted into a given collection, persisted as JSON"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        self.done = set()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    self.done = set(json.load(f).get('done', []))
+            except (json.JSONDecodeError, OSError):
+                self.done = set()
+
+    def mark_done(self, record_ids):
+        with self.lock:
+            self.done.update(record_ids)
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump({'done': sorted(self.done)}, f)
+            os.replace(temp_path, self.path)
+
+
+def get_vector_db_wrapper():
+    """Initialise the vector database wrapper selected by VECTOR_DB_TYPE"""
+    vector_db_type = os.getenv('VECTOR_DB_TYPE', 'pinecone').lower()
+    if vector_db_type == 'pinecone':
+        return qa_retrieval.PineconeWrapper()
+    elif vector_db_type == 'qdrant':
+        return qa_retrieval.QdrantWrapper()
+    raise ValueError(f"Unsupported vector database type '{vector_db_type}'. Supported types: 'pinecone', 'qdrant'.")
+
+
+def _upsert_batch(wrapper, batch):
+    """Embed a batch of records and upsert them in one call"""
+    intent_vectors = wrapper.vectorize_many([record['intent'] for record in batch])
+
+    data_descrs = [record['data_descr'] for record in batch if record['data_descr']]
+    data_descr_vectors = dict(zip(data_descrs, wrapper.vectorize_many(data_descrs))) if data_descrs else {}
+
+    upserts = []
+    for record, intent_vector in zip(batch, intent_vectors):
+        metadata = wrapper.build_record_metadata(
+            record['intent'], record['plan'], record['data_descr'], record['data_model'], record['code'],
+            record['rank'], data_descr_vectors.get(record['data_descr'])
+        )
+        upserts.append((record['record_id'], intent_vector, metadata))
+
+    wrapper.upsert_records(upserts)
+    return [record['record_id'] for record in batch]
+
+
+def backfill(storage_dir, wrapper, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, checkpoint_path=None, restart=False):
+    """Backfill the vector database from the stored favourites. Returns the number of records upserted."""
+    if checkpoint_path is None:
+        checkpoint_path = os.path.join(storage_dir, f'memory_backfill_{wrapper.collection_name}.json')
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+
+    records = [
+        record for record in collect_records(storage_dir, wrapper.MIN_USER_RANK_TO_CONSIDER)
+        if record['record_id'] not in checkpoint.done
+    ]
+    if not records:
+        print("Nothing to backfill.")
+        return 0
+
+    batches = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+    print(f"Backfilling {len(records)} records into '{wrapper.collection_name}' in {len(batches)} batches...")
+
+    upserted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_upsert_batch, wrapper, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                record_ids = future.result()
+            except Exception as e:
+                print(f"Failed to upsert batch starting with record {futures[future][0]['record_id']}: {str(e)}")
+                continue
+            checkpoint.mark_done(record_ids)
+            upserted += len(record_ids)
+            print(f"Upserted {upserted}/{len(records)} records")
+
+    return upserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill or re-index the BambooAI episodic memory from stored favourites')
+    parser.add_argument('--storage-dir', default='storage', help="Storage directory containing 'favourites' and 'threads', eg. storage/demo_user")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Number of records embedded and upserted per batch')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of parallel upsert workers')
+    parser.add_argument('--checkpoint', default=None, help='Checkpoint file path (defaults to one per collection in the storage dir)')
+    parser.add_argument('--restart', action='store_true', help='Ignore any existing checkpoint and re-index everything')
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+
+    try:
+        wrapper = get_vector_db_wrapper()
+    except (ValueError, StorageError) as e:
+        parser.error(str(e))
+
+    backfill(args.storage_dir, wrapper, batch_size=args.batch_size, workers=args.workers, checkpoint_path=args.checkpoint, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,26 @@
+import re
+
 from bambooai.messages import reg_ex
+from bambooai.messages.token_budget import TokenBudget
 from bambooai.output_manager import OutputManager
 from bambooai.storage_manager import SimpleInteractionStore, StorageError
 
+# Tasks of the custom operations (custom activity analysis, manual code edits). Only the latest one is kept in the QA pairs
+CUSTOM_QA_TASK_RE = re.compile('|'.join(re.escape(identifier) for identifier in [
+    "User requested to run the code to do a custom analysis of the activity with ID:",
+    "User manually edited your code, and requested to run it, and return the result."
+]))
+
 class MessageManager:
-    def __init__(self, prompts, output_manager: OutputManager, multimodal_models, max_conversations, user_id: str = None):
+    # Caps applied to each code execution result included in the "Previous Analyses" block
+    QA_RESULT_MAX_LINES = 60
+    QA_RESULT_MAX_CHARS = 6000
+
+    def __init__(self, prompts, output_manager: OutputManager, multimodal_models, max_conversations, user_id: str = None, model_properties: dict = None):
         # self.max_conversations = max_conversations
         self.MAX_CONVERSATIONS = (max_conversations*2) - 1
+        # Token budget of the messages, used instead of the conversations count if configured for the agent's model
+        self.token_budget = TokenBudget(model_properties)
         self.output_manager = output_manager
         self.prompts = prompts
         self.multimodal_models = multimodal_models
@@ -22,6 +37,11 @@ class MessageManager:
         # Tasks (a list of task)
         self.tasks = []
 
+        # Formatted QA pair fragments keyed by (task, result), and the last formatted QA pairs and tasks blocks
+        self._qa_fragments = {}
+        self._qa_block = (None, None)
+        self._tasks_block = (None, None)
+
         # Last generated code
         self.last_code = None
 
@@ -125,12 +145,28 @@ class MessageManager:
         self.plan_review_messages = None
         self.insight_messages = None
 
-    def messages_maintenace(self, messages: list):
+    def messages_maintenace(self, messages: list, agent: str = None):
         # Remove tool_calls messages from the messages list
         for i in range(len(messages) - 1, -1, -1):  # Start from the last item to index 0
             msg = messages[i]
             if "tool_calls" in msg or msg.get("role") == "tool":
                 messages.pop(i)
+
+        budget = None
+        if agent:
+            try:
+                from bambooai import models
+                budget = self.token_budget.get_budget(models.get_model_name(agent)[0])
+            except ValueError:
+                budget = self.token_budget.get_budget(None)
+
+        if budget:
+            # Evict the oldest turns until the messages fit the token budget of the agent's model
+            tokens_before, tokens_after = self.token_budget.enforce(messages, budget)
+            if tokens_after < tokens_before:
+                self.output_manager.display_system_messages(f"Truncating messages: {tokens_before} -> {tokens_after} tokens (budget {budget})")
+            return
+
         # Remove the oldest conversation from the messages list
         if len(messages) > self.MAX_CONVERSATIONS:
             messages.pop(1)
@@ -138,20 +174,30 @@ class MessageManager:
             self.output_manager.display_system_messages("Truncating messages")
 
     def append_qa_pair(self, question, results):
-        # Define the custom operation identifier strings
-        custom_identifiers = [
-            "User requested to run the code to do a custom analysis of the activity with ID:",
-            "User manually edited your code, and requested to run it, and return the result."
-        ]
-        
         # Remove all existing custom operation entries
-        self.qa_pairs = [
-            pair for pair in self.qa_pairs 
-            if not any(identifier in pair["task"] for identifier in custom_identifiers)
-        ]
+        self.qa_pairs = [pair for pair in self.qa_pairs if not CUSTOM_QA_TASK_RE.search(pair["task"])]
         
         # Append the new QA pair
         self.qa_pairs.append({"task": question, "result": results})
+        self._prune_qa_fragments()
+
+    def _prune_qa_fragments(self):
+        # Drop the cached fragments of the pairs that are no longer in the list
+        keys = {(pair['task'], pair['result']) for pair in self.qa_pairs}
+        self._qa_fragments = {key: fragment for key, fragment in self._qa_fragments.items() if key in keys}
+
+    def _format_qa_result(self, result):
+        # Format answer with minimal separators and line preservation, capped so that a huge output doesn't inflate every subsequent prompt
+        answer_lines = [line for line in str(result or '').split('\n') if line.strip()]
+        if len(answer_lines) > self.QA_RESULT_MAX_LINES:
+            head = self.QA_RESULT_MAX_LINES * 2 // 3
+            tail = self.QA_RESULT_MAX_LINES - head
+            omitted = len(answer_lines) - head - tail
+            answer_lines = answer_lines[:head] + [f"... [{omitted} lines omitted] ..."] + answer_lines[-tail:]
+        formatted = '\n'.join(answer_lines)
+        if len(formatted) > self.QA_RESULT_MAX_CHARS:
+            formatted = formatted[:self.QA_RESULT_MAX_CHARS] + f"\n... [{len(formatted) - self.QA_RESULT_MAX_CHARS} characters omitted] ..."
+        return formatted
 
     def format_qa_pairs(self, max_qa_pairs=8):
         # Format QA pairs for prompts
@@ -161,27 +207,37 @@ class MessageManager:
         # Trim qa_pairs first if it exceeds max_qa_pairs
         if len(self.qa_pairs) > max_qa_pairs:
             self.qa_pairs = self.qa_pairs[-max_qa_pairs:]  # Keep only the most recent pairs
+            self._prune_qa_fragments()
+
+        keys = tuple((pair['task'], pair['result']) for pair in self.qa_pairs)
+        if self._qa_block[0] == keys:
+            return self._qa_block[1]
         
         formatted_str = ["Previous Analyses:"]
         
-        for i, pair in enumerate(self.qa_pairs, 1):
-            # Add question with minimal formatting
-            formatted_str.append(f"\n{i}. Task: {pair['task']}")
-            
-            # Format answer with minimal separators and line preservation
-            answer_lines = [line for line in pair['result'].split('\n') if line.strip()]
-            formatted_str.append('Result:\n' + '\n'.join(answer_lines))
+        for i, key in enumerate(keys, 1):
+            fragment = self._qa_fragments.get(key)
+            if fragment is None:
+                # Add question with minimal formatting
+                fragment = f"Task: {key[0]}\nResult:\n{self._format_qa_result(key[1])}"
+                self._qa_fragments[key] = fragment
+            formatted_str.append(f"\n{i}. {fragment}")
             
             # Add minimal separator if not the last pair
-            if i < len(self.qa_pairs):
+            if i < len(keys):
                 formatted_str.append("-" * 5)
          
-        return '\n'.join(formatted_str)
+        self._qa_block = (keys, '\n'.join(formatted_str))
+        return self._qa_block[1]
     
     def format_tasks(self):
         # Format tasks for prompts
         if not self.tasks:
             return "No previous tasks."
+
+        keys = tuple(self.tasks)
+        if self._tasks_block[0] == keys:
+            return self._tasks_block[1]
         
         formatted_str = ["Tasks:"]
         
@@ -193,7 +249,8 @@ class MessageManager:
             if i < len(self.tasks):
                 formatted_str.append("-" * 5)
         
-        return '\n'.join(formatted_str)
+        self._tasks_block = (keys, '\n'.join(formatted_str))
+        return self._tasks_block[1]
 
     def messages_content_maintenance(self, agent, messages, model_template_formatting):
         def _process_user_messages(messages, process_func):
@@ -1,9 +1,13 @@
 # prompts.py
 import os
 import yaml
+import hashlib
 import importlib.resources
+import string
 import sys
+import threading
 import warnings
+from types import MappingProxyType
 
 _DEFAULT_PROMPTS_PACKAGE_PATH = "bambooai.messages"
 _DEFAULT_PROMPTS_FILENAME = "default_prompts.yaml"
@@ -24,10 +28,32 @@ _EXPECTED_TEMPLATES = [
     "code_generator_user_gen_plan", "code_generator_user_gen_no_plan",
     "error_corector_system", "error_corector_system_reasoning",
     "error_corector_edited_system", "error_corector_edited_system_reasoning",
+    "performance_corrector_system", "performance_corrector_system_reasoning",
     "reviewer_system", "solution_summarizer_system",
     "solution_summarizer_custom_code_system", "plot_query", "plot_query_routing"
 ]
 
+# Process-wide registry of loaded templates, keyed by (default file hash, custom file path, custom file mtime).
+# The values are read-only mappings shared by all PromptManager instances.
+_template_registry = {}
+_template_registry_lock = threading.Lock()
+_formatter = string.Formatter()
+
+def _default_prompts_hash():
+    try:
+        data = importlib.resources.files(_DEFAULT_PROMPTS_PACKAGE_PATH).joinpath(_DEFAULT_PROMPTS_FILENAME).read_bytes()
+    except (FileNotFoundError, ModuleNotFoundError):
+        return None
+    return hashlib.sha256(data).hexdigest()
+
+def _validate_template(template_name, value):
+    """Parse the template once, so that malformed .format placeholders are reported at load time rather than on use"""
+    try:
+        return tuple(field for _, field, _, _ in _formatter.parse(value) if field is not None)
+    except ValueError as e:
+        warnings.warn(f"Prompt template '{template_name}' has malformed format placeholders: {e}", UserWarning)
+        return ()
+
 class PromptManager:
     def __init__(self, custom_prompt_file_path: str = None):
         """
@@ -38,8 +64,21 @@ class PromptManager:
         """
         self._prompts_loaded = False
         self.effective_custom_prompts_file = custom_prompt_file_path
+        self.templates = None
+        self.template_fields = None
         self._load_all_prompts()
 
+    def _registry_key(self):
+        custom_path = None
+        custom_mtime = None
+        if self.effective_custom_prompts_file:
+            custom_path = os.path.abspath(self.effective_custom_prompts_file)
+            try:
+                custom_mtime = os.path.getmtime(custom_path)
+            except OSError:
+                custom_mtime = None
+        return (_default_prompts_hash(), custom_path, custom_mtime)
+
     def _load_yaml_file(self, package_path, filename, is_default=True, direct_path=None):
         data = {}
         try:
@@ -70,6 +109,20 @@ class PromptManager:
         if self._prompts_loaded:
             return
 
+        key = self._registry_key()
+        with _template_registry_lock:
+            entry = _template_registry.get(key)
+            if entry is None:
+                entry = self._parse_templates()
+                _template_registry[key] = entry
+
+        self.templates, self.template_fields = entry
+        for template_name, value in self.templates.items():
+            setattr(self, template_name, value)
+
+        self._prompts_loaded = True
+
+    def _parse_templates(self):
         default_prompts_data = self._load_yaml_file(
             _DEFAULT_PROMPTS_PACKAGE_PATH, _DEFAULT_PROMPTS_FILENAME, is_default=True
         )
@@ -80,6 +133,8 @@ class PromptManager:
                 None, None, is_default=False, direct_path=self.effective_custom_prompts_file
             )
         
+        templates = {}
+        template_fields = {}
         for template_name in _EXPECTED_TEMPLATES:
             value = custom_prompts_data.get(template_name)
             if value is None:
@@ -92,6 +147,7 @@ class PromptManager:
                         f"Using empty string. Value: {str(value)[:50]}...", UserWarning
                     )
                 value = ""
-            setattr(self, template_name, value)
+            templates[template_name] = value
+            template_fields[template_name] = _validate_template(template_name, value)
 
-        self._prompts_loaded = True
\ No newline at end of file
+        return MappingProxyType(templates), MappingProxyType(template_fields)
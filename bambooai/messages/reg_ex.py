@@ -1,6 +1,6 @@
 import json
 import re
-from typing import List, Tuple
+from typing import Tuple
 import textwrap
 import yaml
 
@@ -8,137 +8,143 @@ def _normalize_indentation(code_segment: str) -> str:
     """Normalize the indentation of a code segment."""
     return textwrap.dedent(code_segment)
 
-def find_main_block(code: str) -> Tuple[int, int, int]:
-    """Find the start and end lines of the main block and its indentation level."""
-    lines = code.splitlines()
-    start_idx = None
-    end_idx = None
-    indent = 0
-    
-    for i, line in enumerate(lines):
-        if 'if __name__ == "__main__"' in line or "if __name__ == '__main__'" in line:
-            start_idx = i + 1  # Start after the if line
-            base_indent = len(line) - len(line.lstrip())
-            # Find first non-empty line in block to get indent
-            for j in range(start_idx, len(lines)):
-                if lines[j].strip():
-                    indent = len(lines[j]) - len(lines[j].lstrip())
-                    break
-            # Find the end of the block
-            for j in range(start_idx, len(lines)):
-                if lines[j].strip() and len(lines[j]) - len(lines[j].lstrip()) <= base_indent:
-                    end_idx = j
-                    break
-            if end_idx is None:  # If we didn't find the end, it's the last line
-                end_idx = len(lines)
-            break
-            
-    return start_idx, end_idx, indent
-
-def process_main_block(code_lines: List[str], start_idx: int, end_idx: int, base_indent: int, blacklist: List[str]) -> List[str]:
-    """Process the contents of the main block, preserving indentation."""
-    processed_lines = []
-    for line in code_lines[start_idx:end_idx]:
-        # Skip empty or whitespace-only lines
-        if not line.strip():
-            continue
-        # Skip lines with blacklisted items
-        if any(banned in line for banned in blacklist):
-            continue
-        # Preserve the original relative indentation
-        line_indent = len(line) - len(line.lstrip())
-        if line_indent >= base_indent:
-            # Keep the relative indentation from the base
-            relative_indent = line_indent - base_indent
-            processed_lines.append(" " * relative_indent + line.lstrip())
-    return processed_lines
+# Names that are not allowed in the generated code. Outside of the main block, lines matching any of them as a whole word are commented out
+CODE_BLACKLIST = [
+    'subprocess', 'sys', 'exec', 'socket', 'urllib',
+    'shutil', 'pickle', 'ctypes', 'multiprocessing', 'tempfile', 'glob', 'pty',
+    'commands', 'cgi', 'cgitb', 'xml.etree.ElementTree', 'builtins'
+]
+
+_BLACKLIST_RE = re.compile(r"\b(" + "|".join(CODE_BLACKLIST) + r")\b")  # Match whole words
+_BLACKLIST_SUBSTRING_RE = re.compile("|".join(re.escape(banned) for banned in CODE_BLACKLIST))
+_IMPORT_RE = re.compile(r"^\s*(?:from\s+([\w.]+)\s+import|import\s+([\w.]+))")
+_PYTHON_BLOCK_RE = re.compile(r'```python\n(\s*.*?)\s*```', re.DOTALL)
+_CODE_BLOCK_RE = re.compile(r'```(?:python\n|\n)(\s*.*?)\s*```', re.DOTALL)
+_SEABORN_STYLE_RE = re.compile(r'plt\.style\.use\s*\(\s*\'seaborn\'\s*\)')
+_DATA_WORD_RE = re.compile(r"\bdata\b")
+_DF_CONSTRUCTOR_RE = re.compile(r"(?<![a-zA-Z0-9_-])df\s*=\s*pd\.DataFrame\((.*?)\)")
+_MULTIPLE_EMPTY_LINES_RE = re.compile(r'\n{3,}')
+_MAIN_GUARDS = ('if __name__ == "__main__"', "if __name__ == '__main__'")
+
+_RANK_RE = re.compile(r"<rank>(.*)</rank>")
+_EXPERT_RE = re.compile(r'Data Analyst|Research Specialist')
+_ANALYST_RE = re.compile(r'Data Analyst DF|Data Analyst Generic')
+_YAML_BLOCK_RE = re.compile(r'```(?:yaml\s*)?(.*?)\s*```', re.DOTALL)
+# Content that starts with a YAML root key, up to the next root key. This is in case the YAML content is not enclosed in triple backticks.
+_YAML_ROOT_RE = re.compile(r'^([a-zA-Z_][a-zA-Z0-9_]*:(?:\n(?:[ ]{2}.*|\n)*)+)', re.MULTILINE)
+_EXAMPLES_RE = re.compile(r'EXAMPLE OUTPUT:\s*```python.*?```\s*', re.DOTALL)
+_TASK_XML_RE = re.compile(r'<task>(.*?)</task>', re.DOTALL)
+# The string 'TASK:' followed by any characters until the next occurrence of the string 'Before we begin, here are the version specifications you need to adhere to:', 'PYTHON VERSION:', or the end of the text
+_TASK_TEXT_RE = re.compile(r'TASK:\s*\n\s*(.*?)(?=\n\s*(?:Before we begin, here are the version specifications you need to adhere to:|PYTHON VERSION:|$))', re.DOTALL)
+_TASK_ONTOLOGY_RE = re.compile(r'TASK:\s*\n\s*(.*?)(?=\n\s*Create a YAML structure with:)', re.DOTALL)
+
+def _sanitize_code(response: str, analyst: str, provider: str) -> Tuple[str, dict]:
+    """
+    Extract and sanitize code in a single pass over the lines. The contents of the main block are unwrapped,
+    blacklisted lines are commented out (or dropped inside the main block), and a few known patterns are rewritten.
+    Returns the code and a diagnostics dict with the blocked lines and imports, the rewritten lines and the main block span.
+    """
+    diagnostics = {'blocked_lines': [], 'blocked_imports': [], 'rewritten_lines': [], 'main_block': None}
 
-def _extract_code(response: str, analyst: str, provider: str) -> str:
-    """Extract and sanitize code while preserving comments and structure."""
-    blacklist = [
-        'subprocess', 'sys', 'exec', 'socket', 'urllib',
-        'shutil', 'pickle', 'ctypes', 'multiprocessing', 'tempfile', 'glob', 'pty',
-        'commands', 'cgi', 'cgitb', 'xml.etree.ElementTree', 'builtins'
-    ]
-    
     # Extract code from markdown blocks
     # Replace <|im_sep|> with ``` to match the markdown code block syntax
-    response = re.sub(re.escape("<|im_sep|>"), "```", response)
-    # Find all code segments enclosed in triple backticks with "python"
-    code_segments = re.findall(r'```python\n(\s*.*?)\s*```', response, re.DOTALL)
-    # If no segments found, try without "python"
+    response = response.replace("<|im_sep|>", "```")
+    # Find all code segments enclosed in triple backticks with "python". If no segments found, try without "python"
+    code_segments = _PYTHON_BLOCK_RE.findall(response) or _CODE_BLOCK_RE.findall(response)
     if not code_segments:
-      code_segments = re.findall(r'```(?:python\n|\n)(\s*.*?)\s*```', response, re.DOTALL)
+        return "", diagnostics
 
-    if not code_segments:
-      return ""
-    
-    # Normalize the indentation for each code segment
-    normalized_code_segments = [_normalize_indentation(segment) for segment in code_segments]
+    # Normalize the indentation for each code segment, and combine them into a single string
+    code = '\n\n'.join(_normalize_indentation(segment) for segment in code_segments).lstrip()
 
-    # Combine the normalized code segments into a single string
-    code = '\n\n'.join(normalized_code_segments).lstrip()
-
-    # Split the code into lines
-    lines = code.splitlines()
-    
-    # Process the code line by line
+    rewrite_df = analyst == "Data Analyst DF" and provider == "local"
     processed_lines = []
-    main_start, main_end, main_indent = find_main_block(code)
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        
+
+    # Main block state. Only the first main block is unwrapped
+    in_main = False
+    main_seen = False
+    main_base_indent = 0
+    main_indent = None
+
+    for lineno, line in enumerate(code.splitlines(), 1):
+        stripped = line.strip()
+        line_indent = len(line) - len(line.lstrip())
+
+        if in_main:
+            if stripped and line_indent <= main_base_indent:
+                # End of the main block, this line is processed as a regular line
+                in_main = False
+                diagnostics['main_block'] = (diagnostics['main_block'][0], lineno - 1)
+            else:
+                # Skip empty or whitespace-only lines
+                if not stripped:
+                    continue
+                if main_indent is None:
+                    main_indent = line_indent
+                # Skip lines with blacklisted items
+                banned = _BLACKLIST_SUBSTRING_RE.search(line)
+                if banned:
+                    diagnostics['blocked_lines'].append({'line': lineno, 'code': line, 'name': banned.group()})
+                    continue
+                # Preserve the original relative indentation
+                if line_indent >= main_indent:
+                    processed_lines.append(" " * (line_indent - main_indent) + line.lstrip())
+                continue
+
         # Handle empty lines
-        if not line.strip():
+        if not stripped:
             processed_lines.append(line)
-            i += 1
             continue
-        
-        # Handle main block
-        if main_start and i == main_start - 1:  # We're at the if __name__ line
-            main_content = process_main_block(lines, main_start, main_end, main_indent, blacklist)
-            processed_lines.extend(main_content)
-            i = main_end
+
+        # Handle main block, starting after the if line
+        if not main_seen and (_MAIN_GUARDS[0] in line or _MAIN_GUARDS[1] in line):
+            in_main = main_seen = True
+            main_base_indent = line_indent
+            diagnostics['main_block'] = (lineno, None)
             continue
-            
+
         # Handle blacklisted imports
-        pattern = r"\b(" + "|".join(blacklist) + r")\b" # Match whole words
-        if re.search(pattern, line):
+        banned = _BLACKLIST_RE.search(line)
+        if banned:
+            diagnostics['blocked_lines'].append({'line': lineno, 'code': line, 'name': banned.group()})
+            import_match = _IMPORT_RE.match(line)
+            if import_match:
+                diagnostics['blocked_imports'].append(import_match.group(1) or import_match.group(2))
             processed_lines.append(f"# not allowed {line}")
-            i += 1
             continue
-            
+
         # Handle transformations
+        original = line
         if 'plt.savefig' in line:
-            indent = len(line) - len(line.lstrip())
-            line = ' ' * indent + 'plt.show()'
-        #line = re.sub(r"df\s*=\s*pd\.read_csv\((.*?)\)", "", line) # Temporary disable #TODO
-        line = re.sub(r'plt\.style\.use\s*\(\s*\'seaborn\'\s*\)', 'sns.set_style("whitegrid")', line)
-        
-        if analyst == "Data Analyst DF" and provider == "local":
-            if re.search(r"data=pd\.", line):
-                line = re.sub(r"\bdata\b", "df", line)
-            line = re.sub(
-                r"(?<![a-zA-Z0-9_-])df\s*=\s*pd\.DataFrame\((.*?)\)",
-                "# The dataframe df has already been defined",
-                line
-            )
-        
+            line = ' ' * line_indent + 'plt.show()'
+        if 'seaborn' in line:
+            line = _SEABORN_STYLE_RE.sub('sns.set_style("whitegrid")', line)
+        if rewrite_df:
+            if "data=pd." in line:
+                line = _DATA_WORD_RE.sub("df", line)
+            if 'DataFrame(' in line:
+                line = _DF_CONSTRUCTOR_RE.sub("# The dataframe df has already been defined", line)
+        if line != original:
+            diagnostics['rewritten_lines'].append({'line': lineno, 'original': original, 'code': line})
+
         processed_lines.append(line)
-        i += 1
-    
+
+    if in_main:
+        diagnostics['main_block'] = (diagnostics['main_block'][0], lineno)
+
     # Clean up multiple empty lines
-    result = '\n'.join(processed_lines)
-    result = re.sub(r'\n{3,}', '\n\n', result)
-    
-    return result.strip()
+    result = _MULTIPLE_EMPTY_LINES_RE.sub('\n\n', '\n'.join(processed_lines))
+
+    return result.strip(), diagnostics
+
+def _extract_code(response: str, analyst: str, provider: str) -> str:
+    """Extract and sanitize code while preserving comments and structure."""
+    return _sanitize_code(response, analyst, provider)[0]
 
 def _extract_rank(response: str) -> str:
 
     # Search for a pattern between <rank> and </rank> in the response
-    match = re.search(r"<rank>(.*)</rank>", response)
+    match = _RANK_RE.search(response)
     if match:
         # If a match is found, extract the rank between <rank> and </rank>
         rank = match.group(1)
@@ -149,11 +155,8 @@ def _extract_rank(response: str) -> str:
     return rank.strip()
 
 def _extract_expert(response: str) -> tuple:
-    # Create a pattern to match any of the substrings
-    pattern = r'Data Analyst|Research Specialist'
-    
     # Extract YAML content from within triple-backticks
-    yaml_segment = re.findall(r'```(?:yaml\s*)?(.*?)\s*```', response, re.DOTALL)
+    yaml_segment = _YAML_BLOCK_RE.findall(response)
     # If no YAML segment is found, use the entire response
     yaml_content = yaml_segment[0] if yaml_segment else response
 
@@ -165,18 +168,15 @@ def _extract_expert(response: str) -> tuple:
         return expert, requires_dataset, confidence
     except (yaml.YAMLError, KeyError):
         # Fallback: try to match using regex if parsing fails or keys are missing
-        match = re.search(pattern, response)
+        match = _EXPERT_RE.search(response)
         if match:
             return match.group(), None, None
         else:
             return None, None, None
 
 def _extract_analyst(response: str) -> tuple:
-    # Create a pattern to match any of the substrings
-    pattern = r'Data Analyst DF|Data Analyst Generic'
-    
     # Extract YAML content from within triple-backticks
-    yaml_segment = re.findall(r'```(?:yaml\s*)?(.*?)\s*```', response, re.DOTALL)
+    yaml_segment = _YAML_BLOCK_RE.findall(response)
     # If no YAML segment is found, use the entire response
     yaml_content = yaml_segment[0] if yaml_segment else response
 
@@ -190,7 +190,7 @@ def _extract_analyst(response: str) -> tuple:
         return analyst, query_unknown, query_condition, data_descr, intent_breakdown
     except (yaml.YAMLError, KeyError):
         # Fallback: try to match using regex if parsing fails or keys are missing
-        match = re.search(pattern, response)
+        match = _ANALYST_RE.search(response)
         if match:
             return match.group(), None, None, None
         else:
@@ -198,14 +198,13 @@ def _extract_analyst(response: str) -> tuple:
         
 def _extract_plan(response: str) -> str:
 
-    yaml_segment = re.findall(r'```(?:yaml\s*)?(.*?)\s*```', response, re.DOTALL)
+    yaml_segment = _YAML_BLOCK_RE.findall(response)
 
     if yaml_segment:
         return yaml_segment[-1]
     else:
         # Look for content that starts with a YAML root key and capture everything until the next root key. This is in case the YAML content is not enclosed in triple backticks.
-        yaml_pattern = r'^([a-zA-Z_][a-zA-Z0-9_]*:(?:\n(?:[ ]{2}.*|\n)*)+)'
-        yaml_content = re.findall(yaml_pattern, response, re.MULTILINE)
+        yaml_content = _YAML_ROOT_RE.findall(response)
         
         if yaml_content:
             # Join all found YAML-like sections
@@ -215,14 +214,13 @@ def _extract_plan(response: str) -> str:
 
 def _extract_data_model(response: str) -> str:
 
-    yaml_segment = re.findall(r'```(?:yaml\s*)?(.*?)\s*```', response, re.DOTALL)
+    yaml_segment = _YAML_BLOCK_RE.findall(response)
 
     if yaml_segment:
         return yaml_segment[-1]
     else:
         # Look for content that starts with a YAML root key and capture everything until the next root key. This is in case the YAML content is not enclosed in triple backticks.
-        yaml_pattern = r'^([a-zA-Z_][a-zA-Z0-9_]*:(?:\n(?:[ ]{2}.*|\n)*)+)'
-        yaml_content = re.findall(yaml_pattern, response, re.MULTILINE)
+        yaml_content = _YAML_ROOT_RE.findall(response)
         
         if yaml_content:
             # Join all found YAML-like sections
@@ -232,35 +230,28 @@ def _extract_data_model(response: str) -> str:
 
 # Function to remove examples from messages when no longer needed
 def _remove_examples(messages: str) -> str:
-    # Define the regular expression pattern
-    pattern = 'EXAMPLE OUTPUT:\s*```python.*?```\s*'
-
     # Iterate over the list of dictionaries
     for dict in messages:
         # Access and clean up 'content' field
         if dict.get('role') == 'user' and 'content' in dict:
-            dict['content'] = re.sub(pattern, '', dict['content'], flags=re.DOTALL)
+            dict['content'] = _EXAMPLES_RE.sub('', dict['content'])
 
     return messages
 
 def _remove_all_except_task_xml(text):
-    pattern = r'<task>(.*?)</task>'
-    match = re.search(pattern, text, re.DOTALL)
+    match = _TASK_XML_RE.search(text)
     if match:
         return match.group(1).strip()
     return text  # Return the original text if no <task> tags are found
 
 def _remove_all_except_task_text(text):
-     # The pattern to search for is the string 'TASK:' followed by any characters until the next occurrence of the string 'Before we begin, here are the version specifications you need to adhere to:', 'PYTHON VERSION:', or the end of the text
-    pattern = r'TASK:\s*\n\s*(.*?)(?=\n\s*(?:Before we begin, here are the version specifications you need to adhere to:|PYTHON VERSION:|$))'
-    match = re.search(pattern, text, re.DOTALL)
+    match = _TASK_TEXT_RE.search(text)
     if match:
         return match.group(1).strip()
     return text
 
 def _remove_all_except_task_ontology_text(text):
-    pattern = r'TASK:\s*\n\s*(.*?)(?=\n\s*Create a YAML structure with:)'
-    match = re.search(pattern, text, re.DOTALL)
+    match = _TASK_ONTOLOGY_RE.search(text)
     if match:
         return match.group(1).strip()
     return text
\ No newline at end of file
@@ -0,0 +1,146 @@
+import os
+import threading
+from collections import OrderedDict
+
+import tiktoken
+
+# Rough flat cost of an image attachment, the providers bill images separately from the text tokens
+IMAGE_TOKENS = 1000
+TOKENS_PER_MESSAGE = 3
+TOKEN_COUNT_CACHE_SIZE = 4096
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER_TOKENS = 16
+MIN_TRUNCATED_TOKENS = 64
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """The tiktoken encoding, or None if it can't be loaded (eg. offline without a cached BPE file)"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    _encoding = tiktoken.encoding_for_model("gpt-4")
+                except Exception:
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+
+class TokenBudget:
+    """
+    Keeps a conversation within a prompt token budget.
+
+    Token counts are computed once per distinct message text and memoised, so repeated
+    maintenance passes over a growing conversation only tokenize the new messages.
+    """
+
+    def __init__(self, model_properties=None):
+        self.model_properties = model_properties or {}
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_budget(self, model):
+        """Prompt token budget for a model: 'context_budget' in model_properties, else CONTEXT_TOKEN_BUDGET, else None (no budget)"""
+        budget = self.model_properties.get(model, {}).get('context_budget') if model else None
+        if budget is None:
+            budget = os.getenv('CONTEXT_TOKEN_BUDGET')
+        try:
+            return int(budget) if budget else None
+        except (TypeError, ValueError):
+            return None
+
+    def count_text(self, text):
+        with self._lock:
+            if text in self._counts:
+                self._counts.move_to_end(text)
+                return self._counts[text]
+        encoding = _get_encoding()
+        if encoding is not None:
+            count = len(encoding.encode(text, disallowed_special=()))
+        else:
+            count = -(-len(text) // CHARS_PER_TOKEN)
+        with self._lock:
+            self._counts[text] = count
+            if len(self._counts) > TOKEN_COUNT_CACHE_SIZE:
+                self._counts.popitem(last=False)
+        return count
+
+    def count_message(self, message):
+        content = message.get('content')
+        tokens = TOKENS_PER_MESSAGE
+        if isinstance(content, str):
+            tokens += self.count_text(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    tokens += self.count_text(part.get('text', ''))
+                else:
+                    tokens += IMAGE_TOKENS
+        return tokens
+
+    def count_messages(self, messages):
+        return sum(self.count_message(message) for message in messages)
+
+    def truncate_text(self, text, max_tokens):
+        """Keep the head and the tail of a text within max_tokens, marking the removed middle part"""
+        encoding = _get_encoding()
+        if encoding is None:
+            max_chars = max_tokens * CHARS_PER_TOKEN
+            if len(text) <= max_chars:
+                return text
+            head = max_chars * 2 // 3
+            tail = max_chars - head
+            return f"{text[:head]}\n... [{(len(text) - max_chars) // CHARS_PER_TOKEN} tokens truncated] ...\n{text[len(text) - tail:]}"
+
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        head = max_tokens * 2 // 3
+        tail = max_tokens - head
+        removed = len(tokens) - head - tail
+        return f"{encoding.decode(tokens[:head])}\n... [{removed} tokens truncated] ...\n{encoding.decode(tokens[len(tokens) - tail:])}"
+
+    @staticmethod
+    def _latest_user(messages):
+        return max((i for i, message in enumerate(messages) if i > 0 and message.get('role') == 'user'), default=None)
+
+    def enforce(self, messages, budget):
+        """
+        Evict the oldest turns, each a user message with the replies up to the next user message, until the messages fit
+        the budget. The system message and the latest user message (with anything after it) are kept, so the conversation
+        still starts with a user message. If the remaining messages still don't fit, the largest text message, other than
+        the system message and the latest user message, is truncated.
+        Operates in place and returns a tuple (tokens before, tokens after).
+        """
+        tokens_before = self.count_messages(messages)
+        total = tokens_before
+
+        while total > budget:
+            latest_user = self._latest_user(messages)
+            if latest_user is None or latest_user <= 1:
+                break
+            end = next(i for i in range(2, latest_user + 1) if messages[i].get('role') == 'user')
+            total -= self.count_messages(messages[1:end])
+            del messages[1:end]
+
+        # Each remaining message is truncated at most once, leaving room for the truncation marker
+        truncated = {self._latest_user(messages)}
+        while total > budget:
+            candidates = [i for i, message in enumerate(messages) if i > 0 and i not in truncated and isinstance(message.get('content'), str)]
+            if not candidates:
+                break
+            largest = max(candidates, key=lambda i: self.count_message(messages[i]))
+            truncated.add(largest)
+            current = self.count_message(messages[largest]) - TOKENS_PER_MESSAGE
+            allowed = max(current - (total - budget) - TRUNCATION_MARKER_TOKENS, MIN_TRUNCATED_TOKENS)
+            if allowed >= current:
+                continue
+            messages[largest]['content'] = self.truncate_text(messages[largest]['content'], allowed)
+            total = self.count_messages(messages)
+
+        return tokens_before, total
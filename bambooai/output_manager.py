@@ -1,10 +1,16 @@
 
 from termcolor import cprint
-from IPython.display import display, HTML, Markdown
 import sys
 import time
 import pandas as pd
 
+display = HTML = Markdown = None
+
+def _import_ipython_display():
+    # IPython is only needed to render in a notebook (where it is already loaded), so it's not imported at module level
+    global display, HTML, Markdown
+    from IPython.display import display, HTML, Markdown
+
 class OutputManager:
     def __init__(self):
         # Summary colors
@@ -26,6 +32,10 @@ class OutputManager:
         self.color_token_summary_cli = 'yellow'
         # Check if the code is running in a Jupyter notebook
         self.is_notebook = 'ipykernel' in sys.modules
+        if self.is_notebook and display is None:
+            _import_ipython_display()
+        # Called with each streamed LLM response delta (not the thoughts), eg. to spot a complete code block early
+        self.stream_listener = None
     
     # Display the complete results.
     def display_results(self, chain_id=None, execution_mode=None, df_id=None, api_client=None, df=None, query=None, data_model=None, research=None, plan=None, code=None, answer=None, plot_jsons=None, review=None, vector_db=False, generated_datasets=None, semantic_search=None):
@@ -226,6 +236,8 @@ class OutputManager:
 
     # A wrapper for the print function. This can be used to add additional behaviors or formatting to the print function
     def print_wrapper(self, message, end="\n", flush=False, chain_id=None, thought=False):
+        if self.stream_listener is not None and not thought:
+            self.stream_listener(message)
         # Add any additional behaviors or formatting here
         formatted_message = message
         
@@ -0,0 +1,79 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# The 'auto' format saves figures with up to this many data points as SVG, and rasterises the denser ones.
+# In SVG output, artists with more points than this are rasterised inside the vector image.
+SVG_MAX_POINTS = 5000
+IMAGE_FORMATS = ('png', 'webp', 'svg', 'auto')
+MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+
+
+def _webp_supported():
+    try:
+        from PIL import features
+        return bool(features.check('webp'))
+    except Exception:
+        return False
+
+
+def _artist_points(artist):
+    """Number of data points an artist draws, images count as dense"""
+    from matplotlib.collections import Collection
+    from matplotlib.image import AxesImage
+    from matplotlib.lines import Line2D
+
+    if isinstance(artist, AxesImage):
+        return float('inf')
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata(orig=False))
+    if isinstance(artist, Collection):
+        return max(len(artist.get_offsets()), len(artist.get_paths()))
+    return 1
+
+
+def _dense_artists(fig):
+    """The artists of the figure with their point counts"""
+    return [(artist, _artist_points(artist)) for ax in fig.axes for artist in ax.get_children() if artist.get_visible()]
+
+
+def save_figure(fig, image_format='png', dpi=100, max_pixels=0):
+    """
+    Save a matplotlib figure as {'data': bytes, 'format': format}:
+    - png: optimised PNG
+    - webp: lossless WebP (PNG if Pillow was built without WebP)
+    - svg: SVG, with the dense artists rasterised at the DPI
+    - auto: SVG for simple figures, the raster format for dense ones
+    The DPI is lowered when the image would have more than max_pixels pixels (0 disables the cap).
+    """
+    raster_format = 'webp' if _webp_supported() else 'png'
+    if image_format == 'webp':
+        image_format = raster_format
+    elif image_format not in MIME_TYPES:
+        artists = _dense_artists(fig)
+        image_format = 'svg' if sum(points for _, points in artists) <= SVG_MAX_POINTS else raster_format
+
+    width, height = fig.get_size_inches()
+    if max_pixels and width * height * dpi * dpi > max_pixels:
+        dpi = (max_pixels / (width * height)) ** 0.5
+
+    buf = io.BytesIO()
+    if image_format == 'svg':
+        for artist, points in _dense_artists(fig):
+            if points > SVG_MAX_POINTS:
+                artist.set_rasterized(True)
+        fig.savefig(buf, format='svg', dpi=dpi, metadata={'Date': None})
+    elif image_format == 'webp':
+        fig.savefig(buf, format='webp', dpi=dpi, pil_kwargs={'lossless': True, 'method': 4})
+    else:
+        fig.savefig(buf, format='png', dpi=dpi, pil_kwargs={'optimize': True})
+    return {'data': buf.getvalue(), 'format': image_format}
+
+
+def capture_figures(figs, image_format='png', dpi=100, max_pixels=0):
+    """Save the figures that have axes, in parallel when there are several, as the image encoding releases the GIL"""
+    figs = [fig for fig in figs if fig.axes]
+    if len(figs) < 2:
+        return [save_figure(fig, image_format, dpi, max_pixels) for fig in figs]
+    with ThreadPoolExecutor(max_workers=min(len(figs), os.cpu_count() or 1)) as pool:
+        return list(pool.map(lambda fig: save_figure(fig, image_format, dpi, max_pixels), figs))
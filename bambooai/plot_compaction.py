@@ -0,0 +1,141 @@
+"""
+Downsampling of large Plotly traces before they are sent to the browser.
+
+The executor's pio.show patch code calls _compact_figure from the executed code's namespace. Locally the function is
+given to the namespace directly. The remote executor API doesn't have the bambooai package, so the client registers this
+module's source once through its /helpers endpoint, and each execution names the helpers it needs. The module only
+uses numpy and the standard library, and its names are underscore prefixed to stay out of the way of the generated code.
+"""
+import base64
+import uuid
+
+import numpy as np
+
+# Per point trace attributes, sliced together with x and y
+_POINT_ATTRIBUTES = ('x', 'y', 'text', 'hovertext', 'customdata', 'ids')
+_MARKER_POINT_ATTRIBUTES = ('color', 'size', 'symbol', 'opacity')
+_DOWNSAMPLED_TYPES = ('scatter', 'scattergl')
+# Above this many points per output point, min/max points are preselected before LTTB
+_MINMAX_RATIO = 4
+
+
+def _as_numeric(values):
+    """A float64 view of trace values for the downsampling geometry: datetimes as epoch numbers, anything else non numeric as positions"""
+    array = np.asarray(values)
+    if np.issubdtype(array.dtype, np.datetime64):
+        return array.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    if np.issubdtype(array.dtype, np.number) or array.dtype == np.bool_:
+        return array.astype(np.float64)
+    return np.arange(len(array), dtype=np.float64)
+
+
+def _minmax_indices(y, n_bins):
+    """Indices of the first, last and the min/max points of n_bins equal sized bins"""
+    n = len(y)
+    edges = np.linspace(1, n - 1, n_bins + 1).astype(np.int64)
+    indices = [0, n - 1]
+    filled = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0, y)
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            segment = filled[start:end]
+            indices.extend((start + int(np.argmin(segment)), start + int(np.argmax(segment))))
+    return np.unique(indices)
+
+
+def _lttb_indices(x, y, n_out):
+    """Largest-Triangle-Three-Buckets: indices of n_out points preserving the visual shape of the line"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0, y)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # The average of the next bucket is the third point of the triangle
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected]) - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(areas)) if end > start else start
+        indices[i + 1] = selected
+    return np.unique(indices)
+
+
+def _downsample_indices(x, y, n_out):
+    if len(y) > _MINMAX_RATIO * n_out:
+        candidates = _minmax_indices(y, _MINMAX_RATIO * n_out // 2)
+        return candidates[_lttb_indices(x[candidates], y[candidates], n_out)]
+    return _lttb_indices(x, y, n_out)
+
+
+def _typed_array(values):
+    """
+    A numeric 1d sequence as a plotly.js typed array spec (base64 encoded little endian data), which is several times
+    smaller than a JSON number list and doesn't need to be parsed. Other values are returned unchanged.
+    """
+    if isinstance(values, dict) or not isinstance(values, (list, tuple, np.ndarray)) or not len(values):
+        return values
+    array = np.asarray(values)
+    if array.ndim != 1 or array.dtype.kind not in 'iuf':
+        return values
+    if array.dtype.kind in 'iu' and array.dtype.itemsize == 8:
+        # plotly.js has no 64 bit integer arrays
+        array = array.astype(np.int32) if np.abs(array).max() < 2 ** 31 else array.astype(np.float64)
+    elif array.dtype.kind == 'f' and array.dtype.itemsize == 2:
+        array = array.astype(np.float32)
+    array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+    return {'dtype': f"{array.dtype.kind}{array.dtype.itemsize}", 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def _binary_arrays(trace):
+    """Encode the numeric per point arrays of a trace dict as typed arrays"""
+    for name in _POINT_ATTRIBUTES:
+        if name in trace:
+            trace[name] = _typed_array(trace[name])
+    marker = trace.get('marker')
+    if isinstance(marker, dict):
+        for name in _MARKER_POINT_ATTRIBUTES:
+            if name in marker:
+                marker[name] = _typed_array(marker[name])
+
+
+def _compact_figure(fig, max_points):
+    """
+    Return the figure as a dict with the scatter traces longer than max_points downsampled with (min/max) LTTB, and
+    numeric arrays binary encoded. When a trace was downsampled, layout.meta gets a 'full_resolution_key'
+    under which the full resolution figure can be stored and requested later. Returns (figure_dict, key or None).
+    """
+    figure = fig.to_dict()
+    downsampled = False
+    for trace_object, trace in zip(fig.data, figure['data']):
+        y = trace_object['y'] if 'y' in trace_object else None
+        if trace.get('type', 'scatter') not in _DOWNSAMPLED_TYPES or y is None or len(y) <= max_points:
+            _binary_arrays(trace)
+            continue
+        n = len(y)
+        x_values = trace_object['x']
+        x = _as_numeric(x_values) if x_values is not None and len(x_values) == n else np.arange(n, dtype=np.float64)
+        indices = _downsample_indices(x, _as_numeric(y), max_points)
+
+        for name in _POINT_ATTRIBUTES:
+            values = trace_object[name] if name in trace_object else None
+            if values is not None and not isinstance(values, str) and len(values) == n:
+                trace[name] = np.asarray(values)[indices]
+        marker = trace.get('marker')
+        if marker:
+            for name in _MARKER_POINT_ATTRIBUTES:
+                values = trace_object.marker[name]
+                if values is not None and not isinstance(values, (str, int, float)) and len(values) == n:
+                    marker[name] = np.asarray(values)[indices]
+        _binary_arrays(trace)
+        downsampled = True
+
+    if not downsampled:
+        return figure, None
+    key = uuid.uuid4().hex
+    meta = figure['layout'].get('meta')
+    figure['layout']['meta'] = {**meta, 'full_resolution_key': key} if isinstance(meta, dict) else {'full_resolution_key': key}
+    return figure, key
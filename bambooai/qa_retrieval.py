@@ -1,46 +1,251 @@
 import os
+import re
+import json
 import uuid
-from openai import OpenAI
-from pinecone import Pinecone, ServerlessSpec
-from qdrant_client import QdrantClient, models
+import base64
+import hashlib
+import threading
+import importlib.util
+from collections import OrderedDict
+from contextlib import contextmanager
 import numpy as np
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# The embedding and vector database SDKs are imported when a client is created, as they are slow to import
+
+
+# Process-wide Sentence Transformers model, loaded lazily on first use and shared by all wrapper instances
+_hf_model = None
+_hf_model_lock = threading.Lock()
+
+# Process-wide persistent embedding caches, keyed by cache directory
+_embedding_caches = {}
+_embedding_caches_lock = threading.Lock()
+
+
+def _text_hash(text_input):
+    return hashlib.sha256(str(text_input).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent on-disk embedding cache (text hash -> float32 vector).
+
+    Vectors are appended to a raw float32 file which is memory-mapped for reads, and the
+    matching text hashes are appended line by line to a keys file, so row N in one file
+    corresponds to line N in the other. Both files are append-only.
+
+    Several processes (eg. web app workers) can share a cache directory: the appends and the
+    header (meta.json) are written under an exclusive OS file lock (fcntl, so not on Windows,
+    where a cache directory must be used by a single process), and the rows appended by the
+    other processes are indexed before appending.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.vectors_path = os.path.join(cache_dir, "vectors.f32")
+        self.keys_path = os.path.join(cache_dir, "keys.txt")
+        self.meta_path = os.path.join(cache_dir, "meta.json")
+        self.lock_path = os.path.join(cache_dir, "cache.lock")
+        self.lock = threading.Lock()
+        self.dimension = None
+        self.index = {}
+        self._rows = 0
+        self._keys_offset = 0
+        self._vectors = None
+        self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock of the cache files across processes"""
+        with open(self.lock_path, "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._file_lock():
+            self._sync()
+
+    def _sync(self):
+        """
+        Index the rows appended since the last sync (by any process), reading only the new part of the keys file.
+        Called with the file lock held. A trailing row that was only partly written is cut off, so the next
+        append starts at a row boundary in both files.
+        """
+        if self.dimension is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, "r") as f:
+                self.dimension = json.load(f).get("dimension")
+        if not self.dimension or not os.path.exists(self.keys_path):
+            return
+
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            lines = f.read().split(b"\n")[:-1]
+        row_bytes = self.dimension * 4
+        vector_rows = os.path.getsize(self.vectors_path) // row_bytes if os.path.exists(self.vectors_path) else 0
+        lines = lines[:max(vector_rows - self._rows, 0)]
+        for line in lines:
+            self.index[line.decode("ascii").strip()] = self._rows
+            self._rows += 1
+            self._keys_offset += len(line) + 1
+
+        if os.path.getsize(self.keys_path) > self._keys_offset:
+            os.truncate(self.keys_path, self._keys_offset)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > self._rows * row_bytes:
+            os.truncate(self.vectors_path, self._rows * row_bytes)
+
+    def _vector_matrix(self):
+        rows = self._rows
+        if self._vectors is None or self._vectors.shape[0] != rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._vectors
+
+    def get_many(self, keys):
+        """Return a list with the cached vector for each key, or None where the key is not cached"""
+        with self.lock:
+            if not self.index:
+                return [None] * len(keys)
+            matrix = self._vector_matrix()
+            return [np.array(matrix[self.index[key]]) if key in self.index else None for key in keys]
+
+    def put_many(self, keys, vectors):
+        """Append new vectors to the cache"""
+        with self.lock, self._file_lock():
+            self._sync()
+            new_items = [(key, vector) for key, vector in zip(keys, vectors) if key not in self.index and vector is not None]
+            if not new_items:
+                return
+            if self.dimension is None:
+                self.dimension = len(new_items[0][1])
+                with open(self.meta_path, "w") as f:
+                    json.dump({"dimension": self.dimension}, f)
+
+            new_items = [(key, vector) for key, vector in new_items if len(vector) == self.dimension]
+            if not new_items:
+                return
+            block = np.asarray([vector for _, vector in new_items], dtype=np.float32)
+            with open(self.vectors_path, "ab") as f:
+                f.write(block.tobytes())
+            with open(self.keys_path, "ab") as f:
+                data = "".join(f"{key}\n" for key, _ in new_items).encode("ascii")
+                f.write(data)
+
+            for key, _ in new_items:
+                self.index[key] = self._rows
+                self._rows += 1
+            self._keys_offset += len(data)
+
+
+def get_embedding_cache(model_name):
+    """Get the process-wide persistent embedding cache for a model, or None if caching is disabled"""
+    base_dir = os.getenv("EMBEDDING_CACHE_DIR", os.path.join("storage", "embedding_cache"))
+    if not base_dir or os.getenv("EMBEDDING_CACHE", "true").lower() == "false":
+        return None
+
+    cache_dir = os.path.join(base_dir, re.sub(r"[^\w.-]", "_", model_name))
+    with _embedding_caches_lock:
+        if cache_dir not in _embedding_caches:
+            _embedding_caches[cache_dir] = EmbeddingCache(cache_dir)
+        return _embedding_caches[cache_dir]
+
 
 class EmbeddingClientIntegration:
+    model_name = None
+
     def vectorize(self, text_input):
+        return self.vectorize_many([text_input])[0]
+
+    def vectorize_many(self, text_inputs):
+        """Vectorize a list of texts, returning one vector per text. Cached vectors are served from disk."""
+        text_inputs = [str(text_input) for text_input in text_inputs]
+        cache = get_embedding_cache(self.model_name)
+        if cache is None:
+            return self._embed_batch(text_inputs)
+
+        keys = [_text_hash(text_input) for text_input in text_inputs]
+        vectors = cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        if missing:
+            # De-duplicate identical texts within the batch before calling the backend
+            unique_missing = list(OrderedDict((keys[i], text_inputs[i]) for i in missing).items())
+            embedded = self._embed_batch([text_input for _, text_input in unique_missing])
+            cache.put_many([key for key, _ in unique_missing], embedded)
+            embedded_by_key = {key: vector for (key, _), vector in zip(unique_missing, embedded)}
+            for i in missing:
+                vectors[i] = embedded_by_key[keys[i]]
+
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def _embed_batch(self, text_inputs):
+        """Embed a batch of texts with the backend"""
         raise NotImplementedError
 
 
 class OpenAIEmbeddingClient(EmbeddingClientIntegration):
+    model_name = "text-embedding-3-small"
+    MAX_BATCH_SIZE = 2048  # Maximum number of inputs per embeddings request
+
     def __init__(self):
+        from openai import OpenAI
         self.client = OpenAI()
 
-    def vectorize(self, text_input):
-        response = self.client.embeddings.create(
-            input=text_input, model="text-embedding-3-small"
-        )
-        return response.data[0].embedding
+    def _embed_batch(self, text_inputs):
+        vectors = []
+        for i in range(0, len(text_inputs), self.MAX_BATCH_SIZE):
+            response = self.client.embeddings.create(
+                input=text_inputs[i:i + self.MAX_BATCH_SIZE], model=self.model_name
+            )
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
 
 
 class HFSentenceTransformersClient(EmbeddingClientIntegration):
-    def __init__(self):
-        try:
-            from sentence_transformers import SentenceTransformer
+    model_name = "all-MiniLM-L6-v2"
 
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
-        except ImportError:
+    def __init__(self):
+        if importlib.util.find_spec("sentence_transformers") is None:
             raise RuntimeError("Sentence Transformers library is not installed.")
 
-    def vectorize(self, text_input):
-        return self.model.encode([text_input])[0].tolist()
+    @property
+    def model(self):
+        global _hf_model
+        if _hf_model is None:
+            with _hf_model_lock:
+                if _hf_model is None:
+                    from sentence_transformers import SentenceTransformer
+
+                    _hf_model = SentenceTransformer(self.model_name)
+        return _hf_model
+
+    def _embed_batch(self, text_inputs):
+        return self.model.encode(text_inputs).tolist()
 
 
 class BaseVectorDBWrapper:
     """Base class for vector database wrappers with common functionality"""
 
+    # Maximum number of embeddings memoised per wrapper instance (session)
+    EMBEDDING_CACHE_SIZE = 256
+    # Minimum user rank for a solution to be stored in the vector database
+    MIN_USER_RANK_TO_CONSIDER = 6
+
     def __init__(self, output_manager=None):
         self.output_manager = output_manager
         self.embed_platform = os.getenv("EMBEDDING_PLATFORM", "openai")
+        self._embedding_cache = OrderedDict()
+        # The memory backfill vectorizes from worker threads through the same wrapper
+        self._embedding_cache_lock = threading.Lock()
 
         self.embedding_client = self.initialize_embedding_client()
         if not self.embedding_client:
@@ -79,8 +284,47 @@ class BaseVectorDBWrapper:
             raise ValueError(message)
 
     def vectorize_intent(self, intent_text):
-        """Vectorize text using the embedding client"""
-        return self.embedding_client.vectorize(intent_text)
+        """Vectorize text using the embedding client, memoised by text hash"""
+        return self.vectorize_many([intent_text])[0]
+
+    def vectorize_many(self, texts):
+        """Vectorize a list of texts in one batch, memoised by text hash"""
+        keys = [_text_hash(text) for text in texts]
+        # The hits are read now, as another thread may evict them from the cache before this call returns
+        with self._embedding_cache_lock:
+            hits = {i: self._embedding_cache[key] for i, key in enumerate(keys) if key in self._embedding_cache}
+        missing = [i for i in range(len(keys)) if i not in hits]
+
+        # The embedding request is made without holding the lock, so other threads aren't blocked on it
+        if missing:
+            vectors = self.embedding_client.vectorize_many([texts[i] for i in missing])
+        else:
+            vectors = []
+
+        results = [hits.get(i) for i in range(len(keys))]
+        for i, vector in zip(missing, vectors):
+            results[i] = vector
+
+        with self._embedding_cache_lock:
+            for key, vector in zip(keys, results):
+                if vector is None:
+                    continue
+                if key in self._embedding_cache:
+                    self._embedding_cache.move_to_end(key)
+                else:
+                    self._embedding_cache[key] = vector
+
+            while len(self._embedding_cache) > self.EMBEDDING_CACHE_SIZE:
+                self._embedding_cache.popitem(last=False)
+        return results
+
+    def encode_vector(self, vector):
+        """Encode a vector as a base64 float32 string, so it can be stored in record metadata"""
+        return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+    def decode_vector(self, encoded_vector):
+        """Decode a vector previously encoded with encode_vector"""
+        return np.frombuffer(base64.b64decode(encoded_vector), dtype=np.float32)
 
     def check_similarity(self, match, similarity_threshold):
         """Check if a match meets the similarity threshold"""
@@ -115,33 +359,46 @@ class BaseVectorDBWrapper:
         if not data_descr or len(qualified_intent_matches) == 1:
             return qualified_intent_matches[0]
 
-        best_match_after_reranking = None
-        highest_data_descr_similarity = -2.0
-
         try:
-            new_data_descr_vector = self.vectorize_intent(data_descr)
+            new_data_descr_vector = np.asarray(self.vectorize_intent(data_descr), dtype=np.float32)
         except Exception as e:
             return qualified_intent_matches[0]
 
+        # Collect the stored data description vectors. Records stored before the vector was kept in metadata
+        # fall back to embedding the stored descriptions, in one batch (memoised, so each is embedded at most once).
+        legacy_descrs = [
+            match.get("metadata", {}).get("data_descr")
+            for match in qualified_intent_matches
+            if not match.get("metadata", {}).get("data_descr_vector") and match.get("metadata", {}).get("data_descr")
+        ]
+        try:
+            legacy_vectors = dict(zip(legacy_descrs, self.vectorize_many(legacy_descrs))) if legacy_descrs else {}
+        except Exception as e:
+            legacy_vectors = {}
+
+        stored_vectors = []
         for match in qualified_intent_matches:
-            stored_data_descr = match.get("metadata", {}).get("data_descr")
-
-            if not stored_data_descr:
-                current_data_descr_similarity = -1.0
-            else:
-                try:
-                    stored_data_descr_vector = self.vectorize_intent(stored_data_descr)
-                    current_data_descr_similarity = self.cosine_similarity_np(
-                        new_data_descr_vector, stored_data_descr_vector
-                    )
-                except Exception as e:
-                    current_data_descr_similarity = -1.0
+            metadata = match.get("metadata", {})
+            stored_vector = None
+            try:
+                if metadata.get("data_descr_vector"):
+                    stored_vector = self.decode_vector(metadata["data_descr_vector"])
+                elif legacy_vectors.get(metadata.get("data_descr")) is not None:
+                    stored_vector = np.asarray(legacy_vectors[metadata["data_descr"]], dtype=np.float32)
+            except Exception as e:
+                stored_vector = None
+
+            if stored_vector is None or stored_vector.shape != new_data_descr_vector.shape:
+                stored_vector = np.zeros_like(new_data_descr_vector)
+            stored_vectors.append(stored_vector)
 
-            if current_data_descr_similarity > highest_data_descr_similarity:
-                highest_data_descr_similarity = current_data_descr_similarity
-                best_match_after_reranking = match
+        # Re-rank all qualified matches with a single batched cosine similarity
+        stored_matrix = np.vstack(stored_vectors)
+        norms = np.linalg.norm(stored_matrix, axis=1) * np.linalg.norm(new_data_descr_vector)
+        dot_products = stored_matrix @ new_data_descr_vector
+        similarities = np.divide(dot_products, norms, out=np.full(len(stored_vectors), -1.0), where=norms > 0)
 
-        return best_match_after_reranking or qualified_intent_matches[0]
+        return qualified_intent_matches[int(np.argmax(similarities))]
 
     def add_record(
         self,
@@ -157,14 +414,13 @@ class BaseVectorDBWrapper:
     ):
         """Add a new record to the vector database"""
         new_rank = int(new_rank)
-        MIN_USER_RANK_TO_CONSIDER = 6
 
         remaining_distance = 1.0 - similarity_threshold_for_semantic_match
         strong_threshold = similarity_threshold_for_semantic_match + (
             remaining_distance * percentage_of_distance_to_add
         )
 
-        if new_rank < MIN_USER_RANK_TO_CONSIDER:
+        if new_rank < self.MIN_USER_RANK_TO_CONSIDER:
             return
 
         record_id = str(chain_id)
@@ -176,14 +432,19 @@ class BaseVectorDBWrapper:
                 )
             return
 
-        metadata = {
-            "intent": intent_text,
-            "data_descr": data_descr,
-            "data_model": data_model,
-            "plan": plan,
-            "code": code,
-            "rank": new_rank,
-        }
+        data_descr_vector = None
+        if data_descr:
+            try:
+                data_descr_vector = self.vectorize_intent(data_descr)
+            except Exception as e:
+                if self.output_manager:
+                    self.output_manager.display_system_messages(
+                        f"Failed to vectorize data description for chain ID {chain_id}: {str(e)}"
+                    )
+
+        metadata = self.build_record_metadata(
+            intent_text, plan, data_descr, data_model, code, new_rank, data_descr_vector
+        )
 
         semantically_similar_existing_match = self.retrieve_matching_record(
             intent_text, data_descr, strong_threshold
@@ -201,6 +462,28 @@ class BaseVectorDBWrapper:
         else:
             self.upsert_record(record_id, vectorised_intent, metadata)
 
+    def build_record_metadata(self, intent_text, plan, data_descr, data_model, code, rank, data_descr_vector=None):
+        """Build the metadata stored alongside the intent vector"""
+        metadata = {
+            "intent": intent_text,
+            "data_descr": data_descr,
+            "data_model": data_model,
+            "plan": plan,
+            "code": code,
+            "rank": int(rank),
+        }
+
+        # Store the data description vector alongside the record, so re-ranking does not need to re-embed it
+        if data_descr_vector is not None:
+            metadata["data_descr_vector"] = self.encode_vector(data_descr_vector)
+
+        return metadata
+
+    def upsert_records(self, records):
+        """Upsert a batch of (record_id, vector, metadata) tuples"""
+        for record_id, vector, metadata in records:
+            self.upsert_record(record_id, vector, metadata)
+
     def initialize_database(self):
         """Initialize database-specific client and settings"""
         raise NotImplementedError
@@ -244,6 +527,7 @@ class PineconeWrapper(BaseVectorDBWrapper):
 
         self.cloud = os.getenv("PINECONE_CLOUD", "aws")
         self.env = os.getenv("PINECONE_REGION", "us-east-1")
+        from pinecone import Pinecone
         self.pinecone_client = Pinecone(api_key=self.api_key)
         self.index = None
 
@@ -262,6 +546,7 @@ class PineconeWrapper(BaseVectorDBWrapper):
 
     def ensure_collection_exists(self):
         if self.collection_name not in self.pinecone_client.list_indexes().names():
+            from pinecone import ServerlessSpec
             if self.output_manager:
                 self.output_manager.display_system_messages(
                     f"Creating a new vector db index. Please wait... {self.collection_name}"
@@ -293,6 +578,9 @@ class PineconeWrapper(BaseVectorDBWrapper):
     def upsert_record(self, record_id, vector, metadata):
         self.index.upsert(vectors=[(record_id, vector, metadata)])
 
+    def upsert_records(self, records):
+        self.index.upsert(vectors=[(str(record_id), vector, metadata) for record_id, vector, metadata in records])
+
     def delete_record(self, record_id):
         try:
             self.index.delete(ids=[str(record_id)])
@@ -344,6 +632,7 @@ class QdrantWrapper(BaseVectorDBWrapper):
         url = os.getenv("QDRANT_URL", "http://localhost:6333")
         api_key = os.getenv("QDRANT_API_KEY")
 
+        from qdrant_client import QdrantClient
         self.qdrant_client = QdrantClient(url=url, api_key=api_key)
         self.collection = None
 
@@ -363,6 +652,7 @@ class QdrantWrapper(BaseVectorDBWrapper):
         return settings.get(self.embed_platform, (None, None))
 
     def ensure_collection_exists(self):
+        from qdrant_client import models
         try:
             if not self.qdrant_client.collection_exists(self.collection_name):
                 if self.output_manager:
@@ -442,6 +732,7 @@ class QdrantWrapper(BaseVectorDBWrapper):
             return None
 
     def upsert_record(self, record_id, vector, metadata):
+        from qdrant_client import models
         uuid_id = self._generate_uuid_from_id(record_id)
         prepared_metadata = self._prepare_qdrant_metadata(metadata.copy())
 
@@ -452,7 +743,19 @@ class QdrantWrapper(BaseVectorDBWrapper):
             ],
         )
 
+    def upsert_records(self, records):
+        from qdrant_client import models
+        points = []
+        for record_id, vector, metadata in records:
+            prepared_metadata = self._prepare_qdrant_metadata(metadata.copy())
+            points.append(
+                models.PointStruct(id=self._generate_uuid_from_id(record_id), vector=vector, payload=prepared_metadata)
+            )
+
+        self.qdrant_client.upsert(collection_name=self.collection_name, points=points)
+
     def delete_record(self, record_id):
+        from qdrant_client import models
         try:
             uuid_id = self._generate_uuid_from_id(record_id)
             self.qdrant_client.delete(
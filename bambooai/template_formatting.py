@@ -1,5 +1,7 @@
 import os
 
+from bambooai import dataset_lifecycle
+
 class CodeGenPromptGenerator:
     def __init__(self, templates, model_dict):
         """
@@ -74,7 +76,7 @@ class CodeGenPromptGenerator:
         use_plan = planning and model not in reasoning_models
 
         # This is the string that instructs the LLM on how to format the path for saving datasets.
-        generated_datasets_path_instruction = f"{generated_datasets_path}/<descriptive_name>.csv" if generated_datasets_path else ""
+        generated_datasets_path_instruction = dataset_lifecycle.path_instruction(generated_datasets_path)
 
         formatted_sections = {
             'plan_or_context': self.format_section(
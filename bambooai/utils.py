@@ -7,10 +7,9 @@ import io
 import os
 import re
 import sys
-import pkg_resources
+import importlib.metadata
 from typing import Optional, Union, Dict, List
 import unicodedata
-import pyarrow.parquet as pq
 import csv
 import logging # For better debugging
 
@@ -38,14 +37,12 @@ def get_package_versions():
         'python_version': f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
     }
     
-    # Get installed packages
-    installed_packages = {pkg.key: pkg.version for pkg in pkg_resources.working_set}
-    
-    # Check for pandas
-    versions['pandas_version'] = installed_packages.get('pandas', 'Not installed')
-    
-    # Check for plotly
-    versions['plotly_version'] = installed_packages.get('plotly', 'Not installed')
+    # Look up only the packages we need, rather than scanning every installed distribution
+    for package in ('pandas', 'plotly'):
+        try:
+            versions[f'{package}_version'] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[f'{package}_version'] = 'Not installed'
     
     return versions
 
@@ -62,30 +59,53 @@ def dataframe_summary_to_string(df: pd.DataFrame,
     
     # Local execution
     result = []
+    # A LazyFrame can only exist once its module is loaded, which keeps pyarrow.dataset out of the bambooai import
+    lazy_frame = sys.modules.get('bambooai.lazy_frame')
+    lazy = lazy_frame is not None and isinstance(df, lazy_frame.LazyFrame)
     for col in df.columns:
-        missing = df[col].isnull().sum()
-        missing_info = f" missing={missing}" if missing > 0 else ""
+        # An out-of-core frame computes the statistics from the column on disk, without loading the dataset
+        if lazy:
+            stats = df.column_stats(col)
+        else:
+            stats = _column_stats(df[col])
+        missing_info = f" missing={stats['missing']}" if stats['missing'] > 0 else ""
         
-        if pd.api.types.is_numeric_dtype(df[col]):
-            vals = df[col].dropna()
-            if len(vals) > 0:
-                result.append(f"{col}: numeric(n={len(vals)}) range={vals.min():.1f}-{vals.max():.1f} mean={vals.mean():.1f}{missing_info}")
+        if stats['numeric']:
+            if stats['count'] > 0:
+                result.append(f"{col}: numeric(n={stats['count']}) range={stats['min']:.1f}-{stats['max']:.1f} mean={stats['mean']:.1f}{missing_info}")
             else:
                 result.append(f"{col}: numeric all_missing")
         else:
-            unique_count = df[col].nunique()
             # Show top 3 values if reasonable number of categories
-            if unique_count <= 10:
-                top_vals = df[col].value_counts().head(3).index.tolist()
-                samples = f" values=[{', '.join(str(v) for v in top_vals)}]"
+            if 'top' in stats:
+                samples = f" values=[{', '.join(str(v) for v in stats['top'])}]"
             else:
-                samples = f" samples=[{', '.join(str(v) for v in df[col].dropna().head(2))}...]"
+                samples = f" samples=[{', '.join(str(v) for v in stats['samples'])}...]"
             
-            result.append(f"{col}: categorical(n={df[col].count()}) unique={unique_count}{samples}{missing_info}")
+            result.append(f"{col}: categorical(n={stats['count']}) unique={stats['unique']}{samples}{missing_info}")
+    
+    if lazy:
+        result.append("Note: df is an out-of-core LazyFrame. Pass df.to_pandas() to top level pandas functions (pd.concat, pd.merge, ...).")
     
     return '\n'.join(result)
 
 
+def _column_stats(series: pd.Series, max_categories: int = 10, top: int = 3, samples: int = 2) -> Dict:
+    """Summary statistics of a column, in the same form as LazyFrame.column_stats"""
+    missing = series.isnull().sum()
+    if pd.api.types.is_numeric_dtype(series):
+        vals = series.dropna()
+        return {'count': len(vals), 'missing': missing, 'numeric': True,
+                'min': vals.min() if len(vals) else None, 'max': vals.max() if len(vals) else None, 'mean': vals.mean() if len(vals) else None}
+
+    stats = {'count': series.count(), 'missing': missing, 'numeric': False, 'unique': series.nunique()}
+    if stats['unique'] <= max_categories:
+        stats['top'] = series.value_counts().head(top).index.tolist()
+    else:
+        stats['samples'] = series.dropna().head(samples).tolist()
+    return stats
+
+
 def dataframe_to_string(df: pd.DataFrame, 
                        num_rows: int = 5,
                        execution_mode: str = 'local',
@@ -161,6 +181,7 @@ def aux_datasets_to_string(file_paths: List[str],
             if file_ext == '.csv':
                 df = pd.read_csv(path, nrows=num_rows)
             elif file_ext in ['.parquet', '.pq']:
+                import pyarrow.parquet as pq
                 parquet_file = pq.ParquetFile(path)
                 # Read only the first batch (up to num_rows)
                 # Ensure there are row groups to read
@@ -233,6 +254,7 @@ def get_aux_datasets_columns(file_paths: List[str],
                     reader = csv.reader(csvfile)
                     columns = next(reader)
             elif file_ext in ['.parquet', '.pq']:
+                import pyarrow.parquet as pq
                 parquet_file = pq.ParquetFile(path)
                 columns = parquet_file.schema.names
             else:
@@ -300,6 +322,7 @@ def compute_aux_dataset_sample(file_paths: List[str],
             elif file_ext == '.csv':
                 df = pd.read_csv(path, nrows=num_rows)
             elif file_ext in ['.parquet', '.pq']:
+                import pyarrow.parquet as pq
                 parquet_file = pq.ParquetFile(path)
                 if parquet_file.num_row_groups > 0:
                     first_row_group_reader = parquet_file.reader.read_row_group(0)
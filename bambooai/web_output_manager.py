@@ -18,6 +18,8 @@ class WebOutputManager(OutputManager):
     def print_wrapper(self, message, end="\n", flush=False, chain_id=None, thought=False):
         formatted_message = str(message)
         if self.web_mode:
+            if self.stream_listener is not None and not thought:
+                self.stream_listener(formatted_message)
             if self.last_chunk_ended_with_newline and formatted_message.startswith("\n"):
                 formatted_message = formatted_message.lstrip("\n")
             if end:
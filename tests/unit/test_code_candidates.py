@@ -0,0 +1,130 @@
+import os
+import time
+
+import pytest
+
+from bambooai import models
+from bambooai.bambooai import BambooAI
+
+AGENTS = ['Code Generator', 'Code Generator 2', 'Code Generator 3']
+
+
+class Output:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+
+class FakeExecutor:
+    """Runs a candidate by its first line, writing the files and returning the outcome listed for it"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.executed = []
+        self.last_execution_cached = False
+        self.last_execution_cancelled = False
+
+    def execute(self, code, df, df_id, generated_datasets_path, aux_file_paths):
+        name = code.splitlines()[0].lstrip('# ')
+        self.executed.append(name)
+        results, error, files = self.outcomes[name]
+        for file in files:
+            with open(os.path.join(generated_datasets_path, file), 'w') as f:
+                f.write(name)
+        return df, results, error, [], []
+
+
+@pytest.fixture
+def bamboo(tmp_path, monkeypatch):
+    monkeypatch.setattr(models, 'load_llm_config', lambda: {'agent_configs': [{'agent': agent} for agent in AGENTS]})
+    monkeypatch.setattr(models, 'get_model_name', lambda agent: (f'{agent} model', 'openai'))
+    bamboo = BambooAI.__new__(BambooAI)
+    bamboo.code_candidates = len(AGENTS)
+    bamboo.output_manager = Output()
+    bamboo.log_and_call_manager = None
+    bamboo.chain_id = 1
+    bamboo.df, bamboo.df_id, bamboo.auxiliary_datasets = None, None, None
+    bamboo.execution_mode = 'local'
+    bamboo._code_generation_prompt = lambda agent, *args: f'prompt for {agent}'
+    return bamboo
+
+
+def generate(bamboo, tmp_path, candidates, outcomes):
+    """candidates maps each agent to (delay of its response, code)"""
+    def llm_call(log_and_call_manager, messages, agent, chain_id):
+        delay, code = candidates[agent]
+        time.sleep(delay)
+        return f"```python\n{code}\n```"
+
+    bamboo.llm_call = llm_call
+    bamboo.executor = FakeExecutor(outcomes)
+    folder = tmp_path / 'generated'
+    folder.mkdir(exist_ok=True)
+    code_messages = []
+    code, _, result = bamboo.generate_code_candidates('Data Analyst DF', None, None, code_messages, None, str(folder))
+    return code, result, sorted(os.listdir(folder)), code_messages
+
+
+def test_the_first_candidate_with_output_is_selected_and_the_others_files_removed(bamboo, tmp_path):
+    candidates = {
+        'Code Generator': (0, "# failing\nraise ValueError()"),
+        'Code Generator 2': (0.1, "# silent\nx = 1"),
+        'Code Generator 3': (0.2, "# working\nprint(1)"),
+    }
+    outcomes = {
+        'failing': ('', 'ValueError', ['failing.csv']),
+        'silent': ('', None, []),
+        'working': ('1\n', None, ['working.csv']),
+    }
+    code, result, files, code_messages = generate(bamboo, tmp_path, candidates, outcomes)
+
+    assert code == "# working\nprint(1)"
+    assert result[1] == '1\n' and result[2] is None
+    assert result[4] == [str(tmp_path / 'generated' / 'working.csv')]
+    assert files == ['working.csv']
+    assert code_messages[0] == {'role': 'user', 'content': 'prompt for Code Generator 3'}
+
+
+def test_a_candidate_without_output_is_only_used_when_no_other_one_succeeds(bamboo, tmp_path):
+    candidates = {
+        'Code Generator': (0, "# failing\nraise ValueError()"),
+        'Code Generator 2': (0.1, "# silent\nx = 1"),
+        'Code Generator 3': (0.2, "# failing too\nraise KeyError()"),
+    }
+    outcomes = {'failing': ('', 'ValueError', []), 'silent': ('', None, []), 'failing too': ('', 'KeyError', [])}
+    code, result, _, _ = generate(bamboo, tmp_path, candidates, outcomes)
+
+    assert code == "# silent\nx = 1"
+    assert result[2] is None
+
+
+def test_without_a_working_candidate_the_first_one_is_returned_with_its_error(bamboo, tmp_path):
+    # The candidates arrive in the reverse order of the agents
+    candidates = {
+        'Code Generator': (0.2, "# first\nraise ValueError()"),
+        'Code Generator 2': (0.1, "# second\nraise KeyError()"),
+        'Code Generator 3': (0, "# third\nraise TypeError()"),
+    }
+    outcomes = {
+        'first': ('', 'ValueError', ['first.csv']),
+        'second': ('', 'KeyError', ['second.csv']),
+        'third': ('', 'TypeError', ['third.csv']),
+    }
+    code, result, files, _ = generate(bamboo, tmp_path, candidates, outcomes)
+
+    assert bamboo.executor.executed == ['third', 'second', 'first']
+    assert code == "# first\nraise ValueError()"
+    assert result[2] == 'ValueError'
+    assert files == ['first.csv']
+
+
+def test_candidates_with_the_same_normalised_code_run_once(bamboo, tmp_path):
+    candidates = {
+        'Code Generator': (0, "# same\nraise ValueError()"),
+        'Code Generator 2': (0.1, "# same\n\nraise ValueError()  # reformatted"),
+        'Code Generator 3': (0.2, "# other\nprint(1)"),
+    }
+    outcomes = {'same': ('', 'ValueError', []), 'other': ('1\n', None, [])}
+    code, _, _, _ = generate(bamboo, tmp_path, candidates, outcomes)
+
+    assert bamboo.executor.executed == ['same', 'other']
+    assert code == "# other\nprint(1)"
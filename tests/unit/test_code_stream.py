@@ -0,0 +1,58 @@
+import sys
+
+from bambooai.code_executor import CodeExecutor
+from bambooai.code_stream import StreamedCode
+
+ANALYST = 'Data Analyst DF'
+
+
+def stream(streamed, response, size=7):
+    for i in range(0, len(response), size):
+        streamed.feed(response[i:i + size])
+
+
+def recorder():
+    calls = {'prepare': [], 'execute': [], 'discard': []}
+    hooks = {
+        'prepare': calls['prepare'].append,
+        'execute': lambda code: calls['execute'].append(code) or f'result of {code}',
+        'discard': calls['discard'].append,
+    }
+    return calls, hooks
+
+
+def test_the_first_complete_code_block_is_sanitised_and_prepared():
+    calls, hooks = recorder()
+    streamed = StreamedCode(ANALYST, 'openai', **hooks)
+    stream(streamed, "Plan:\n```python\nimport subprocess\nprint(1)\n```\nThe code prints 1.\n```python\nprint(2)\n```")
+
+    assert streamed.code == "# not allowed import subprocess\nprint(1)"
+    assert streamed.result(streamed.code) == f'result of {streamed.code}'
+    assert calls['prepare'] == calls['execute'] == [streamed.code]
+    assert calls['discard'] == []
+
+
+def test_the_result_of_different_code_is_discarded():
+    calls, hooks = recorder()
+    streamed = StreamedCode(ANALYST, 'openai', **hooks)
+    stream(streamed, "```python\nprint(1)\n```")
+
+    assert streamed.result("print(1)\nprint(2)") is None
+    assert calls['discard'] == ["result of print(1)"]
+
+
+def test_nothing_runs_without_a_complete_code_block():
+    calls, hooks = recorder()
+    streamed = StreamedCode(ANALYST, 'openai', **hooks)
+    stream(streamed, "No code yet ```python\nprint(1)")
+
+    assert streamed.code is None
+    assert streamed.result("print(1)") is None
+    assert calls == {'prepare': [], 'execute': [], 'discard': []}
+
+
+def test_prepare_does_not_import_blacklisted_modules(monkeypatch):
+    monkeypatch.delitem(sys.modules, 'xml.etree.ElementTree', raising=False)
+    monkeypatch.delitem(sys.modules, 'xml.etree', raising=False)
+    CodeExecutor().prepare("import xml.etree.ElementTree as ET\nimport json")
+    assert 'xml.etree.ElementTree' not in sys.modules
@@ -0,0 +1,76 @@
+import pandas as pd
+import pytest
+
+from bambooai.column_projection import referenced_columns, modifies_frame
+from bambooai.code_executor import CodeExecutor
+
+COLUMNS = ['a', 'b', 'c', 'd']
+
+
+@pytest.mark.parametrize('code, expected', [
+    ("df.groupby('c')['a'].sum()", ['a', 'c']),
+    ("df.groupby(['b', 'c'])['a'].sum()", ['a', 'b', 'c']),
+    ("df.sort_values(by='b', ascending=False)['a']", ['a', 'b']),
+    ("df.nlargest(3, 'b')[['a', 'b']]", ['a', 'b']),
+    ("df.dropna(subset=['d'])['a']", ['a', 'd']),
+    ("df.query('a > 1 and `b` < 2')['c']", ['a', 'b', 'c']),
+])
+def test_literal_arguments_are_projected(code, expected):
+    assert referenced_columns(code, COLUMNS) == expected
+
+
+@pytest.mark.parametrize('code', [
+    "g = 'c'\ndf.groupby(g)['a'].sum()",
+    "cols = ['b', 'c']\ndf.groupby(cols)['a'].sum()",
+    "key = 'b'\ndf.sort_values(key)['a']",
+    "key = 'b'\ndf.sort_values(by=key)['a']",
+    "key = 'b'\ndf.set_index(key)['a']",
+    "key = 'b'\ndf.nlargest(3, key)['a']",
+    "subset = ['d']\ndf.dropna(subset=subset)['a']",
+    "df.groupby(lambda i: i % 2)['a'].sum()",
+    "df.groupby(*['c'])['a'].sum()",
+])
+def test_variable_arguments_need_the_full_frame(code):
+    assert referenced_columns(code, COLUMNS) is None
+
+
+@pytest.mark.parametrize('code', [
+    "print(df)",
+    "df[column]",
+    "df.describe()",
+    "df['e'] = df['a']",
+    "df.sort_values('a', inplace=True)",
+])
+def test_dynamic_or_modifying_code_needs_the_full_frame(code):
+    assert referenced_columns(code, COLUMNS) is None
+
+
+@pytest.mark.parametrize('code', [
+    "print(df.count())",
+    "print(df.size)",
+    "df.values.sum()",
+    "df.mode()",
+])
+def test_dataframe_attributes_are_not_read_as_columns(code):
+    assert referenced_columns(code, COLUMNS + ['count', 'size', 'values', 'mode']) is None
+
+
+def test_columns_that_shadow_a_method_are_read_by_key():
+    assert referenced_columns("df['count'].sum()", COLUMNS + ['count']) == ['count']
+    assert referenced_columns("df.sample(2)['count']", COLUMNS + ['count', 'sample']) == ['count']
+
+
+def test_modifies_frame():
+    assert modifies_frame("data = df\ndata['x'] = 1")
+    assert modifies_frame("df.drop(columns=['a'], inplace=True)")
+    assert not modifies_frame("x = df['a'].sum()")
+
+
+def test_projected_execution_with_a_variable_group_key(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    df = pd.DataFrame({'a': [1, 2, 3], 'b': [4, 5, 6], 'c': ['x', 'y', 'x']})
+    executor = CodeExecutor()
+    code = "g = 'c'\nprint(df.groupby(g)['a'].sum().to_dict())"
+    _, results, error, _, _ = executor.execute(code, df, generated_datasets_path=str(tmp_path / 'generated'))
+    assert error is None
+    assert results.strip() == "{'x': 4, 'y': 2}"
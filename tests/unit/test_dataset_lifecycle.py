@@ -0,0 +1,80 @@
+import os
+import time
+
+from bambooai import dataset_lifecycle
+from bambooai.dataset_lifecycle import GeneratedDatasets
+
+KB = 1 / 1024  # quotas are in MB
+
+
+def write_chain(root, thread_id, chain_id, size=600):
+    chain_dir = os.path.join(root, thread_id, chain_id)
+    os.makedirs(chain_dir, exist_ok=True)
+    with open(os.path.join(chain_dir, 'data.csv'), 'wb') as f:
+        f.write(b'x' * size)
+    return chain_dir
+
+
+def register(manager, chain_dir, updated):
+    removed = manager.register(chain_dir)
+    manager._chains[tuple(chain_dir.split(os.sep)[-2:])]['updated'] = updated
+    return removed
+
+
+def test_thread_quota_removes_the_oldest_chains_of_the_thread(tmp_path):
+    root = str(tmp_path / 'generated')
+    manager = GeneratedDatasets(root, thread_quota=KB, user_quota=0)
+    register(manager, write_chain(root, 't1', 'c1'), 1)
+    register(manager, write_chain(root, 't2', 'c1'), 2)
+    removed = register(manager, write_chain(root, 't1', 'c2'), 3)
+
+    assert removed == 1
+    assert not os.path.exists(os.path.join(root, 't1', 'c1'))
+    assert os.path.exists(os.path.join(root, 't1', 'c2'))
+    assert os.path.exists(os.path.join(root, 't2', 'c1'))
+    assert manager.usage('t1') == 600
+
+
+def test_user_quota_keeps_the_favourite_threads(tmp_path):
+    root = str(tmp_path / 'generated')
+    favourites = tmp_path / 'favourites'
+    (favourites / 't1').mkdir(parents=True)
+    manager = GeneratedDatasets(root, str(favourites), thread_quota=0, user_quota=KB)
+    register(manager, write_chain(root, 't1', 'c1'), 1)
+    register(manager, write_chain(root, 't2', 'c1'), 2)
+    register(manager, write_chain(root, 't3', 'c1'), 3)
+
+    assert os.path.exists(os.path.join(root, 't1', 'c1'))
+    assert not os.path.exists(os.path.join(root, 't2'))
+    assert os.path.exists(os.path.join(root, 't3', 'c1'))
+
+
+def test_the_index_survives_a_restart(tmp_path):
+    root = str(tmp_path / 'generated')
+    GeneratedDatasets(root).register(write_chain(root, 't1', 'c1'))
+
+    reloaded = GeneratedDatasets(root)
+    assert reloaded.files('t1') == [os.path.join(root, 't1', 'c1', 'data.csv')]
+
+
+def test_expiry_covers_folders_that_were_never_registered(tmp_path):
+    root = str(tmp_path / 'generated')
+    manager = GeneratedDatasets(root)
+    manager.register(write_chain(root, 't1', 'c1'))
+    orphan = write_chain(root, 't2', 'c1')
+    os.utime(orphan, (0, 0))
+    os.remove(os.path.join(root, 't1', 'c1', 'data.csv'))
+    os.rmdir(os.path.join(root, 't1', 'c1'))
+
+    assert manager.reconcile() == 2
+    assert manager.files() == [os.path.join(orphan, 'data.csv')]
+    assert manager.expire(time.time() - 3600) == 1
+    assert not os.path.exists(orphan)
+
+
+def test_every_managed_root_gets_a_janitor(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset_lifecycle, '_managers', {})
+    first = dataset_lifecycle.get_manager(str(tmp_path / 'user1'))
+    second = dataset_lifecycle.get_manager(str(tmp_path / 'user2'))
+    assert first is dataset_lifecycle.get_manager(str(tmp_path / 'user1'))
+    assert first._janitor.is_alive() and second._janitor.is_alive()
@@ -0,0 +1,72 @@
+import threading
+import time
+
+import numpy as np
+
+from bambooai.qa_retrieval import BaseVectorDBWrapper, EmbeddingCache
+
+
+def vector(value):
+    return [float(value)] * 3
+
+
+def test_caches_sharing_a_directory_see_each_others_rows(tmp_path):
+    # Two instances stand for two processes, each with its own in-memory index
+    first = EmbeddingCache(str(tmp_path))
+    second = EmbeddingCache(str(tmp_path))
+    first.put_many(['a', 'b'], [vector(1), vector(2)])
+    second.put_many(['c', 'a'], [vector(3), vector(9)])
+    first.put_many(['d'], [vector(4)])
+
+    reloaded = EmbeddingCache(str(tmp_path))
+    values = reloaded.get_many(['a', 'b', 'c', 'd'])
+    assert [v[0] for v in values] == [1, 2, 3, 4]
+    assert [v[0] for v in second.get_many(['a', 'b', 'c'])] == [1, 2, 3]
+
+
+def test_a_partly_written_row_is_cut_off(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many(['a'], [vector(1)])
+    with open(cache.vectors_path, 'ab') as f:
+        f.write(np.asarray([5.0], dtype=np.float32).tobytes())
+
+    reloaded = EmbeddingCache(str(tmp_path))
+    reloaded.put_many(['b'], [vector(2)])
+    assert [v[0] for v in EmbeddingCache(str(tmp_path)).get_many(['a', 'b'])] == [1, 2]
+
+
+class FakeEmbeddingClient:
+    def vectorize_many(self, texts):
+        time.sleep(0.001)
+        return [vector(len(text)) for text in texts]
+
+
+class FakeWrapper(BaseVectorDBWrapper):
+    EMBEDDING_CACHE_SIZE = 3
+
+    def initialize_embedding_client(self):
+        return FakeEmbeddingClient()
+
+    def determine_collection_settings(self):
+        return None, None
+
+
+def test_concurrent_vectorizing_with_evictions_returns_every_vector():
+    wrapper = FakeWrapper()
+    texts = ['x' * length for length in range(1, 9)]
+    errors = []
+
+    def worker(offset):
+        for i in range(50):
+            batch = [texts[(offset + i + j) % len(texts)] for j in range(3)]
+            results = wrapper.vectorize_many(batch)
+            if [result and result[0] for result in results] != [len(text) for text in batch]:
+                errors.append(results)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(wrapper._embedding_cache) <= FakeWrapper.EMBEDDING_CACHE_SIZE
@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from bambooai import code_executor
+from bambooai.code_executor import CodeExecutor
+from bambooai.column_projection import modifies_frame
+from bambooai.execution_cache import read_files
+
+
+@pytest.fixture
+def executor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(code_executor, 'EXECUTION_CACHE', True)
+    return CodeExecutor()
+
+
+def run(executor, code, df, tmp_path):
+    _, results, error, _, _ = executor.execute(code, df, generated_datasets_path=str(tmp_path / 'generated'))
+    assert error is None
+    return results, executor.last_execution_cached
+
+
+def test_key_ignores_formatting_but_not_the_dataset_version(executor):
+    df = pd.DataFrame({'a': [1, 2]})
+    key = executor._cache_key("x = df['a'].sum()\nprint(x)", df, None, None)
+    assert key == executor._cache_key("x = df['a'].sum()  # total\n\nprint(x)", df, None, None)
+    assert key != executor._cache_key("x = df['a'].sum()\nprint(x)", df.copy(), None, None)
+    assert executor._cache_key("import random\nprint(random.random())", df, None, None) is None
+
+
+def test_key_changes_with_the_files_the_code_reads(executor, tmp_path):
+    df = pd.DataFrame({'a': [1, 2]})
+    extra = tmp_path / 'extra.csv'
+    extra.write_text('b\n1\n')
+    code = "print(pd.read_csv('extra.csv')['b'].sum())"
+    assert read_files(code) == ['extra.csv']
+    key = executor._cache_key(code, df, None, None)
+    extra.write_text('b\n1\n2\n')
+    assert executor._cache_key(code, df, None, None) != key
+
+
+def test_repeated_execution_is_served_from_the_cache(executor, tmp_path):
+    df = pd.DataFrame({'a': [1, 2]})
+    code = "print(df['a'].sum())"
+    assert run(executor, code, df, tmp_path) == ('3\n', False)
+    assert run(executor, code, df, tmp_path) == ('3\n', True)
+
+
+def test_mutation_through_a_user_function_invalidates_the_cache(executor, tmp_path):
+    df = pd.DataFrame({'a': [1, 2]})
+    read = "print(df.columns.tolist())"
+    mutate = "def add_column(d):\n    d['b'] = 1\nadd_column(df)"
+    assert modifies_frame(mutate)
+    run(executor, read, df, tmp_path)
+    run(executor, mutate, df, tmp_path)
+    results, cached = run(executor, read, df, tmp_path)
+    assert results == "['a', 'b']\n"
+    assert not cached
@@ -0,0 +1,60 @@
+import io
+from contextlib import redirect_stdout
+
+import pandas as pd
+
+from bambooai.execution_kernel import ExecutionKernel
+
+
+class Tick:
+    """Counts the statements that actually run"""
+
+    def __init__(self):
+        self.runs = []
+
+    def __call__(self, name):
+        self.runs.append(name)
+
+
+def run(kernel, code, df, tick):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        namespace = kernel.execute(code, {'df': df, 'tick': tick}, output, key=(df,))
+    return namespace, output.getvalue()
+
+
+def test_resumes_from_the_first_changed_statement():
+    kernel, tick, df = ExecutionKernel(), Tick(), pd.DataFrame({'a': [1, 2, 3]})
+    run(kernel, "tick('load')\ntotal = df['a'].sum()\nprint(total)\ntick('last')\nresult = total * 2", df, tick)
+    tick.runs.clear()
+
+    namespace, output = run(kernel, "tick('load')\ntotal = df['a'].sum()\nprint(total)\ntick('last')\nresult = total * 3", df, tick)
+    assert tick.runs == []
+    assert namespace['result'] == 18
+    # The output of the skipped statements is replayed
+    assert output == '6\n'
+
+
+def test_comments_and_blank_lines_do_not_invalidate_statements():
+    kernel, tick, df = ExecutionKernel(), Tick(), pd.DataFrame({'a': [1]})
+    run(kernel, "tick('first')\nx = 1\ntick('second')", df, tick)
+    tick.runs.clear()
+    run(kernel, "# load\ntick('first')\n\nx = 1\ntick('third')", df, tick)
+    assert tick.runs == ['third']
+
+
+def test_a_new_input_dataframe_runs_everything_again():
+    kernel, tick = ExecutionKernel(), Tick()
+    run(kernel, "tick('first')\ntotal = df['a'].sum()", pd.DataFrame({'a': [1]}), tick)
+    tick.runs.clear()
+    namespace, _ = run(kernel, "tick('first')\ntotal = df['a'].sum()", pd.DataFrame({'a': [5]}), tick)
+    assert tick.runs == ['first']
+    assert namespace['total'] == 5
+
+
+def test_restored_state_is_isolated_from_later_statements():
+    kernel, tick, df = ExecutionKernel(), Tick(), pd.DataFrame({'a': [1, 2]})
+    run(kernel, "data = df.copy()\ndata['a'] = data['a'] * 10", df, tick)
+    namespace, _ = run(kernel, "data = df.copy()\ntotal = data['a'].sum()", df, tick)
+    assert namespace['total'] == 3
+    assert df['a'].tolist() == [1, 2]
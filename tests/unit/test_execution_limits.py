@@ -0,0 +1,38 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from bambooai.execution_limits import ExecutionGuard, ExecutionInterrupted
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_executor_api_copy_matches_the_module():
+    module = (ROOT / 'bambooai' / 'execution_limits.py').read_text()
+    api = (ROOT / 'web_app' / 'code_executor_api.py').read_text()
+    start = api.index('# ---- Copy of bambooai/execution_limits.py')
+    end = api.index('# ---- End of the copy of bambooai/execution_limits.py')
+    copy = api[start:end]
+    body = module[module.index('# How often the watchdog'):]
+    assert copy[copy.index('# How often the watchdog'):].rstrip() == body.rstrip()
+
+
+def test_wall_time_limit_interrupts_python_code():
+    with pytest.raises(ExecutionInterrupted):
+        with ExecutionGuard(wall_time=0.2) as guard:
+            while True:
+                pass
+    assert guard.reason == 'wall_time'
+    assert guard.usage['wall_time'] >= 0.2
+
+
+def test_cancel_event_stops_the_execution():
+    event = threading.Event()
+    threading.Timer(0.1, event.set).start()
+    with pytest.raises(ExecutionInterrupted):
+        with ExecutionGuard(cancel_event=event) as guard:
+            while True:
+                pass
+    assert guard.reason == 'cancelled'
+    assert guard.describe().startswith('ExecutionCancelled')
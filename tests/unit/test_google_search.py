@@ -0,0 +1,185 @@
+import os
+import threading
+import time
+
+import pytest
+
+from bambooai import google_search, models
+from bambooai.google_search import BrowserPool, Search, SearchCache, SearchEngine
+
+
+class FakeDriver:
+    def __init__(self, html='<html></html>', broken=False):
+        self.page_source = html
+        self.broken = broken
+        self.quit_called = False
+
+    def get(self, url):
+        if self.broken:
+            raise TimeoutError(url)
+
+    def quit(self):
+        self.quit_called = True
+
+
+def pool_with(*drivers):
+    """A pool that already started the drivers, so no browser is launched"""
+    pool = BrowserPool('chromedriver', None, max_size=len(drivers), acquire_timeout=0.05)
+    for driver in drivers:
+        pool._created += 1
+        pool.release(driver)
+    return pool
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.delenv('SELENIUM_WEBDRIVER_PATH', raising=False)
+    return SearchEngine()
+
+
+def test_pages_are_fetched_concurrently(engine, monkeypatch):
+    monkeypatch.setattr(google_search, 'FETCH_WORKERS', 3)
+    # Each fetch waits for the other two, which only returns if they run at the same time
+    barrier = threading.Barrier(3, timeout=2)
+
+    def search_url(url):
+        barrier.wait()
+        return [f'{url} document']
+    monkeypatch.setattr(engine, 'search_url', search_url)
+
+    assert engine.fetch_documents(['a', 'b', 'c']) == ['a document', 'b document', 'c document']
+
+
+def test_documents_keep_the_search_rank_order(engine, monkeypatch):
+    # The lower ranked pages finish first
+    delays = {'first': 0.2, 'second': 0.1, 'third': 0}
+
+    def search_url(url):
+        time.sleep(delays[url])
+        return [f'{url} 1', f'{url} 2']
+    monkeypatch.setattr(engine, 'search_url', search_url)
+
+    assert engine.fetch_documents(['first', 'second', 'third']) == ['first 1', 'first 2', 'second 1', 'second 2', 'third 1', 'third 2']
+
+
+def test_slow_pages_are_dropped_when_the_time_budget_runs_out(engine, monkeypatch):
+    monkeypatch.setattr(google_search, 'FETCH_TIMEOUT', 0.1)
+    release = threading.Event()
+
+    def search_url(url):
+        if url == 'slow':
+            release.wait(5)
+        return [f'{url} document']
+    monkeypatch.setattr(engine, 'search_url', search_url)
+
+    start = time.perf_counter()
+    try:
+        documents = engine.fetch_documents(['slow', 'fast'])
+    finally:
+        release.set()
+    assert documents == ['fast document']
+    assert time.perf_counter() - start < 2
+
+
+def test_broken_browsers_are_dropped_from_the_pool(engine):
+    broken = FakeDriver(broken=True)
+    engine.browser_pool = pool = pool_with(broken)
+
+    assert engine._fetch_html('https://example.com') is None
+    assert broken.quit_called
+    assert pool._created == 0
+    assert pool._idle.empty()
+
+    working = FakeDriver('<html>page</html>')
+    pool._created += 1
+    pool.release(working)
+    assert engine._fetch_html('https://example.com') == '<html>page</html>'
+    # A working browser goes back to the pool for the next fetch
+    assert pool.acquire() is working
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(google_search.time, 'time', clock)
+    return clock
+
+
+def test_cache_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = SearchCache(str(tmp_path), ttl=60)
+    cache.put('pages', ['https://example.com', 512], ['document'])
+    path = cache._path('pages', ['https://example.com', 512])
+
+    clock.now += 60
+    assert cache.get('pages', ['https://example.com', 512]) == ['document']
+    clock.now += 1
+    assert cache.get('pages', ['https://example.com', 512]) is None
+    assert not os.path.exists(path)
+
+
+def test_eviction_is_per_namespace(tmp_path, clock):
+    cache = SearchCache(str(tmp_path), max_entries=2)
+    cache.put('answers', 'other', 'kept')
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.put('pages', key, key)
+        # The least recently written entry is evicted first
+        os.utime(cache._path('pages', key), (i, i))
+
+    assert [cache.get('pages', key) for key in ['a', 'b', 'c']] == [None, 'b', 'c']
+    assert cache.get('answers', 'other') == 'kept'
+
+
+class FakeEngine:
+    def __init__(self):
+        self.queries = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return [f'{query} document'], [{'title': 'Example', 'link': 'https://example.com'}], None
+
+
+class FakeReader:
+    agent = 'Google Search Summarizer'
+
+    def __call__(self, prompt_manager, log_and_call_manager, output_manager, chain_id, query, contexts):
+        return f'answer to {query}'
+
+
+def test_answers_are_cached_by_question_mode_and_summarizer_model(tmp_path, clock, monkeypatch):
+    cache = SearchCache(str(tmp_path))
+    model = {'name': 'model-a'}
+    monkeypatch.setattr(google_search, 'get_search_cache', lambda: cache)
+    monkeypatch.setattr(models, 'get_model_name', lambda agent: (model['name'], 'openai'))
+    search = Search()
+    search.search_engine = engine = FakeEngine()
+    search.document_retriever = lambda question, documents: documents
+    search.reader = FakeReader()
+
+    def ask(question):
+        return search(None, None, None, 'chain', question)
+
+    expected = ('answer to cycling power', [{'title': 'Example', 'link': 'https://example.com'}])
+    assert ask('cycling power') == expected
+    # Quotes are stripped from the question before it is used as the key
+    assert ask('"cycling power"') == expected
+    assert engine.queries == ['cycling power']
+
+    model['name'] = 'model-b'
+    ask('cycling power')
+    monkeypatch.setattr(google_search, 'SEARCH_MODE', 'selenium')
+    ask('cycling power')
+    assert engine.queries == ['cycling power'] * 3
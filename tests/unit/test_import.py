@@ -1,6 +1,26 @@
+import subprocess
+import sys
+
 import pytest
 
+# Slow to import SDKs that should only be loaded when the feature that needs them is used
+LAZY_MODULES = ['qdrant_client', 'pinecone', 'openai', 'selenium', 'newspaper', 'google.genai', 'matplotlib', 'IPython', 'pkg_resources', 'pyarrow.dataset']
+
 def test_import():
     from bambooai import BambooAI
     from bambooai import models
-    assert True
\ No newline at end of file
+    assert True
+
+def test_import_is_lazy():
+    # Cold import in a fresh interpreter, this also serves as the import time benchmark (run pytest with -s to see it)
+    script = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import bambooai\n"
+        "loaded = [m for m in %r if m in sys.modules]\n"
+        "print('%%.3f|%%s' %% (time.perf_counter() - start, ','.join(loaded)))\n"
+    ) % LAZY_MODULES
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    import_time, loaded = result.stdout.strip().splitlines()[-1].split('|')
+    print(f"\nimport bambooai: {import_time}s")
+    assert loaded == '', f"Modules loaded eagerly on import: {loaded}"
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from bambooai import ingestion
+
+CSV = "Datetime,power,sport,distance\n" + "".join(
+    f"2024-01-{day:02d} 10:00:00+0000,{200 + day},{'run' if day % 2 else 'ride'},{day * 1.5}\n" for day in range(1, 29)
+)
+
+
+def test_load_dataset_and_the_artifact_agree_on_the_column_types(tmp_path):
+    source = tmp_path / 'activities.csv'
+    source.write_text(CSV)
+
+    loaded = ingestion.load_dataset(str(source))
+    artifact = ingestion.get_artifact(str(source), 'hash', str(tmp_path / 'artifacts'))
+    streamed = pd.read_parquet(artifact)
+
+    assert list(loaded.columns) == list(streamed.columns)
+    assert pd.api.types.is_datetime64_any_dtype(loaded['Datetime'])
+    assert pd.api.types.is_datetime64_any_dtype(streamed['Datetime'])
+    assert isinstance(loaded['sport'].dtype, pd.CategoricalDtype)
+    assert isinstance(streamed['sport'].dtype, pd.CategoricalDtype)
+    assert loaded['power'].tolist() == streamed['power'].tolist()
+
+
+def test_integer_arithmetic_does_not_overflow(tmp_path):
+    df = ingestion.optimize_dtypes(pd.DataFrame({'power': [250, 300]}))
+    assert (df['power'] ** 2).tolist() == [62500, 90000]
+
+    source = tmp_path / 'power.csv'
+    source.write_text('power\n250\n300\n')
+    streamed = pd.read_parquet(ingestion.get_artifact(str(source), 'hash', str(tmp_path / 'artifacts')))
+    assert (streamed['power'] ** 2).tolist() == [62500, 90000]
+
+
+def test_integer_downcasting_is_opt_in(tmp_path, monkeypatch):
+    assert ingestion.optimize_dtypes(pd.DataFrame({'power': [250, 300]}), downcast_integers=True)['power'].dtype == 'int16'
+    monkeypatch.setattr(ingestion, 'DOWNCAST_INTEGERS', True)
+    source = tmp_path / 'power.csv'
+    source.write_text('power\n250\n300\n')
+    assert pd.read_parquet(ingestion.get_artifact(str(source), 'hash', str(tmp_path / 'artifacts')))['power'].dtype == 'int16'
+
+
+def test_load_dataset_reads_parquet(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    pd.DataFrame({'a': [1, 2, 3]}).to_parquet(path)
+    assert ingestion.load_dataset(path)['a'].tolist() == [1, 2, 3]
@@ -0,0 +1,67 @@
+import os
+
+import pandas as pd
+import pytest
+
+from bambooai import ingestion
+from bambooai.lazy_frame import LazyFrame
+from bambooai.utils import dataframe_summary_to_string
+
+
+@pytest.fixture(params=['range', 'offset_range', 'column'])
+def frames(request, tmp_path):
+    if request.param == 'range':
+        df = pd.DataFrame({'a': range(10)})
+    elif request.param == 'offset_range':
+        df = pd.DataFrame({'a': range(10)}, index=pd.RangeIndex(100, 110, name='k'))
+    else:
+        df = pd.DataFrame({'a': range(10)}, index=pd.Index(list('abcdefghij'), name='k'))
+    path = str(tmp_path / 'data.parquet')
+    df.to_parquet(path)
+    return df, LazyFrame(path)
+
+
+def test_slices_keep_the_row_labels(frames):
+    df, lazy = frames
+    pd.testing.assert_frame_equal(lazy.head(3), df.head(3))
+    pd.testing.assert_frame_equal(lazy.tail(3), df.tail(3))
+    pd.testing.assert_frame_equal(lazy.iloc[2:5], df.iloc[2:5])
+    assert lazy.iloc[-2].name == df.iloc[-2].name
+
+
+def test_filters_keep_the_row_labels(frames):
+    df, lazy = frames
+    filtered = lazy[lazy['a'] > 5]
+    expected = df[df['a'] > 5]
+    pd.testing.assert_frame_equal(filtered.tail(2), expected.tail(2))
+    pd.testing.assert_frame_equal(filtered.iloc[1:3], expected.iloc[1:3])
+    pd.testing.assert_frame_equal(lazy.loc[lazy['a'] > 5].to_pandas(), expected)
+    pd.testing.assert_series_equal((lazy['a'] > 5).to_pandas(), df['a'] > 5, check_names=False)
+
+
+def test_materialised_frames_work_with_top_level_pandas_functions(frames):
+    df, lazy = frames
+    concat, merge = pd.concat, pd.merge
+    pd.testing.assert_frame_equal(pd.concat([lazy.head(2), lazy.to_pandas()]), pd.concat([df.head(2), df]))
+    pd.testing.assert_frame_equal(pd.merge(lazy.to_pandas(), df, on='a'), pd.merge(df, df, on='a'))
+    # pandas itself is left as it is
+    assert pd.concat is concat and pd.merge is merge
+    assert 'df.to_pandas()' in dataframe_summary_to_string(lazy)
+
+
+def test_a_pinned_artifact_outlives_its_eviction(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, 'ARTIFACT_MAX_ENTRIES', 1)
+    artifact_dir = str(tmp_path / 'artifacts')
+    sources = []
+    for i in range(2):
+        source = tmp_path / f'upload{i}.csv'
+        source.write_text(f'a\n{i}\n')
+        sources.append(str(source))
+
+    artifact = ingestion.get_artifact(sources[0], 'first', artifact_dir)
+    pinned = ingestion.pin_artifact(artifact, str(tmp_path / 'pinned' / 'session_df.parquet'))
+    os.utime(artifact, (0, 0))
+    ingestion.get_artifact(sources[1], 'second', artifact_dir)
+
+    assert not os.path.exists(artifact)
+    assert LazyFrame(pinned)['a'].to_pandas().tolist() == [0]
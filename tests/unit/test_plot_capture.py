@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+from bambooai import plot_capture
+from bambooai.plot_capture import capture_figures
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def test_executor_api_copy_matches_the_module():
+    module = (ROOT / 'bambooai' / 'plot_capture.py').read_text()
+    api = (ROOT / 'web_app' / 'code_executor_api.py').read_text()
+    start = api.index('# ---- Copy of bambooai/plot_capture.py')
+    end = api.index('# ---- End of the copy of bambooai/plot_capture.py')
+    copy = api[start:end]
+    body = module[module.index("# The 'auto' format"):]
+    assert copy[copy.index("# The 'auto' format"):].rstrip() == body.rstrip()
+
+
+def test_auto_format_keeps_simple_figures_as_svg(monkeypatch):
+    monkeypatch.setattr(plot_capture, 'SVG_MAX_POINTS', 100)
+    simple, dense = plt.figure(), plt.figure()
+    simple.add_subplot().plot(range(10))
+    dense.add_subplot().plot(range(1000))
+    empty = plt.figure()
+    try:
+        images = capture_figures([simple, dense, empty], 'auto')
+    finally:
+        plt.close('all')
+    assert [image['format'] for image in images] == ['svg', 'webp' if plot_capture._webp_supported() else 'png']
+    assert images[0]['data'].startswith(b'<?xml')
@@ -0,0 +1,45 @@
+from bambooai.messages.token_budget import TokenBudget
+
+
+def message(role, words):
+    return {'role': role, 'content': ' '.join(['word'] * words)}
+
+
+def test_eviction_keeps_whole_turns():
+    budget = TokenBudget()
+    messages = [message('system', 10), message('user', 100), message('assistant', 100), message('user', 10)]
+    budget.enforce(messages, budget.count_messages([messages[0], messages[3]]) + 5)
+    assert [m['role'] for m in messages] == ['system', 'user']
+    assert messages[1]['content'] == ' '.join(['word'] * 10)
+
+
+def test_oldest_turns_are_evicted_first():
+    budget = TokenBudget()
+    messages = [message('system', 10)]
+    for words in (100, 50, 20):
+        messages += [message('user', words), message('assistant', words)]
+    messages.append(message('user', 10))
+    latest = messages[-3:]
+    tokens_before, tokens_after = budget.enforce(messages, budget.count_messages([messages[0]] + latest) + 5)
+    assert messages[1:] == latest
+    assert messages[1]['role'] == 'user'
+    assert tokens_after < tokens_before
+
+
+def test_latest_user_message_is_never_truncated():
+    budget = TokenBudget()
+    question = message('user', 2000)['content']
+    messages = [message('system', 10), message('user', 50), message('assistant', 500), {'role': 'user', 'content': question}]
+    budget.enforce(messages, 500)
+    assert messages[-1]['content'] == question
+    assert messages[0]['content'] == message('system', 10)['content']
+
+
+def test_replies_after_the_latest_user_message_are_truncated_when_eviction_is_not_enough():
+    budget = TokenBudget()
+    messages = [message('system', 10), message('user', 10), message('assistant', 2000)]
+    tokens_before, tokens_after = budget.enforce(messages, 1000)
+    assert len(messages) == 3
+    assert messages[1]['content'] == ' '.join(['word'] * 10)
+    assert 'tokens truncated' in messages[2]['content']
+    assert tokens_after <= 1000 < tokens_before
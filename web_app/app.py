@@ -8,15 +8,17 @@ import requests
 import threading
 import uuid
 import glob
+import numpy as np
 import pandas as pd
 import sweatstack as ss
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from queue import Queue, Empty
-from flask import Flask, request, jsonify, Response, render_template, session, send_from_directory, redirect, url_for
+from flask import Flask, Request, request, jsonify, Response, render_template, session, send_from_directory, redirect, url_for
 import tempfile
+from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from google.cloud import storage
-from werkzeug.datastructures import FileStorage
 
 # Temporary hardcoded user identifier
 USER_ID = "demo_user"
@@ -55,6 +57,14 @@ def cleanup_threads(debug_mode=False):
                     print(f"Deleted thread: {thread_id}")
                 except Exception as e:
                     print(f"Failed to delete {thread_id}: {str(e)}")
+
+    # Delete the stored plots of the same threads
+    plots_dir = user_path('storage', 'plots')
+    if os.path.exists(plots_dir):
+        for thread_id in os.listdir(plots_dir):
+            if thread_id not in favorite_thread_ids:
+                shutil.rmtree(os.path.join(plots_dir, thread_id), ignore_errors=True)
+                print(f"Deleted plots of thread: {thread_id}")
     
     # Clean up temporary ontology files for non-existent sessions
     temp_dir = user_path('temp')
@@ -70,28 +80,38 @@ def cleanup_threads(debug_mode=False):
                 except Exception as e:
                     print(f"Failed to delete {ontology_file}: {str(e)}")
 
+    # Clean up the pinned dataset artifacts of non-existent sessions
+    pinned_dir = user_path('temp', 'pinned')
+    if os.path.exists(pinned_dir):
+        active_sessions = set(user_preferences.keys())
+        for pinned_file in glob.glob(os.path.join(pinned_dir, '*_*.parquet')):
+            if os.path.basename(pinned_file).split('_')[0] not in active_sessions:
+                try:
+                    os.remove(pinned_file)
+                except OSError as e:
+                    print(f"Failed to delete {pinned_file}: {str(e)}")
+
+def release_pinned_dataset(prefs):
+    """Remove the session's link to the artifact its LazyFrame reads, once the session no longer uses that dataset"""
+    pinned_path = prefs.pop('pinned_artifact', None)
+    if pinned_path and os.path.exists(pinned_path):
+        try:
+            os.remove(pinned_path)
+        except OSError as e:
+            app.logger.error(f"Failed to remove pinned dataset {pinned_path}: {str(e)}")
+
+def generated_datasets_manager():
+    """The index, quotas and janitor of the user's generated datasets, shared with the BambooAI instances"""
+    return dataset_lifecycle.get_manager(user_path('datasets', 'generated'), favourites_dir=user_path('storage', 'favourites'))
+
 def clear_datasets_folder():
     datasets_dir = user_path('datasets')
-    generated_datasets_base_dir = os.path.join(datasets_dir, 'generated')
-    favorites_base_dir = user_path('storage', 'favourites')
-
-    # 1. Get favorite thread IDs
-    favorite_thread_ids = set()
-    if os.path.exists(favorites_base_dir):
-        try:
-            favorite_thread_ids = {
-                d for d in os.listdir(favorites_base_dir)
-                if os.path.isdir(os.path.join(favorites_base_dir, d))
-            }
-            app.logger.info(f"Favorite thread IDs for dataset cleanup: {list(favorite_thread_ids)}")
-        except Exception as e:
-            app.logger.error(f"Error reading favorites directory {favorites_base_dir}: {e}")
 
     if not os.path.exists(datasets_dir):
         app.logger.info(f"'{datasets_dir}' folder does not exist, no need to clear.")
         return
 
-    # 2. Iterate through items in the main 'datasets' directory
+    # 1. Iterate through items in the main 'datasets' directory
     try:
         for item_name in os.listdir(datasets_dir):
             item_path = os.path.join(datasets_dir, item_name)
@@ -100,27 +120,18 @@ def clear_datasets_folder():
                     # Delete all files directly under 'datasets/'
                     os.unlink(item_path)
                     app.logger.info(f"Deleted file: {item_path}")
-                elif os.path.isdir(item_path):
-                    # If the subdirectory is 'generated', process its contents
-                    if item_name == 'generated' and os.path.exists(generated_datasets_base_dir):
-                        app.logger.info(f"Processing 'generated' subdirectory: {generated_datasets_base_dir}")
-                        for generated_thread_id_dir_name in os.listdir(generated_datasets_base_dir):
-                            thread_specific_dir_path = os.path.join(generated_datasets_base_dir, generated_thread_id_dir_name)
-                            if os.path.isdir(thread_specific_dir_path):
-                                # This directory name is treated as the thread_id
-                                if generated_thread_id_dir_name not in favorite_thread_ids:
-                                    shutil.rmtree(thread_specific_dir_path)
-                                    app.logger.info(f"Deleted non-favorited generated dataset directory: {thread_specific_dir_path}")
-                                else:
-                                    app.logger.info(f"Kept favorited generated dataset directory: {thread_specific_dir_path}")
-                    elif item_name != 'generated':
-                        app.logger.warning(f"Skipping deletion of non-'generated' subdirectory: {item_path}. Adjust logic if this should be deleted.")
+                elif os.path.isdir(item_path) and item_name != 'generated':
+                    app.logger.warning(f"Skipping deletion of non-'generated' subdirectory: {item_path}. Adjust logic if this should be deleted.")
             except Exception as e:
                 app.logger.error(f'Failed to process item {item_path}. Reason: {e}')
         app.logger.info(f"Selective cleanup of '{datasets_dir}' folder completed.")
     except Exception as e:
         app.logger.error(f"Error listing contents of '{datasets_dir}': {str(e)}")
 
+    # 2. The generated datasets of the non-favourite threads are removed by the janitor in the background, using its index
+    generated_datasets_manager().request_cleanup()
+    app.logger.info("Cleanup of the non-favourite generated datasets requested.")
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -128,7 +139,10 @@ load_dotenv()
 try:
     from bambooai import BambooAI
     from bambooai import utils
+    from bambooai import ingestion
+    from bambooai.lazy_frame import LazyFrame
     from bambooai import executor_client
+    from bambooai import dataset_lifecycle
 except ImportError:
     # If direct import fails, try adding the local path (cloned repo case)
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -138,7 +152,10 @@ except ImportError:
         sys.path.insert(0, bamboo_ai_path)
         from bambooai import BambooAI
         from bambooai import utils
+        from bambooai import ingestion
+        from bambooai.lazy_frame import LazyFrame
         from bambooai import executor_client
+        from bambooai import dataset_lifecycle
     else:
         raise ImportError("Could not find bambooai package. Please either install via pip or ensure you're running from the correct directory in the cloned repository.")
 
@@ -150,11 +167,22 @@ EXECUTOR_API_REMOVE_AUX_URL = f"{EXECUTOR_API_BASE_URL}/file_utils/remove_aux_da
 EXECUTOR_API_DOWNLOAD_GENERATED_URL = f"{EXECUTOR_API_BASE_URL}/download_generated_dataset"
 # Get execution mode from environment variable or default to 'local'
 GLOBAL_EXECUTION_MODE = os.getenv('EXECUTION_MODE', 'local')  # Default to 'local' if not set
+# 'memory' loads the primary dataset into pandas, 'lazy' keeps it on disk (local execution mode only)
+DATAFRAME_MODE = os.getenv('DATAFRAME_MODE', 'memory')
 
 # Create an instance of the ExecutorAPIClient
 executor_client = executor_client.ExecutorAPIClient(base_url=EXECUTOR_API_BASE_URL)
 
+class UploadRequest(Request):
+    """Streams uploaded files straight to disk while hashing them, so an upload is only written once"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload_dir = user_path('temp')
+        os.makedirs(upload_dir, exist_ok=True)
+        suffix = os.path.splitext(filename)[1] if filename else None
+        return ingestion.HashingFile(dir=upload_dir, suffix=suffix)
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.getenv('FLASK_SECRET')
 
 # Dictionary to store BambooAI instances for each session
@@ -173,6 +201,7 @@ DF_ONTOLOGY = None
 # SweatStack OAuth configuration
 SWEATSTACK_CLIENT_ID = os.getenv('SWEATSTACK_CLIENT_ID')
 SWEATSTACK_CLIENT_SECRET = os.getenv('SWEATSTACK_CLIENT_SECRET')
+SWEATSTACK_FETCH_WORKERS = int(os.getenv('SWEATSTACK_FETCH_WORKERS', 4))
 
 
 # Function to generate a unique DataFrame ID
@@ -202,48 +231,47 @@ def get_bamboo_ai(session_id, df=None):
         )
     return bamboo_ai_instances[session_id]
 
-def load_csv_with_datetime(file_path):
-    # Read the CSV file
-    df = pd.read_csv(file_path)
-
-    # Function to parse datetime and remove timezone
-    def parse_and_remove_tz(series):
-        return pd.to_datetime(series, format='%Y-%m-%d %H:%M:%S%z', utc=True).dt.tz_localize(None)
-
-    # Iterate through columns and apply vectorized parsing where appropriate
-    for col in df.columns:
-        if df[col].dtype == 'object':
-            # Try to parse the column as datetime
-            try:
-                df[col] = parse_and_remove_tz(df[col])
-            except ValueError:
-                # If parsing fails, leave the column as is
-                pass
-
-    return df
-
-# This is temporary, used for testing of .parquet datasets. Will be replaced with a more robust solution.
-def load_parquet_with_datetime(file_path):
-    # Read the Parquet file
-    df = pd.read_parquet(file_path)
-
-    # Function to parse datetime and remove timezone
-    def parse_and_remove_tz(series):
-        return pd.to_datetime(series, format='%Y-%m-%d %H:%M:%S%z', utc=True).dt.tz_localize(None)
-
-    # Iterate through columns and apply vectorized parsing where appropriate
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            # Try to parse the column as datetime
-            try:
-                df[col] = parse_and_remove_tz(df[col])
-            except ValueError:
-                # If parsing fails, leave the column as is
-                pass
+def upload_dataset_to_executor(df_id, artifact_path, content_hash=None):
+    """Stream a Parquet artifact to the executor, unless it already holds the artifact of the same content"""
+    params = {'df_id': df_id}
+    if content_hash:
+        params['content_hash'] = content_hash
+        response = requests.post(EXECUTOR_API_UPLOAD_URL, params=params)
+        if response.status_code != 404:
+            response.raise_for_status()
+            return
+    with open(artifact_path, 'rb') as f:
+        response = requests.post(
+            EXECUTOR_API_UPLOAD_URL,
+            params={**params, 'filename': os.path.basename(artifact_path)},
+            data=f,
+            headers={'Content-Type': 'application/octet-stream'}
+        )
+    response.raise_for_status()
 
-    return df
+def upload_artifact(file):
+    """
+    The Parquet artifact of an uploaded file and the hash of its content. An upload received by UploadRequest was already
+    stored and hashed while the request was parsed, any other file stream is stored first.
+    """
+    if isinstance(file.stream, ingestion.HashingFile):
+        file.stream.flush()
+        return ingestion.get_artifact(file.stream.name, file.stream.hexdigest(), user_path('temp', 'artifacts')), file.stream.hexdigest()
+    source_path = os.path.join(user_path('temp'), f"{uuid.uuid4().hex}_{secure_filename(file.filename)}")
+    try:
+        content_hash = ingestion.persist_upload(file.stream, source_path)
+        return ingestion.get_artifact(source_path, content_hash, user_path('temp', 'artifacts')), content_hash
+    finally:
+        if os.path.exists(source_path):
+            os.remove(source_path)
 
-def load_dataframe_to_bamboo_ai_instance(session_id, df=None, file=None, execution_mode='local'):
+def load_dataframe_to_bamboo_ai_instance(session_id, df=None, file=None, execution_mode='local', artifact_path=None, content_hash=None):
+    """
+    Give the session a BambooAI instance for a dataset: a DataFrame, an uploaded file, or the Parquet artifact of an upload
+    (with its content hash, so the executor API can reuse the artifact it already holds).
+    """
+    if file is not None and artifact_path is None:
+        artifact_path, content_hash = upload_artifact(file)
     new_df_id = generate_dataframe_id()
     prefs = user_preferences.get(session_id, {'planning': False, 'ontology_path': None, 'auxiliary_datasets': []})
     prefs['df_id'] = new_df_id
@@ -252,21 +280,29 @@ def load_dataframe_to_bamboo_ai_instance(session_id, df=None, file=None, executi
     aux_datasets = prefs.get('auxiliary_datasets', []) # Get auxiliary_datasets
 
     if execution_mode == 'api':
-        if not file:
-            raise ValueError("File is required for API execution mode")
+        if artifact_path is None and df is None:
+            raise ValueError("Dataset artifact or DataFrame is required for API execution mode")
+        temp_artifact_path = None
         try:
-            file.seek(0)
-            files = {'file': (file.filename, file, file.content_type)}
-            executor_response = requests.post(
-                EXECUTOR_API_UPLOAD_URL,
-                files=files,
-                data={'df_id': new_df_id}
-            )
-            executor_response.raise_for_status()
+            if artifact_path is None:
+                # Send the executor the canonical Parquet artifact, so it loads the dataframe with the same dtypes without re-parsing
+                temp_artifact_path = ingestion.write_parquet(df, os.path.join(user_path('temp'), f"{new_df_id}.parquet"))
+            upload_dataset_to_executor(new_df_id, artifact_path or temp_artifact_path, content_hash)
             df = None
         except requests.RequestException as e:
             raise Exception(f'Error uploading to executor: {str(e)}')
+        finally:
+            if temp_artifact_path:
+                os.remove(temp_artifact_path)
     else:
+        release_pinned_dataset(prefs)
+        if df is None and artifact_path is not None and DATAFRAME_MODE == 'lazy':
+            # In the 'lazy' dataframe mode the dataset stays on disk, and is queried through a LazyFrame proxy.
+            # The proxy reads the session's own link to the artifact, which stays after the artifact is evicted.
+            prefs['pinned_artifact'] = ingestion.pin_artifact(artifact_path, user_path('temp', 'pinned', f"{session_id}_{new_df_id}.parquet"))
+            df = LazyFrame(prefs['pinned_artifact'])
+        elif df is None and artifact_path is not None:
+            df = pd.read_parquet(artifact_path)
         if df is None:
             raise ValueError("DataFrame is required for local execution mode")
 
@@ -305,6 +341,7 @@ def start_new_conversation(session_id):
     
     # Clear auxiliary datasets list in user_preferences for the current session
     prefs['auxiliary_datasets'] = []
+    release_pinned_dataset(prefs)
     
     # Clear the ontology path in user_preferences
     old_ontology_path = prefs.get('ontology_path')
@@ -348,29 +385,29 @@ def transform_sweatstack_longitudinal_data(df):
     # 2. Convert activity_id column to integers (incrementing from oldest to newest activity per athlete)
     df = df.sort_values('datetime')
 
-    # Check if we have athlete_id column (multi-user scenario)
-    if 'athlete_id' in df.columns:
-        # Create unique activity IDs per athlete
-        unique_activities = df.groupby(['athlete_id', 'activity_id'])['datetime'].min().sort_values()
-        activity_mapping = {}
-
-        for athlete_id in df['athlete_id'].unique():
-            athlete_activities = unique_activities[athlete_id]
-            for new_id, (old_id, _) in enumerate(athlete_activities.items(), 1):
-                activity_mapping[(athlete_id, old_id)] = new_id
-
-        # Apply mapping using both athlete_id and activity_id
-        df['activity_id'] = df.apply(lambda row: activity_mapping.get((row['athlete_id'], row['activity_id']), row['activity_id']), axis=1)
-
-        # Convert athlete_id to integers (incrementing from first appearance)
-        unique_athletes = sorted(df['athlete_id'].unique())
-        athlete_mapping = {old_id: new_id for new_id, old_id in enumerate(unique_athletes, 1)}
-        df['athlete_id'] = df['athlete_id'].map(athlete_mapping)
+    # Number the activities by start time, per athlete in the multi-user scenario
+    multi_user = 'athlete_id' in df.columns
+    keys = ['athlete_id', 'activity_id'] if multi_user else ['activity_id']
+    activities = df.groupby(keys, sort=False)
+    # Rows with a null key aren't in any group, ngroup() gives them NaN
+    group_codes = activities.ngroup().fillna(-1).astype(int).to_numpy()
+    starts = activities['datetime'].min().reset_index().sort_values(['datetime'] + keys)
+    if multi_user:
+        starts['new_id'] = starts.groupby('athlete_id').cumcount() + 1
+    else:
+        starts['new_id'] = np.arange(1, len(starts) + 1)
+    # ngroup() numbers the groups in the same (first appearance) order as the aggregated starts
+    new_ids = starts.sort_index()['new_id'].to_numpy()
+    missing = group_codes < 0
+    if missing.any():
+        # Rows without an activity_id are not part of any group
+        df['activity_id'] = np.where(missing, df['activity_id'], new_ids[np.where(missing, 0, group_codes)])
     else:
-        # Single user scenario
-        unique_activities = df.groupby('activity_id')['datetime'].min().sort_values()
-        activity_mapping = {old_id: new_id for new_id, old_id in enumerate(unique_activities.index, 1)}
-        df['activity_id'] = df['activity_id'].map(activity_mapping)
+        df['activity_id'] = new_ids[group_codes]
+
+    if multi_user:
+        # Convert athlete_id to integers (in sorted order of the original ids)
+        df['athlete_id'] = pd.factorize(df['athlete_id'], sort=True)[0] + 1
 
     # 3. Add cumulative distance column calculated from duration × speed
     if 'duration' in df.columns and 'speed' in df.columns:
@@ -397,8 +434,10 @@ def transform_sweatstack_longitudinal_data(df):
     existing_priority_columns = [col for col in priority_columns if col in df.columns]
     other_columns = [col for col in df.columns if col not in priority_columns]
     df = df[existing_priority_columns + sorted(other_columns)]
-    
-    return df
+
+    # 7. Store the combined frame compactly (categorical sports and names, lossless float downcasts). Integers stay int64,
+    # as power and heart rate sums and squares would overflow a downcast column
+    return ingestion.optimize_dtypes(df, downcast_integers=False)
 
 
 @app.before_request
@@ -574,34 +613,14 @@ def upload_file():
         return jsonify({'message': 'No selected file'}), 400
         
     if file and (file.filename.endswith('.csv') or file.filename.endswith('.parquet')):
-        filepath = os.path.join(user_path('temp'), f"{session_id}_{file.filename}")
-        file.save(filepath)
-
         try:
-            if GLOBAL_EXECUTION_MODE == 'local':
-                # Only load DataFrame for local mode
-                if file.filename.endswith('.csv'):
-                    df = load_csv_with_datetime(filepath)
-                else:  # .parquet
-                    df = load_parquet_with_datetime(filepath)
-                df_json, new_df_id = load_dataframe_to_bamboo_ai_instance(
-                    session_id=session_id,
-                    df=df,
-                    execution_mode=GLOBAL_EXECUTION_MODE
-                )
-            else:  # API mode
-                # Only pass file for API mode
-                with open(filepath, 'rb') as f:
-                    file = FileStorage(
-                        stream=f,
-                        filename=file.filename,
-                        content_type='application/octet-stream'
-                    )
-                    df_json, new_df_id = load_dataframe_to_bamboo_ai_instance(
-                        session_id=session_id,
-                        file=file,
-                        execution_mode=GLOBAL_EXECUTION_MODE
-                    )
+            # The upload was streamed to disk and hashed while the request was parsed (see UploadRequest).
+            # It is converted to the Parquet artifact once, repeated uploads of the same content reuse it.
+            df_json, new_df_id = load_dataframe_to_bamboo_ai_instance(
+                session_id=session_id,
+                file=file,
+                execution_mode=GLOBAL_EXECUTION_MODE
+            )
 
             return jsonify({
                 'message': 'File successfully uploaded and processed',
@@ -611,8 +630,6 @@ def upload_file():
 
         except Exception as e:
             return jsonify({'message': str(e)}), 500
-        finally:
-            os.remove(filepath)
     else:
         return jsonify({'message': 'Invalid file type'}), 400
     
@@ -689,9 +706,14 @@ def upload_auxiliary_dataset():
                 if not EXECUTOR_API_UPLOAD_AUX_URL:
                     return jsonify({'message': 'Executor API URL for aux upload not configured.'}), 500
                 
-                # Send file to executor API
-                files_for_executor = {'file': (file_to_upload.filename, file_to_upload.stream, file_to_upload.content_type)}
-                response = requests.post(EXECUTOR_API_UPLOAD_AUX_URL, files=files_for_executor)
+                # Stream the file to the executor API as the request body, rather than building a multipart body in memory
+                file_to_upload.stream.seek(0)
+                response = requests.post(
+                    EXECUTOR_API_UPLOAD_AUX_URL,
+                    params={'filename': file_to_upload.filename},
+                    data=file_to_upload.stream,
+                    headers={'Content-Type': 'application/octet-stream'}
+                )
                 response.raise_for_status()
                 
                 api_response_data = response.json()
@@ -705,8 +727,8 @@ def upload_auxiliary_dataset():
                 datasets_dir = user_path('datasets')
                 os.makedirs(datasets_dir, exist_ok=True)
 
-                local_filepath = os.path.join(datasets_dir, file_to_upload.filename)
-                file_to_upload.save(local_filepath)
+                local_filepath = os.path.join(datasets_dir, secure_filename(file_to_upload.filename))
+                ingestion.persist_upload(file_to_upload.stream, local_filepath)
                 filepath_to_store = local_filepath
                 message = f'Auxiliary dataset "{file_to_upload.filename}" successfully uploaded locally.'
 
@@ -970,6 +992,15 @@ def query():
 
     return Response(generate(), mimetype='application/json')
 
+@app.route('/stop_execution', methods=['POST'])
+def stop_execution():
+    """Interrupt the code execution of the session's running query"""
+    session_id = session['session_id']
+    if session_id not in bamboo_ai_instances:
+        return jsonify({'error': 'No active session'}), 404
+    bamboo_ai_instances[session_id].executor.cancel()
+    return jsonify({'status': 'stopping'})
+
 @app.route('/submit_rank', methods=['POST'])
 def submit_rank():
     session_id = session['session_id']
@@ -1358,6 +1389,39 @@ def submit_feedback():
         app.logger.error(f'Error writing feedback to {feedback_file}: {str(e)}')
         return jsonify({'error': f'Failed to store feedback: {str(e)}'}), 500
     
+PLOT_FILE_EXTENSIONS = ('png', 'webp', 'svg', 'json', 'html')
+
+def find_stored_plot(thread_id, key):
+    """Path of a plot file stored by BambooAI with the storage of the thread that created it, or None"""
+    if not re.fullmatch(r'[\w-]+', thread_id) or not re.fullmatch(r'[0-9a-f]{32}', key):
+        return None
+    directory = os.path.abspath(user_path('storage', 'plots', thread_id))
+    for extension in PLOT_FILE_EXTENSIONS:
+        path = os.path.join(directory, f'{key}.{extension}')
+        if os.path.isfile(path):
+            return path
+    return None
+
+@app.route('/plot_full_resolution/<thread_id>/<key>', methods=['GET'])
+def plot_full_resolution(thread_id, key):
+    """Serve the full resolution version of a plot that was downsampled for display"""
+    path = find_stored_plot(thread_id, key)
+    if path is None:
+        return jsonify({'error': 'Full resolution plot not found'}), 404
+    directory, filename = os.path.split(path)
+    return send_from_directory(directory, filename)
+
+@app.route('/plot_image/<thread_id>/<key>', methods=['GET'])
+def plot_image(thread_id, key):
+    """Serve the image of a matplotlib plot, sent to the browser as a link rather than inline base64"""
+    path = find_stored_plot(thread_id, key)
+    if path is None:
+        return jsonify({'error': 'Plot image not found'}), 404
+    directory, filename = os.path.split(path)
+    mimetype = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}.get(filename.rsplit('.', 1)[-1])
+    # The key is unique to the image, so it can be cached for good
+    return send_from_directory(directory, filename, mimetype=mimetype, max_age=31536000)
+
 @app.route('/download_generated_dataset', methods=['GET'])
 def download_generated_dataset():
     file_path_param = request.args.get('path')
@@ -1549,9 +1613,7 @@ def sweatstack_load_data():
 
         sweatstack_client = ss.Client(api_key=access_token)
 
-        all_dfs = []
-
-        for user_id in selected_users:
+        def load_user_data(user_id):
             try:
                 delegated_client = sweatstack_client.delegated_client(user_id)
 
@@ -1566,11 +1628,17 @@ def sweatstack_load_data():
                 user_info = delegated_client.get_user(user_id)
                 df['athlete_name'] = user_info.display_name
 
-                all_dfs.append(df)
+                return df
 
             except Exception as e:
                 app.logger.warning(f'Error loading data for user {user_id}: {str(e)}')
                 # Continue with other users
+                return None
+
+        # The per-user requests are I/O bound, so they run concurrently
+        workers = max(1, min(SWEATSTACK_FETCH_WORKERS, len(selected_users)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            all_dfs = [df for df in pool.map(load_user_data, selected_users) if df is not None]
 
         if not all_dfs:
             return jsonify({'error': 'No data could be loaded for any selected users'}), 400
@@ -1657,7 +1725,7 @@ if __name__ == '__main__':
     args = parser.parse_args()
     
     # Ensure directories exist
-    for base in ['temp', 'iframe_figures', 'logs', 'datasets', 'storage']:
+    for base in ['temp', 'logs', 'datasets', 'storage']:
         os.makedirs(user_path(base), exist_ok=True)
 
     os.makedirs(user_path('storage', 'favourites'), exist_ok=True)
@@ -1666,7 +1734,7 @@ if __name__ == '__main__':
     # Run thread cleanup
     cleanup_threads(debug_mode=args.debug)
 
-    # Clear datasets folder
+    # Clear the datasets folder, the generated datasets janitor is started with their manager
     clear_datasets_folder()
     
     # Start the Flask app
@@ -1,13 +1,17 @@
 from flask import Flask, request, jsonify, send_from_directory
 import io
 import os
+import re
 import sys
 import traceback
 import matplotlib
-import json
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import base64
+import ctypes
+import hashlib
+import threading
+import time
 from contextlib import redirect_stdout
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -19,10 +23,19 @@ import pandas as pd
 import numpy as np
 import tempfile
 import csv
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.utils import secure_filename
 
 
 app = Flask(__name__)
 
+# Uploads are streamed to disk in chunks. Parquet artifacts are kept by content hash to deduplicate repeated uploads.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+ARTIFACT_DIR = os.path.join(tempfile.gettempdir(), 'bambooai_artifacts')
+ARTIFACT_MAX_ENTRIES = 10
+CONTENT_HASH_RE = re.compile(r'[0-9a-f]{64}')
+os.makedirs(ARTIFACT_DIR, exist_ok=True)
+
 def log_info(message):
     """Helper function for consistent logging format"""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -64,17 +77,321 @@ class DataFrameCache:
 # Initialize cache
 df_cache = DataFrameCache()
 
+#### EXECUTION LIMITS ####
+
+# Cancel events of the running executions by execution_id, registered by /execute for the duration of the execution.
+# /cancel_execution only signals a registered execution (the client doesn't start an execution it already cancelled).
+cancel_events = {}
+cancel_events_lock = Lock()
+
+def register_cancel_event(execution_id):
+    with cancel_events_lock:
+        return cancel_events.setdefault(execution_id, threading.Event())
+
+# ---- Copy of bambooai/execution_limits.py (without its imports) ----
+# The executor API runs standalone, without the bambooai package, so it carries this copy.
+# Keep it identical to the module: tests/unit/test_execution_limits.py fails when they differ.
+
+# How often the watchdog checks the limits, in seconds
+CHECK_INTERVAL = 0.1
+
+
+class ExecutionInterrupted(BaseException):
+    """
+    Raised in the executing thread when a limit is exceeded or the execution is cancelled.
+    A BaseException, so the generated code's own 'except Exception' handlers don't swallow it.
+    """
+
+
+def current_rss():
+    """Resident set size of the process in bytes, or None if it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _thread_cpu_clock(thread_id):
+    try:
+        return time.pthread_getcpuclockid(thread_id)
+    except (AttributeError, OSError):
+        return None
+
+
+def format_usage(usage):
+    """A one line summary of the resource usage of an execution"""
+    parts = []
+    if usage.get('wall_time') is not None:
+        parts.append(f"wall time {usage['wall_time']:.2f} s")
+    if usage.get('cpu_time') is not None:
+        parts.append(f"CPU time {usage['cpu_time']:.2f} s")
+    if usage.get('peak_rss') is not None:
+        parts.append(f"peak RSS {usage['peak_rss'] / (1024 * 1024):.0f} MB")
+    return ', '.join(parts) or 'not available'
+
+
+class ExecutionGuard:
+    """
+    Enforces a wall-clock limit, a CPU time limit and a memory ceiling on the code executed in the current thread, and
+    lets another thread cancel it. A watchdog thread raises ExecutionInterrupted asynchronously in the executing thread.
+    These are best-effort limits, not hard ones:
+    - the exception takes effect at the next Python bytecode, so a long running native call (eg. a huge merge, or a
+      blocking read) runs to completion first, however far past the limit
+    - the memory ceiling is the growth of the RSS of the whole process since the block started, so memory allocated
+      (or freed) meanwhile by other threads, eg. a concurrent execution, counts towards it, and peak_rss is the process's
+    Run the executor in a container with OS limits (cgroups, ulimit) where hard limits are needed.
+    The reason and the resource usage are available after the block:
+
+        with ExecutionGuard(wall_time=60, cancel_event=event) as guard:
+            exec(code, namespace)
+        guard.usage  # {'wall_time': ..., 'cpu_time': ..., 'peak_rss': ...}
+
+    A limit of 0 or None is not enforced.
+    """
+
+    def __init__(self, wall_time=None, cpu_time=None, max_memory=None, cancel_event=None):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.max_memory = max_memory
+        self.cancel_event = cancel_event
+        self.reason = None
+        self.usage = {}
+        self._done = threading.Event()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._cpu_clock = _thread_cpu_clock(self._thread_id)
+        self._start = time.monotonic()
+        self._start_cpu = self._cpu_seconds()
+        self._start_rss = current_rss()
+        self._peak_rss = self._start_rss
+        self._done.clear()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+        self._watchdog.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._done.set()
+        self._watchdog.join()
+        if self.reason is not None and exc_type is None:
+            # The limit was hit just as the block finished, clear the exception that hasn't been raised yet
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id), None)
+        self._sample_rss()
+        self.usage = {
+            'wall_time': round(time.monotonic() - self._start, 3),
+            'cpu_time': round(self._cpu_seconds() - self._start_cpu, 3) if self._start_cpu is not None else None,
+            'peak_rss': self._peak_rss
+        }
+        return False
+
+    def _cpu_seconds(self):
+        if self._cpu_clock is None:
+            return None
+        try:
+            return time.clock_gettime(self._cpu_clock)
+        except OSError:
+            return None
+
+    def _sample_rss(self):
+        rss = current_rss()
+        if rss is not None and (self._peak_rss is None or rss > self._peak_rss):
+            self._peak_rss = rss
+        return rss
+
+    def _exceeded(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            return 'cancelled'
+        if self.wall_time and time.monotonic() - self._start > self.wall_time:
+            return 'wall_time'
+        if self.cpu_time and self._start_cpu is not None:
+            cpu = self._cpu_seconds()
+            if cpu is not None and cpu - self._start_cpu > self.cpu_time:
+                return 'cpu_time'
+        rss = self._sample_rss()
+        if self.max_memory and rss is not None and self._start_rss is not None and rss - self._start_rss > self.max_memory:
+            return 'memory'
+        return None
+
+    def _watch(self):
+        while not self._done.wait(CHECK_INTERVAL):
+            reason = self._exceeded()
+            if reason is None:
+                continue
+            self.reason = self.reason or reason
+            # Raised again every second in case the code catches it with a bare except
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self._thread_id), ctypes.py_object(ExecutionInterrupted))
+            if self._done.wait(1):
+                return
+
+    def describe(self):
+        """An error message for the interruption, worded for the Error Corrector"""
+        usage = self.usage
+        if self.reason == 'cancelled':
+            return "ExecutionCancelled: The code execution was stopped by the user."
+        if self.reason == 'wall_time':
+            return (f"ExecutionTimeout: Your code timed out after {self.wall_time:g} seconds (wall-clock limit). "
+                    f"Please produce a faster version, eg. vectorise loops over rows and avoid cartesian merges.")
+        if self.reason == 'cpu_time':
+            return (f"ExecutionTimeout: Your code exceeded the CPU time limit of {self.cpu_time:g} seconds "
+                    f"(after {usage.get('wall_time')} seconds). Please produce a faster version, eg. vectorise loops over rows and avoid cartesian merges.")
+        if self.reason == 'memory':
+            return (f"ExecutionMemoryExceeded: Your code used more than {self.max_memory // (1024 * 1024)} MB of additional memory. "
+                    f"Please produce a version that uses less memory, eg. select only the needed columns and avoid cartesian merges.")
+        return "ExecutionInterrupted: The code execution was interrupted."
+
+# ---- End of the copy of bambooai/execution_limits.py ----
+
+# ---- Copy of bambooai/plot_capture.py (without its imports) ----
+# Keep it identical to the module: tests/unit/test_plot_capture.py fails when they differ.
+# The 'auto' format saves figures with up to this many data points as SVG, and rasterises the denser ones.
+# In SVG output, artists with more points than this are rasterised inside the vector image.
+SVG_MAX_POINTS = 5000
+IMAGE_FORMATS = ('png', 'webp', 'svg', 'auto')
+MIME_TYPES = {'png': 'image/png', 'webp': 'image/webp', 'svg': 'image/svg+xml'}
+
+
+def _webp_supported():
+    try:
+        from PIL import features
+        return bool(features.check('webp'))
+    except Exception:
+        return False
+
+
+def _artist_points(artist):
+    """Number of data points an artist draws, images count as dense"""
+    from matplotlib.collections import Collection
+    from matplotlib.image import AxesImage
+    from matplotlib.lines import Line2D
+
+    if isinstance(artist, AxesImage):
+        return float('inf')
+    if isinstance(artist, Line2D):
+        return len(artist.get_xdata(orig=False))
+    if isinstance(artist, Collection):
+        return max(len(artist.get_offsets()), len(artist.get_paths()))
+    return 1
+
+
+def _dense_artists(fig):
+    """The artists of the figure with their point counts"""
+    return [(artist, _artist_points(artist)) for ax in fig.axes for artist in ax.get_children() if artist.get_visible()]
+
+
+def save_figure(fig, image_format='png', dpi=100, max_pixels=0):
+    """
+    Save a matplotlib figure as {'data': bytes, 'format': format}:
+    - png: optimised PNG
+    - webp: lossless WebP (PNG if Pillow was built without WebP)
+    - svg: SVG, with the dense artists rasterised at the DPI
+    - auto: SVG for simple figures, the raster format for dense ones
+    The DPI is lowered when the image would have more than max_pixels pixels (0 disables the cap).
+    """
+    raster_format = 'webp' if _webp_supported() else 'png'
+    if image_format == 'webp':
+        image_format = raster_format
+    elif image_format not in MIME_TYPES:
+        artists = _dense_artists(fig)
+        image_format = 'svg' if sum(points for _, points in artists) <= SVG_MAX_POINTS else raster_format
+
+    width, height = fig.get_size_inches()
+    if max_pixels and width * height * dpi * dpi > max_pixels:
+        dpi = (max_pixels / (width * height)) ** 0.5
+
+    buf = io.BytesIO()
+    if image_format == 'svg':
+        for artist, points in _dense_artists(fig):
+            if points > SVG_MAX_POINTS:
+                artist.set_rasterized(True)
+        fig.savefig(buf, format='svg', dpi=dpi, metadata={'Date': None})
+    elif image_format == 'webp':
+        fig.savefig(buf, format='webp', dpi=dpi, pil_kwargs={'lossless': True, 'method': 4})
+    else:
+        fig.savefig(buf, format='png', dpi=dpi, pil_kwargs={'optimize': True})
+    return {'data': buf.getvalue(), 'format': image_format}
+
+
+def capture_figures(figs, image_format='png', dpi=100, max_pixels=0):
+    """Save the figures that have axes, in parallel when there are several, as the image encoding releases the GIL"""
+    figs = [fig for fig in figs if fig.axes]
+    if len(figs) < 2:
+        return [save_figure(fig, image_format, dpi, max_pixels) for fig in figs]
+    with ThreadPoolExecutor(max_workers=min(len(figs), os.cpu_count() or 1)) as pool:
+        return list(pool.map(lambda fig: save_figure(fig, image_format, dpi, max_pixels), figs))
+
+# ---- End of the copy of bambooai/plot_capture.py ----
+
+# Images of matplotlib figures, unless the request sets its own policy
+IMAGE_POLICY = {
+    'format': os.getenv('PLOT_IMAGE_FORMAT', 'png').lower(),
+    'dpi': float(os.getenv('PLOT_IMAGE_DPI', '100')),
+    'max_pixels': int(os.getenv('PLOT_IMAGE_MAX_PIXELS', '4000000'))
+}
+
+@app.route('/cancel_execution', methods=['POST'])
+def cancel_execution():
+    execution_id = request.json.get('execution_id')
+    if not execution_id:
+        return jsonify({'error': 'No execution_id provided'}), 400
+    with cancel_events_lock:
+        cancel_event = cancel_events.get(execution_id)
+    if cancel_event is None:
+        log_info(f"Cancellation requested for execution {execution_id}, which isn't running")
+        return jsonify({'cancelled': None})
+    cancel_event.set()
+    log_info(f"Cancellation requested for execution {execution_id}")
+    return jsonify({'cancelled': execution_id})
+
+#### EXECUTION HELPERS ####
+
+# Functions of the helper modules the client registered (eg. the plot downsampling), by the sha256 of the module source.
+# The source is sent once, executions name the helpers they need and get their functions in the namespace.
+helper_functions = {}
+helper_functions_lock = Lock()
+
+@app.route('/helpers', methods=['POST'])
+def register_helpers():
+    source = request.json.get('source')
+    names = request.json.get('names') or []
+    if not source:
+        return jsonify({'error': 'No source provided'}), 400
+    helpers_id = hashlib.sha256(source.encode('utf-8')).hexdigest()
+    namespace = {'__name__': f'helpers_{helpers_id[:12]}'}
+    try:
+        exec(compile(source, f'<helpers {helpers_id[:12]}>', 'exec'), namespace)
+        functions = {name: namespace[name] for name in names}
+    except Exception as e:
+        return jsonify({'error': f'Invalid helpers: {str(e)}'}), 400
+    with helper_functions_lock:
+        helper_functions[helpers_id] = functions
+    log_info(f"Registered helpers {helpers_id[:12]}: {', '.join(names)}")
+    return jsonify({'helpers_id': helpers_id})
+
 #### CODE EXECUTION ENDPOINTS ####
 
 @app.route('/execute', methods=['POST'])
 def execute_code():
     data = request.json
+    with helper_functions_lock:
+        missing_helpers = [helpers_id for helpers_id in data.get('helpers') or [] if helpers_id not in helper_functions]
+        helpers = {name: function for helpers_id in data.get('helpers') or [] if helpers_id in helper_functions
+                   for name, function in helper_functions[helpers_id].items()}
+    if missing_helpers:
+        return jsonify({'error': 'Unknown helpers, register them first', 'missing_helpers': missing_helpers}), 409
     code = data.get('code')
     df_id = data.get('df_id')  # Can be None
     patch_code = data.get('patch_code')
-    plots_dir = data.get('plots_dir')
     plot_format = data.get('plot_format')
     generated_datasets_path = data.get('generated_datasets_path', [])
+    execution_id = data.get('execution_id')
+    limits = data.get('limits') or {}
+    image_policy = {**IMAGE_POLICY, **(data.get('image_policy') or {})}
 
     log_info(f"Received execution request for DataFrame ID={df_id if df_id else 'None'}")
 
@@ -84,7 +401,7 @@ def execute_code():
     original_df = df.copy() if df is not None else None
     output_buffer = io.StringIO()
     plot_images = []
-    generated_files = []
+    plot_figures = []
 
     if generated_datasets_path is not None:
         # Ensure that the directory exists
@@ -94,13 +411,20 @@ def execute_code():
             except Exception as e:
                 log_info(f"Error creating directory {generated_datasets_path}: {str(e)}")
 
+    guard = ExecutionGuard(
+        wall_time=limits.get('wall_time'),
+        cpu_time=limits.get('cpu_time'),
+        max_memory=limits.get('max_memory'),
+        cancel_event=register_cancel_event(execution_id) if execution_id else None
+    )
+
     try:
         plt.close('all')
-        with redirect_stdout(output_buffer):
+        with guard, redirect_stdout(output_buffer):
             local_vars = {
                 'df': df,
-                '_plots_dir': plots_dir,
-                '_generated_files': generated_files
+                '_plot_figures': plot_figures,
+                **helpers
             }
             
             log_info(f"Executing code")
@@ -119,45 +443,19 @@ def execute_code():
             figs = [plt.figure(i) for i in plt.get_fignums()]
             if figs:
                 log_info(f"Processing {len(figs)} matplotlib figures")
+            for image in capture_figures(figs, image_policy['format'], image_policy['dpi'], image_policy['max_pixels']):
+                plot_images.append({'data': base64.b64encode(image['data']).decode('utf-8'), 'format': image['format']})
             for fig in figs:
-                if len(fig.axes) > 0:
-                    buf = io.BytesIO()
-                    fig.savefig(buf, format='png')
-                    buf.seek(0)
-                    plot_images.append({
-                        'data': base64.b64encode(buf.getvalue()).decode('utf-8'),
-                        'format': 'png'
-                    })
-                    buf.close()
                 plt.close(fig)
             
-            # Handle plotly figures
-            if os.path.isdir(plots_dir):
-                for file_path in sorted(generated_files):
-                    try:
-                        # First try UTF-8
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                file_content = f.read()
-                        except UnicodeDecodeError:
-                            # If UTF-8 fails, read as latin-1 and encode back to UTF-8
-                            with open(file_path, 'r', encoding='latin-1') as f:
-                                raw_content = f.read()
-                                # Convert to UTF-8
-                                file_content = raw_content.encode('utf-8', errors='replace').decode('utf-8')
-                        
-                        # Validate JSON can be parsed before adding to plot_images
-                        if plot_format == 'json':
-                            json.loads(file_content)  # This will raise an exception if JSON is invalid
-                            
-                        plot_images.append({
-                            'data': file_content,
-                            'format': plot_format
-                        })
-                        log_info(f"Processed plotly figure: {file_path}")
-                    except Exception as e:
-                        log_info(f"Error processing plotly figure {file_path}: {str(e)}")
-                        continue
+            # Handle plotly figures, captured in memory in the order they were shown
+            if plot_figures:
+                log_info(f"Processing {len(plot_figures)} plotly figures")
+            for figure in plot_figures:
+                plot_images.append({
+                    **figure,
+                    'format': plot_format
+                })
 
         # Iterate over generated_datasets_path directory for any generated datasets.    
         if generated_datasets_path is not None:
@@ -176,17 +474,27 @@ def execute_code():
             else:
                 log_info(f"Generated datasets path {generated_datasets_path} does not exist.")
 
+        log_info(f"Execution resource usage: {format_usage(guard.usage)}")
         return jsonify({
             'results': output_buffer.getvalue(),
             'error': None,
             'plot_images': plot_images,
-            'generated_datasets': generated_datasets if generated_datasets else []
+            'generated_datasets': generated_datasets if generated_datasets else [],
+            'resource_usage': guard.usage
         })
 
-    except Exception as error:
+    except (Exception, ExecutionInterrupted) as error:
         exc_type, exc_value, tb = sys.exc_info()
         full_traceback = traceback.format_exc()
-        exec_traceback = filter_exec_traceback(code, patch_code, full_traceback, exc_type.__name__, str(exc_value))
+        log_info(f"Execution resource usage: {format_usage(guard.usage)}")
+        if isinstance(error, ExecutionInterrupted):
+            log_info(f"Execution interrupted: {guard.reason}")
+            exec_traceback = f"{guard.describe()}\nResource usage: {format_usage(guard.usage)}\n"
+            if '<string>' in full_traceback:
+                # Show where the code was when it was interrupted
+                exec_traceback += "\n" + filter_exec_traceback(code, patch_code, full_traceback, exc_type.__name__, "interrupted")
+        else:
+            exec_traceback = filter_exec_traceback(code, patch_code, full_traceback, exc_type.__name__, str(exc_value))
         
         # Always restore original state in cache on error
         if df_id is not None and original_df is not None:
@@ -196,43 +504,102 @@ def execute_code():
             'results': None,
             'error': exec_traceback,
             'plot_images': [],
-            'generated_datasets': []
+            'generated_datasets': [],
+            'resource_usage': guard.usage,
+            'interrupted': guard.reason if isinstance(error, ExecutionInterrupted) else None
         })
 
     finally:
         plt.close('all')
         output_buffer.close()
+        if execution_id:
+            with cancel_events_lock:
+                cancel_events.pop(execution_id, None)
 
 #### DATASET UPLOAD ENDPOINT ####
 
 # This endpoint allows users to upload a dataset file (CSV or Parquet) and store it in the cache
+def stream_to_file(stream, file_path):
+    """Write a request stream to a file in chunks, without holding the whole upload in memory"""
+    with open(file_path, 'wb') as f:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            f.write(chunk)
+
+def evict_artifacts():
+    artifacts = sorted(
+        (os.path.join(ARTIFACT_DIR, name) for name in os.listdir(ARTIFACT_DIR) if name.endswith('.parquet')),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    for stale in artifacts[ARTIFACT_MAX_ENTRIES:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
 @app.route('/upload_dataset', methods=['POST'])
 def upload_dataset():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-        
-    file = request.files['file']
-    df_id = request.form.get('df_id')
-    
+    """
+    Accepts either a multipart file upload, or the file streamed as the raw request body with
+    df_id, filename and content_hash query parameters. A raw request without a body loads the
+    artifact previously uploaded with the same content_hash, or returns 404 if there is none.
+    """
+    streamed = not (request.content_type or '').startswith('multipart/form-data')
+    if streamed:
+        df_id = request.args.get('df_id')
+        filename = secure_filename(request.args.get('filename', ''))
+        content_hash = request.args.get('content_hash')
+    else:
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part'}), 400
+        file = request.files['file']
+        df_id = request.form.get('df_id')
+        filename = secure_filename(file.filename)
+        content_hash = None
+
     if not df_id:
         return jsonify({'error': 'No df_id provided'}), 400
-    
+    if content_hash is not None and not CONTENT_HASH_RE.fullmatch(content_hash):
+        return jsonify({'error': 'Invalid content_hash'}), 400
+
+    temp_path = None
     try:
-        # Save file temporarily
-        temp_path = os.path.join(tempfile.gettempdir(), file.filename)
-        file.save(temp_path)
-        
-        # Load into DataFrame based on file type
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(temp_path)
-        elif file.filename.endswith('.parquet'):
-            df = pd.read_parquet(temp_path)
+        artifact_path = os.path.join(ARTIFACT_DIR, f"{content_hash}.parquet") if content_hash else None
+        if streamed and not request.content_length:
+            if not (artifact_path and os.path.exists(artifact_path)):
+                return jsonify({'error': 'Dataset artifact not found'}), 404
+            os.utime(artifact_path)
+            df = pd.read_parquet(artifact_path)
         else:
-            return jsonify({'error': 'Unsupported file type'}), 400
-            
-        # Clean up temp file
-        os.remove(temp_path)
-        
+            if not filename.endswith(('.csv', '.parquet')):
+                return jsonify({'error': 'Unsupported file type'}), 400
+
+            # Parquet artifacts with a content hash are kept, so a repeated upload doesn't need to be sent again
+            if artifact_path and filename.endswith('.parquet'):
+                target_path = artifact_path
+            else:
+                fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+                os.close(fd)
+                target_path = temp_path
+
+            if streamed:
+                stream_to_file(request.stream, f"{target_path}.part")
+                os.replace(f"{target_path}.part", target_path)
+            else:
+                file.save(target_path)
+
+            # Load into DataFrame based on file type. The web app sends a typed Parquet artifact, CSV is kept for other clients.
+            if filename.endswith('.csv'):
+                df = pd.read_csv(target_path, engine='pyarrow')
+            else:
+                df = pd.read_parquet(target_path)
+
+            if target_path == artifact_path:
+                evict_artifacts()
+
         # Store in cache
         df_cache.put(df_id, df)
         
@@ -245,6 +612,9 @@ def upload_dataset():
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    finally:
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
 
 #### DATAFRAME UTILITY ENDPOINTS ####
 
@@ -378,11 +748,17 @@ def get_dataframe_columns():
 
 @app.route('/file_utils/upload_aux_dataset', methods=['POST'])
 def upload_aux_dataset_endpoint():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part in request'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
+    # The file is either streamed as the raw request body with a filename query parameter, or sent as a multipart upload
+    if (request.content_type or '').startswith('multipart/form-data'):
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file part in request'}), 400
+        file = request.files['file']
+        filename = secure_filename(file.filename)
+    else:
+        file = None
+        filename = secure_filename(request.args.get('filename', ''))
+
+    if filename == '':
         return jsonify({'error': 'No file selected'}), 400
 
     try:
@@ -391,10 +767,13 @@ def upload_aux_dataset_endpoint():
         os.makedirs(executor_datasets_dir, exist_ok=True)
         
         # Save the file to the executor's 'datasets' directory
-        filepath_on_executor = os.path.join(executor_datasets_dir, file.filename)
-        file.save(filepath_on_executor)
+        filepath_on_executor = os.path.join(executor_datasets_dir, filename)
+        if file is None:
+            stream_to_file(request.stream, filepath_on_executor)
+        else:
+            file.save(filepath_on_executor)
         
-        log_info(f"Auxiliary dataset '{file.filename}' uploaded to '{filepath_on_executor}' on executor.")
+        log_info(f"Auxiliary dataset '{filename}' uploaded to '{filepath_on_executor}' on executor.")
         
         return jsonify({
             'message': 'Auxiliary dataset uploaded successfully to executor.',
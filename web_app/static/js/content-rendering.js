@@ -509,15 +509,24 @@ function renderCodeTab(data) {
 }
 
 function renderPlotTab(data, id, format) {
+    // Plots downsampled for display carry the key of their stored full resolution version
+    const fullResolutionKey = !(format in PLOT_IMAGE_MIME_TYPES) ? (data.match(/"full_resolution_key":\s*"([0-9a-f]{32})"/) || [])[1] : null;
+    const fullResolutionBtn = fullResolutionKey ? `
+                <button class="plot-query-btn plot-full-resolution-btn" aria-label="Load full resolution" title="Downsampled for display, click to load the full resolution" data-thread="${currentData.thread_id}" data-key="${fullResolutionKey}" onclick="loadFullResolutionPlot(this)">
+                    <svg viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
+                        <path d="M7 14H5v5h5v-2H7v-3zm-2-4h2V7h3V5H5v5zm12 7h-3v2h5v-5h-2v3zM14 5v2h3v3h2V5h-5z"/>
+                    </svg>
+                </button>` : '';
+    const downsampledBadge = fullResolutionKey ? `<span class="plot-downsampled-badge" title="Traces with more points than PLOT_MAX_POINTS are downsampled for display">downsampled</span>` : '';
     const baseContainer = `
         <div class="plot-container" data-plot-id="${id}">
             <div class="plot-header">
-                <h3>Plot ${id ? id.split('_')[1] : ''}:</h3>
+                <h3>Plot ${id ? id.split('_')[1] : ''}:</h3>${downsampledBadge}
                 <button class="plot-query-btn" aria-label="Query plot">
                     <svg viewBox="0 0 24 24" xmlns="http://www.w3.org/2000/svg">
                         <path d="M15.5 14h-.79l-.28-.27C15.41 12.59 16 11.11 16 9.5 16 5.91 13.09 3 9.5 3S3 5.91 3 9.5 5.91 16 9.5 16c1.61 0 3.09-.59 4.23-1.57l.27.28v.79l5 4.99L20.49 19l-4.99-5zm-6 0C7.01 14 5 11.99 5 9.5S7.01 5 9.5 5 14 7.01 14 9.5 11.99 14 9.5 14z"/>
                     </svg>
-                </button>
+                </button>${fullResolutionBtn}
             </div>
             <div class="plot-query-form" style="display: none;">
                 <input type="text" class="plot-query-input" placeholder="Enter your query about plot ${id ? id.split('_')[1] : ''}">
@@ -589,10 +598,12 @@ function renderPlotTab(data, id, format) {
         
         return content;
     }
-    else if (format === 'png') {
+    else if (format in PLOT_IMAGE_MIME_TYPES) {
+        // Images are served by the app and linked, older results carry them inline as base64
+        const src = data.startsWith('/plot_image/') ? data : `data:${PLOT_IMAGE_MIME_TYPES[format]};base64,${data}`;
         return `${baseContainer}
             <div class="plot-content">
-                <img src="data:image/png;base64,${data}" alt="Plot ${id ? id.split('_')[1] : ''}" class="plot-image">
+                <img src="${src}" alt="Plot ${id ? id.split('_')[1] : ''}" class="plot-image">
             </div>
         </div>`;
     }
@@ -600,6 +611,56 @@ function renderPlotTab(data, id, format) {
     return '';
 }
 
+// Formats of matplotlib plot images
+const PLOT_IMAGE_MIME_TYPES = {
+    png: 'image/png',
+    webp: 'image/webp',
+    svg: 'image/svg+xml'
+};
+
+// A plot image as a PNG data URL, whatever its format and whether it is linked or inline
+async function plotImageAsPng(img) {
+    if (img.src.startsWith('data:image/png;')) {
+        return img.src;
+    }
+    if (!img.complete || !img.naturalWidth) {
+        await img.decode();
+    }
+    const canvas = document.createElement('canvas');
+    canvas.width = img.naturalWidth;
+    canvas.height = img.naturalHeight;
+    canvas.getContext('2d').drawImage(img, 0, 0);
+    return canvas.toDataURL('image/png');
+}
+
+async function loadFullResolutionPlot(button) {
+    const container = button.closest('.plot-container').querySelector('.plotly-plot > div');
+    if (!container) return;
+    button.disabled = true;
+    try {
+        const response = await fetch(`/plot_full_resolution/${button.dataset.thread}/${button.dataset.key}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        if ((response.headers.get('Content-Type') || '').includes('json')) {
+            const plotData = await response.json();
+            await Plotly.react(container, plotData.data, plotData.layout);
+        } else {
+            container.innerHTML = await response.text();
+            Array.from(container.getElementsByTagName('script')).forEach(script => {
+                if (!script.src) {
+                    eval(script.textContent);
+                }
+            });
+        }
+        button.closest('.plot-header').querySelector('.plot-downsampled-badge')?.remove();
+        button.remove();
+    } catch (error) {
+        console.error('Error loading the full resolution plot:', error);
+        button.disabled = false;
+    }
+}
+
 function buildDiagramTab(type, data) {
     // normalise + validate
     const mermaidSrc = typeof data?.visualization === 'string'
@@ -1062,8 +1123,13 @@ function attachPlotQueryListeners(element) {
             let imageData;
             const plotImage = plotContainer.querySelector('.plot-image');
             if (plotImage) {
-                // Regular PNG plot
-                imageData = plotImage.src.split(',')[1];
+                // Matplotlib plot image
+                try {
+                    imageData = (await plotImageAsPng(plotImage)).split(',')[1];
+                } catch (err) {
+                    console.error('Error converting plot image to PNG:', err);
+                    return;
+                }
             } else {
                 // Check for Plotly plot
                 const plotlyDiv = plotContainer.querySelector('.plotly-plot div');
@@ -1109,6 +1175,9 @@ function attachPlotQueryListeners(element) {
                 }
 
                 // Handle streaming response
+                if (typeof setQueryRunning === 'function') {
+                    setQueryRunning(true);
+                }
                 const reader = response.body.getReader();
                 const decoder = new TextDecoder();
 
@@ -1117,6 +1186,9 @@ function attachPlotQueryListeners(element) {
                     const {done, value} = await reader.read();
                     if (done) {
                         console.log('Stream complete');
+                        if (typeof setQueryRunning === 'function') {
+                            setQueryRunning(false);
+                        }
                         if (typeof saveCurrentResponse === 'function') {
                             saveCurrentResponse();
                         }
@@ -1134,6 +1206,9 @@ function attachPlotQueryListeners(element) {
 
             } catch (error) {
                 console.error('Error in plot query submission:', error);
+                if (typeof setQueryRunning === 'function') {
+                    setQueryRunning(false);
+                }
                 streamOutputDiv.innerHTML += `<div class="error">Error: ${error.message}</div>`;
             }
         };
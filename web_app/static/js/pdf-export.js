@@ -478,7 +478,7 @@ async function addSinglePlot(pdf, plot, x, y, width, height) {
                 scale: 2 
             });
         } else if (plot.type === 'image') {
-            plotImageData = plot.element.src;
+            plotImageData = await plotImageAsPng(plot.element);
         }
         
         if (plotImageData) {
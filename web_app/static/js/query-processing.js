@@ -24,6 +24,38 @@ function initializeMainQuerySubmission() {
     } else {
         console.warn('Submit query button not found');
     }
+
+    const stopExecutionButton = document.getElementById('stopExecution');
+    if (stopExecutionButton) {
+        stopExecutionButton.addEventListener('click', stopExecution);
+    }
+}
+
+// Show the stop button while a query is running
+function setQueryRunning(running) {
+    const stopExecutionButton = document.getElementById('stopExecution');
+    if (stopExecutionButton) {
+        stopExecutionButton.classList.toggle('running', running);
+        stopExecutionButton.disabled = false;
+    }
+}
+
+// Interrupt the running code execution. The query finishes with the results so far, and the code isn't corrected and run again.
+function stopExecution() {
+    const stopExecutionButton = document.getElementById('stopExecution');
+    if (stopExecutionButton) {
+        stopExecutionButton.disabled = true;
+    }
+    fetch('/stop_execution', { method: 'POST' })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error('Network response was not ok');
+        }
+    })
+    .catch(error => {
+        console.error('Error stopping execution:', error);
+        setQueryRunning(true);
+    });
 }
 
 function handleQuerySubmit(options = {}) {
@@ -73,6 +105,7 @@ function handleQuerySubmit(options = {}) {
         if (!response.ok) {
             throw new Error('Network response was not ok');
         }
+        setQueryRunning(true);
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
 
@@ -80,6 +113,7 @@ function handleQuerySubmit(options = {}) {
             return reader.read().then(({done, value}) => {
                 if (done) {
                     console.log('Stream complete');
+                    setQueryRunning(false);
                     if (typeof saveCurrentResponse === 'function') {
                         saveCurrentResponse();
                     }
@@ -95,6 +129,7 @@ function handleQuerySubmit(options = {}) {
     })
     .catch(error => {
         console.error('Error:', error);
+        setQueryRunning(false);
         streamOutputDiv.innerHTML += `<div class="error">Error: ${error.message}</div>`;
     });
 }
@@ -213,7 +248,8 @@ function processChunk(chunk) {
                     finishToolCall();
                     console.log(`Right panel data detected: ${data.type}`, data);
                     if (typeof createOrUpdateTab === 'function') {
-                        createOrUpdateTab(data.type, data.data, data.id, data.format);
+                        // Plot images come as a link rather than inline data
+                        createOrUpdateTab(data.type, data.url || data.data, data.id, data.format);
                     }
                 } else if (data.text) {
                     finishToolCall();